@@ -27,6 +27,7 @@ from histogrammar.primitives.deviate import *
 from histogrammar.primitives.fraction import *
 from histogrammar.primitives.irregularlybin import *
 from histogrammar.primitives.minmax import *
+from histogrammar.primitives.multibin import *
 from histogrammar.primitives.select import *
 from histogrammar.primitives.sparselybin import *
 from histogrammar.primitives.stack import *
@@ -15,11 +15,15 @@
 # limitations under the License.
 
 import base64
+import bisect
 import datetime
+import itertools
 import json as jsonlib
 import math
 import random
 import re
+import struct
+import threading
 try:
     from collections import OrderedDict
 except ImportError:
@@ -46,6 +50,7 @@ from histogrammar.util import *
 from histogrammar.parsing import C99SourceToAst
 from histogrammar.parsing import C99AstToSource
 from histogrammar.pycparser import c_ast
+import histogrammar.util
 import histogrammar.version
 
 class ContainerException(Exception):
@@ -62,6 +67,80 @@ class JsonFormatException(Exception):
     def __init__(self, x, context):
         super(JsonFormatException, self).__init__("wrong JSON format for {0}: {1}".format(context, jsonlib.dumps(x)))
 
+class _NotVectorizable(Exception):
+    """Raised inside ``fillmany`` when a batch can't be filled with the Numpy engine, so that it is filled one datum at a time instead."""
+    pass
+
+class _BatchQuantityCache(QuantityCache):
+    """QuantityCache for ``fillmany``: a quantity that fails on arrays, or doesn't return a one-dimensional array, makes the batch ``_NotVectorizable``."""
+
+    def __call__(self, fcn, data):
+        import numpy
+        try:
+            out = super(_BatchQuantityCache, self).__call__(fcn, data)
+        except Exception as err:
+            raise _NotVectorizable(err)
+        if not isinstance(out, numpy.ndarray) or len(out.shape) != 1:
+            raise _NotVectorizable(out)
+        return out
+
+_addImplicitMethods = None
+
+# binary format (Container.toBinary): magic, header length, JSON header padded to 8 bytes, little-endian float64 arrays
+_binaryMagic = b"HGBIN\x00\x00\x01"
+_binaryOutput = threading.local()    # arrays set aside by the toBinary in progress on this thread
+_binaryInput = threading.local()     # arrays of the fromBinary in progress on this thread
+
+def _cloneValue(x):
+    """Copy of ``x`` for Container.copy: containers and mutable collections are copied (recursively), everything else is shared."""
+    if isinstance(x, (Container, DenseValues)):
+        return x.copy()
+    elif type(x) is list:
+        return [_cloneValue(v) for v in x]
+    elif type(x) is tuple:
+        return tuple(_cloneValue(v) for v in x)
+    elif isinstance(x, dict):
+        out = x.copy()
+        for k, v in list(out.items()):
+            out[k] = _cloneValue(v)
+        return out
+    elif type(x).__module__ == "numpy" and hasattr(x, "copy"):
+        return x.copy()
+    else:
+        return x
+
+def _transferValue(x, y):
+    """Overwrite ``x`` with the contents of ``y`` in place where their structures match (for Container._transferFrom), returning the value that replaces ``x``."""
+    if isinstance(y, Container) and type(x) is type(y):
+        x._transferFrom(y)
+        return x
+    elif isinstance(y, DenseValues) and isinstance(x, DenseValues) and len(x) == len(y):
+        # copied rather than exchanged: the arrays are always modified in place (see DenseValues.memoryviews)
+        for field, array in y.arrays.items():
+            x.arrays[field][:] = array
+        return x
+    elif type(y) is list and type(x) is list and len(x) == len(y):
+        for i in xrange(len(y)):
+            x[i] = _transferValue(x[i], y[i])
+        return x
+    elif type(y) is tuple and type(x) is tuple and len(x) == len(y):
+        # tuples hold bin edges (configuration) and sub-aggregators (filled in place)
+        for a, b in zip(x, y):
+            if isinstance(b, Container):
+                a._transferFrom(b)
+        return x
+    elif isinstance(y, dict) and isinstance(x, dict) and len(x) == len(y) and all(k in x for k in y):
+        for k, v in y.items():
+            x[k] = _transferValue(x[k], v)
+        return x
+    elif type(y).__module__ == "numpy" and hasattr(y, "copy"):
+        if type(x) is type(y) and getattr(x, "shape", None) == y.shape and getattr(x, "dtype", None) == y.dtype:
+            x[...] = y
+            return x
+        return y.copy()
+    else:
+        return y
+
 class Factory(object):
     """Interface for a container factory, always named as imperative verbs, such as "Count" and "Bin".
     
@@ -76,12 +155,17 @@ class Factory(object):
     Also particular to Python, the Container classes are their own Factories. Thus, ``Count.ing()`` makes a ``Count``.
    """
 
+    __slots__ = ()
+
     registered = {}
     
     @staticmethod
     def register(factory):
         """Add a new ``Factory`` to the registry, introducing a new container type on the fly. General users usually wouldn't do this, but they could. This method is used internally to define the standard container types."""
         Factory.registered[factory.__name__] = factory
+        attachMethods(factory)
+
+    _attached = set()
 
     def __init__(self):
         self._checkedForCrossReferences = False
@@ -90,14 +174,25 @@ class Factory(object):
         """Explicitly invoke histogrammar.specialized.addImplicitMethods on this object, usually right after construction (in each of the methods that construct: ``__init__``, ``ed``, ``ing``, ``fromJsonFragment``, etc).
 
         Objects used as default parameter arguments are created too early for this to be possible, since they are created before the histogrammar.specialized module can be defined. These objects wouldn't satisfy any of ``addImplicitMethod``'s checks anyway.
+
+        The ``fill`` and ``plot`` methods (with ``fill.numpy``, ``plot.root``, etc.) are class-level descriptors (see histogrammar.util.attachMethods), so nothing is added to the object itself.
         """
+        cls = type(self)
+        if cls not in Factory._attached:
+            attachMethods(cls)
+            Factory._attached.add(cls)
+
+        global _addImplicitMethods
+        if _addImplicitMethods is None:
+            try:
+                import histogrammar.specialized
+                _addImplicitMethods = histogrammar.specialized.addImplicitMethods
+            except (ImportError, AttributeError):
+                return self
         try:
-            import histogrammar.specialized
-            histogrammar.specialized.addImplicitMethods(self)
-        except (ImportError, AttributeError):
-            pass
-        self.fill = FillMethod(self, self.fill)
-        self.plot = PlotMethod(self, self.plot)
+            _addImplicitMethods(self)
+        except AttributeError:
+            pass    # not fully constructed yet
         return self
 
     @staticmethod
@@ -113,6 +208,31 @@ class Factory(object):
     def fromJsonString(json):
         return Factory.fromJson(jsonlib.loads(json))
 
+    @staticmethod
+    def fromBinaryFile(fileName):
+        with open(fileName, "rb") as file:
+            return Factory.fromBinary(file.read())
+
+    @staticmethod
+    def fromBinary(data):
+        """User's entry point for reconstructing a container from the bytes made by ``Container.toBinary``.
+
+        The arrays are read with ``numpy.frombuffer`` (and copied once so that the result can be filled), and dense ``Bin`` values are built directly from them. The result is the same as ``fromJson`` of the original's ``toJson``.
+        """
+        import numpy
+        data = bytes(data)
+        if len(data) < 16 or data[:8] != _binaryMagic:
+            raise ContainerException("not a Histogrammar binary document")
+        length, = struct.unpack("<Q", data[8:16])
+        header = jsonlib.loads(data[16 : 16 + length].decode("utf-8"))
+
+        # the references are only resolved where dense values are expected (DenseValues.fromBinaryFragment), not wherever they appear in the header
+        _binaryInput.arrays = numpy.frombuffer(data, dtype="<f8", offset=16 + length)
+        try:
+            return Factory.fromJson(header)
+        finally:
+            _binaryInput.arrays = None
+
     @staticmethod
     def fromJson(json):
         """User's entry point for reconstructing a container from JSON text."""
@@ -146,6 +266,8 @@ class Container(object):
     Containers are monoids: they have a neutral element (``zero``) and an associative operator (``+``). Thus, partial sums aggregated in parallel can be combined arbitrarily.
     """
 
+    __slots__ = ()
+
     @property
     def name(self):
         """Name of the concrete ``Factory`` as a string; used to label the container type in JSON."""
@@ -175,6 +297,11 @@ class Container(object):
         """Reweight the contents in all nested aggregators by a scalar factor, as though they had been filled with a different weight. The original is unaffected."""
         raise NotImplementedError
 
+    def __imul__(self, factor):
+        """Reweight the contents in all nested aggregators by a scalar factor in place, with the same result as ``self * factor`` but without allocating a new tree."""
+        self._transferFrom(self * factor)    # primitives override this with a direct in-place scaling
+        return self
+
     def fill(self, datum, weight=1.0):
         """Increment the aggregator by providing one ``datum`` to the fill rule with a given ``weight``.
       
@@ -189,19 +316,62 @@ class Container(object):
         raise NotImplementedError
 
     def __getstate__(self):
-        state = dict(self.__dict__)
-        del state["fill"]
-        del state["plot"]
+        state = dict(getattr(self, "__dict__", {}))
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
         return state
 
     def __setstate__(self, dict):
-        self.__dict__ = dict
-        self.fill = FillMethod(self, self.fill)
-        self.plot = PlotMethod(self, self.plot)
+        for name, value in dict.items():
+            if name not in ("fill", "plot"):    # skip per-object wrappers from old pickles
+                object.__setattr__(self, name, value)
 
     def copy(self):
-        """Copy this container, making a clone with no reference to the original. """
-        return self + self.zero()
+        """Copy this container, making a clone with no reference to the original.
+
+        This is a structural clone: configuration and functions are shared, while numbers are carried over and sub-aggregators, arrays and collections are copied, without building a ``zero()`` tree or going through ``+``. (Leaf primitives override it with an even more direct copy.)
+        """
+        out = object.__new__(type(self))
+        out.__setstate__(dict((k, _cloneValue(v)) for k, v in self.__getstate__().items()))
+        return out
+
+    def reset(self):
+        """Empty this container and all of its sub-aggregators in place, leaving it equal to ``zero()`` without allocating a new tree.
+
+        Bins that are created on demand (in ``SparselyBin`` and ``Categorize``) and the values of a ``Bag`` are dropped.
+        """
+        self.entries = 0.0
+        for x in self.children:
+            x.reset()
+
+    def snapshotAndReset(self, into=None):
+        """Return the current contents of this container and ``reset`` it for new fills, for publishing a histogram periodically while filling continues.
+
+        If ``into`` is given, it must be a previous snapshot of this container (or any container with the same structure and parameters); it is overwritten and returned instead of making a new ``copy()``. Alternating between the live container and one snapshot this way does not allocate: the arrays behind ``Bin`` values are copied into the snapshot's arrays, and the bins of ``SparselyBin`` and ``Categorize`` are swapped between the two (a double buffer) when the two have different bins.
+        """
+        if into is None:
+            out = self.copy()
+        elif type(into) is not type(self):
+            raise ContainerException("cannot snapshot {0} into {1}".format(self.name, into.name))
+        else:
+            into._transferFrom(self)
+            out = into
+        self.reset()
+        return out
+
+    def _transferFrom(self, other):
+        """Make ``self`` equal to ``other``, which has the same structure and is about to be reset, reusing ``self``'s objects; see ``snapshotAndReset``."""
+        mine = self.__getstate__()
+        for name, value in other.__getstate__().items():
+            old = mine.get(name)
+            if isinstance(value, dict) and type(old) is type(value) and (len(old) != len(value) or any(k not in old for k in value)):
+                # different keys (bins created on demand): exchange the dicts, since other's will be cleared
+                object.__setattr__(other, name, old)
+                object.__setattr__(self, name, value)
+            else:
+                object.__setattr__(self, name, _transferValue(old, value))
 
     @property
     def children(self):
@@ -222,6 +392,26 @@ class Container(object):
     def toJsonFile(self, fileName):
         return jsonlib.dump(self.toJson(), open(fileName, "w"))
 
+    def toBinaryFile(self, fileName):
+        with open(fileName, "wb") as file:
+            file.write(self.toBinary())
+
+    def toBinary(self):
+        """Convert this container to a compact binary form (bytes), which can be read back with ``Factory.fromBinary``.
+
+        The document begins with a JSON header that describes the tree: it is ``toJson()``, except that the values of dense ``Bin`` (see histogrammar.defs.DenseValues) and ``MultiBin`` are replaced by references to arrays. The arrays follow the header as contiguous little-endian float64, one per field (``entries``, ``sum``, ``mean``, etc.), so that large histograms are written and read without a Python object per bin. Numbers are stored exactly, so the round-trip gives the same result as JSON. (Requires Numpy.)
+        """
+        import numpy
+        _binaryOutput.arrays = []
+        _binaryOutput.length = 0
+        try:
+            header = jsonlib.dumps(self.toJson(), separators=(",", ":")).encode("utf-8")
+            arrays = _binaryOutput.arrays
+        finally:
+            _binaryOutput.arrays = None
+        header += b" " * (-len(header) % 8)
+        return b"".join([_binaryMagic, struct.pack("<Q", len(header)), header] + [numpy.ascontiguousarray(x, dtype="<f8").tobytes() for x in arrays])
+
     def toJsonString(self):
         return jsonlib.dumps(self.toJson())
 
@@ -240,6 +430,78 @@ class Container(object):
         """Return a copy of this container as though it was created by the ``ed`` function or from JSON (the \"immutable form\" in languages that support it, not Python)."""
         return Factory.fromJson(self.toJson())
 
+    def compileFill(self):
+        """Generate and compile a single Python function ``f(datum, weight=1.0)`` that fills this container exactly like ``fill``.
+
+        The generated source walks the whole tree inline, with bounds, bin widths, sub-aggregators and quantity functions bound as local variables, so filling costs one Python call per datum instead of several method calls per container. (The source is available as ``f.source``.)
+
+        Unlike ``fill``, the compiled function does not check that quantities are numbers, and it is tied to the current sub-aggregators: compile it again if any of them are replaced.
+        """
+        self._checkForCrossReferences()
+
+        env = {"isnan": math.isnan, "isinf": math.isinf, "floor": math.floor, "nan": float("nan"), "bisect_right": bisect.bisect_right}
+        tmpVars = []
+        fillCode = []
+        self._pyGenerateCode(env, tmpVars, fillCode, 12, self._pyConstant(env, "c", self), True, "weight")
+
+        names = sorted(env)
+        source = """def generate({0}):
+    def fill(datum, weight=1.0):
+        if weight > 0.0:
+{1}
+    return fill
+""".format(", ".join(names), "\n".join(fillCode))
+
+        namespace = {}
+        exec(compile(source, "<compiled fill of {0}>".format(self.name), "exec"), namespace)
+        out = namespace["generate"](**env)
+        out.source = source
+        return out
+
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        """Append Python source that fills the container named ``var`` with weight ``weightVar`` (known to be positive) to ``fillCode``.
+
+        If ``static``, ``var`` is bound to this very container; otherwise, it is any container with the same structure (such as one bin of a ``Bin``). Containers without a code generator just call their own ``fill``.
+        """
+        fillCode.append(" " * fillIndent + "{0}.fill(datum, {1})".format(var, weightVar))
+
+    def _pyGenerateFieldCode(self, env, tmpVars, fillCode, fillIndent, fields, weightVar):
+        """Like ``_pyGenerateCode``, for the aggregators that can be stored in ``DenseValues``: ``fields`` maps each of the ``_denseFields`` to an expression that reads and writes it, such as an element of an array."""
+        raise NotImplementedError
+
+    def _pyConstant(self, env, prefix, obj):
+        name = "{0}{1}".format(prefix, len(env))
+        env[name] = obj
+        return name
+
+    def _pyTemporary(self, tmpVars, prefix):
+        name = "{0}{1}".format(prefix, len(tmpVars))
+        tmpVars.append(name)
+        return name
+
+    def _pyQuantity(self, env, tmpVars, fillCode, fillIndent, quantity):
+        fcn = self._pyConstant(env, "fcn", quantity.asPython())
+        q = self._pyTemporary(tmpVars, "q")
+        fillCode.append(" " * fillIndent + "{0} = {1}(datum)".format(q, fcn))
+        return q
+
+    def _pyMember(self, env, tmpVars, fillCode, fillIndent, var, static, obj, expr):
+        """Name ``obj``, which is ``var + expr``: bound as a constant if ``var`` is static, and looked up into a temporary otherwise."""
+        if static:
+            return self._pyConstant(env, "c", obj)
+        else:
+            name = self._pyTemporary(tmpVars, "sub")
+            fillCode.append(" " * fillIndent + "{0} = {1}{2}".format(name, var, expr))
+            return name
+
+    def _pyChild(self, env, tmpVars, fillCode, fillIndent, var, static, child, expr, weightVar):
+        name = self._pyMember(env, tmpVars, fillCode, fillIndent, var, static, child, expr)
+        child._pyGenerateCode(env, tmpVars, fillCode, fillIndent, name, static, weightVar)
+
+    def _pyAppend(self, fillCode, fillIndent, source, **names):
+        for line in source.strip("\n").split("\n"):
+            fillCode.append(" " * fillIndent + line.format(**names))
+
     _clingClassNameNumber = 0
     def fillroot(self, ttree, start=-1, end=-1, debug=False, debugOnError=True, **exprs):
         self._checkForCrossReferences()
@@ -1067,10 +1329,148 @@ int main(int argc, char** argv) {{
     def _cudaStorageType(self):
         return self._c99StructName()
 
-    def fillnumpy(self, data):
+    def fillmany(self, iterable, weights=None, batch=None):
+        """Fill this container with every datum in ``iterable``, each with the corresponding item of ``weights`` (or weight 1 if ``weights`` is ``None``).
+
+        The tree is compiled once with ``compileFill``, so each datum costs a single function call. If ``batch`` is a number, the data are instead gathered into batches of that size, transposed into columns (dicts and objects become dicts of Numpy arrays of their fields) and filled with the Numpy engine; if a batch can't be filled that way (e.g. a quantity that doesn't work on arrays), it and the rest of the data are filled one datum at a time.
+        """
+        self._checkForCrossReferences()
+
+        if batch is None:
+            fill = self.compileFill()
+            if weights is None:
+                for datum in iterable:
+                    fill(datum)
+            else:
+                weights = iter(weights)
+                for datum in iterable:
+                    fill(datum, next(weights))
+            return
+
+        import numpy
+        data = iter(iterable)
+        weights = itertools.repeat(1.0) if weights is None else iter(weights)
+        fill = None
+        while True:
+            chunk = list(itertools.islice(data, batch))
+            if len(chunk) == 0:
+                break
+            chunkWeights = list(itertools.islice(weights, len(chunk)))
+
+            # fill skips data whose weight is not positive, but the Numpy engine would count them in entries
+            if any(not weight > 0.0 for weight in chunkWeights) or len(chunkWeights) < len(chunk):
+                kept = [(datum, weight) for datum, weight in zip(chunk, chunkWeights) if weight > 0.0]
+                chunk = [datum for datum, weight in kept]
+                chunkWeights = [weight for datum, weight in kept]
+                if len(chunk) == 0:
+                    continue
+
+            if fill is None:
+                try:
+                    columns = self._npColumns(chunk)
+                    partial = self.zero()
+                    with _BatchQuantityCache():
+                        partial._numpy(columns, numpy.array(chunkWeights, dtype=numpy.float64), [None])
+                except _NotVectorizable:
+                    fill = self.compileFill()
+                else:
+                    self.__iadd__(partial)
+                    continue
+
+            for datum, weight in zip(chunk, chunkWeights):
+                fill(datum, weight)
+
+    @staticmethod
+    def _npColumns(data):
+        """Transpose a list of dicts, objects with fields, or scalars into columnar data for ``_numpy``; raise ``_NotVectorizable`` if the data don't all have the same fields and shapes."""
+        import numpy
+        try:
+            if isinstance(data[0], dict):
+                return dict((k, numpy.array([x[k] for x in data])) for k in data[0])
+            elif hasattr(data[0], "__dict__"):
+                return dict((k, numpy.array([getattr(x, k) for x in data])) for k in vars(data[0]))
+            else:
+                return numpy.array(data)
+        except (KeyError, AttributeError, ValueError) as err:
+            raise _NotVectorizable(err)
+
+    def fillnumpy(self, data, cache=None, float32=False, threads=None, chunksize=None):
+        """Fill this container with columnar ``data`` (a dict of Numpy arrays, a record array, or a Pandas DataFrame).
+
+        String quantities are translated into Numpy programs (see ``histogrammar.util.compileNumpyFcn``), which compute in single precision if ``float32``. Each distinct quantity is evaluated once per data selection and shared among all containers that use it; pass a ``histogrammar.util.QuantityCache`` as ``cache`` to read its ``hits`` and ``misses`` afterward (its own ``float32`` setting is used instead of ``float32``).
+
+        If ``threads`` or ``chunksize`` is given, the data are split into chunks of ``chunksize`` rows (by default, one chunk per thread), which a pool of ``threads`` threads fills into separate ``zero()`` copies of this container. (Numpy releases the GIL for most of the work.) The copies are added together in chunk order, so the result does not depend on thread scheduling, and this container is only changed if every chunk succeeds.
+        """
         import numpy
         self._checkForCrossReferences()
-        self._numpy(data, 1.0, [None])
+        if threads is not None and threads < 1:
+            raise ValueError("threads ({0}) must be at least 1".format(threads))
+        if chunksize is not None and chunksize < 1:
+            raise ValueError("chunksize ({0}) must be at least 1".format(chunksize))
+        if cache is None:
+            cache = QuantityCache(float32)
+
+        chunks = None
+        if threads is not None or chunksize is not None:
+            length = self._npLength(data)
+            if length is not None and length > 0:
+                if chunksize is None:
+                    chunksize = int(math.ceil(length / float(threads)))
+                chunks = [self._sliceNPData(data, slice(i, i + chunksize), [length]) for i in xrange(0, length, chunksize)]
+                if any(x is None for x in chunks):
+                    chunks = None
+
+        if chunks is None:
+            with cache:
+                self._numpy(data, 1.0, [None])
+            return
+
+        def fillChunk(chunk):
+            partial = self.zero()
+            chunkCache = QuantityCache(cache.float32)
+            with chunkCache:
+                partial._numpy(chunk, 1.0, [None])
+            return partial, chunkCache.hits, chunkCache.misses
+
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(1 if threads is None else threads)
+        try:
+            total = None
+            for partial, hits, misses in pool.imap(fillChunk, chunks):
+                if total is None:
+                    total = partial
+                else:
+                    total += partial
+                cache.hits += hits
+                cache.misses += misses
+        finally:
+            pool.terminate()
+
+        # no possibility of exception from here on out (for rollback)
+        self.__iadd__(total)
+
+    def _npLength(self, data):
+        """Number of rows in columnar ``data``, or ``None`` if it can't be determined."""
+        import numpy
+        if isinstance(data, numpy.ndarray):
+            return data.shape[0] if len(data.shape) > 0 else None
+        elif isinstance(data, dict):
+            for v in data.values():
+                if isinstance(v, numpy.ndarray) and len(v.shape) > 0:
+                    return v.shape[0]
+            return None
+        elif hasattr(data, "columns") and hasattr(data, "iloc"):
+            return len(data)
+        else:
+            return None
+
+    def _npQuantity(self, fcn, data):
+        """Evaluate ``fcn(data)``, sharing the result through the quantity cache of the current ``fillnumpy`` pass."""
+        cache = QuantityCache.active()
+        if cache is None:
+            return fcn.vectorized(data)
+        else:
+            return cache(fcn, data)
 
     def _checkNPQuantity(self, q, shape):
         import numpy
@@ -1094,6 +1494,138 @@ int main(int argc, char** argv) {{
         else:
             return weights * numpy.ones(shape, dtype=numpy.float64)
 
+    def _sliceNPData(self, data, rows, shape):
+        """Select ``rows`` (an array of row numbers) from columnar ``data`` of length ``shape[0]``; return ``None`` if the data structure can't be sliced."""
+        import numpy
+        if isinstance(data, numpy.ndarray):
+            return data[rows]
+
+        elif isinstance(data, dict):
+            out = {}
+            for k, v in data.items():
+                if isinstance(v, numpy.ndarray) and len(v.shape) > 0 and v.shape[0] == shape[0]:
+                    out[k] = v[rows]
+                elif isinstance(v, (list, tuple)) and len(v) == shape[0]:
+                    return None
+                else:
+                    out[k] = v
+            return out
+
+        else:
+            try:
+                import pandas
+            except ImportError:
+                return None
+            if isinstance(data, pandas.core.frame.DataFrame):
+                return data.iloc[rows]
+            else:
+                return None
+
+    def _momentsNP(self, q, weights, groups=None, numGroups=1, order=2, skipnan=False):
+        """Compute the weighted moments of ``q`` in each group with one ``bincount`` per moment, without boolean-indexed copies.
+
+        Rows with non-positive weight or ``groups == numGroups`` are excluded. Without ``groups``, all rows are in group ``0``.
+
+        Returns ``(sumw, sumwq)`` for ``order=1`` and ``(sumw, sumwq, m2)`` for ``order=2``, where ``m2`` is the sum of ``w*(q - mean)**2``; each is an array of length ``numGroups + 1``. The second moment is accumulated relative to the first finite value in each group to avoid cancellation. If ``skipnan``, NaN quantities are left out of ``sumwq`` (but not ``sumw``).
+        """
+        import numpy
+        if groups is None:
+            groups = numpy.zeros(q.shape, dtype=numpy.int64)
+        groups = numpy.where(weights > 0.0, groups, numGroups)
+        minlength = numGroups + 1
+
+        sumw = numpy.bincount(groups, weights=weights, minlength=minlength)
+
+        if order == 1:
+            wq = q * weights
+            if skipnan:
+                wq[numpy.isnan(q)] = 0.0
+            return sumw, numpy.bincount(groups, weights=wq, minlength=minlength)
+
+        # the first finite value in each group (assignment with repeated indexes keeps the last, so go backward)
+        shift = numpy.zeros(minlength, dtype=numpy.float64)
+        finite = numpy.nonzero(numpy.isfinite(q))[0][::-1]
+        shift[groups[finite]] = q[finite]
+
+        delta = q - shift[groups]
+        wdelta = delta * weights
+        sumwdelta = numpy.bincount(groups, weights=wdelta, minlength=minlength)
+        wdelta *= delta
+        sumwdelta2 = numpy.bincount(groups, weights=wdelta, minlength=minlength)
+
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            sumwq = sumw*shift + sumwdelta
+            m2 = sumwdelta2 - sumwdelta*sumwdelta/sumw
+        return sumw, sumwq, m2
+
+    def _fillNPGroups(self, data, weights, shape, groups, subs):
+        """Fill each sub-aggregator ``subs[i]`` with the rows whose ``groups`` value is ``i``; rows with ``groups == len(subs)`` are dropped.
+
+        With a single sub-aggregator, this passes a selection down the tree: the sub-aggregator evaluates its quantities only on the selected rows.
+
+        Count leaves are filled with one ``bincount`` over all groups, and Sum, Average and Deviate leaves with one ``bincount`` per moment (see ``_momentsNP``). Other sub-aggregators are handed only their own rows (so the cost scales with the number of rows, not the number of groups times the number of rows), unless ``data`` can't be sliced, in which case they get full-length weights that are zero outside the group.
+        """
+        import numpy
+        from histogrammar.primitives.count import Count
+
+        numGroups = len(subs)
+        counts = numpy.bincount(groups, minlength=numGroups + 1)
+
+        countSums = {}
+        quantities = {}
+        moments = {}
+        order = None
+        sliceable = None
+        for i, sub in enumerate(subs):
+            if counts[i] == 0:
+                continue
+
+            if isinstance(sub, Count):
+                key = id(sub.transform)
+                if key not in countSums:
+                    if sub.transform is identity:
+                        countSums[key] = numpy.bincount(groups, weights=weights, minlength=numGroups + 1)
+                    else:
+                        countSums[key] = numpy.bincount(groups, weights=sub.transform(weights), minlength=numGroups + 1)
+                sub.entries += float(countSums[key][i])
+                continue
+
+            if getattr(sub, "_npMoments", None) is not None:
+                momentsOrder, skipnan = sub._npMoments
+                key = (id(sub.quantity), momentsOrder, skipnan)
+                if key not in moments:
+                    if id(sub.quantity) not in quantities:
+                        q = self._npQuantity(sub.quantity, data)
+                        sub._checkNPQuantity(q, list(shape))
+                        quantities[id(sub.quantity)] = numpy.asarray(q, dtype=numpy.float64)
+                    moments[key] = self._momentsNP(quantities[id(sub.quantity)], weights, groups, numGroups, momentsOrder, skipnan)
+                sub._mergeNPMoments(*[float(x[i]) for x in moments[key]])
+                continue
+
+            if counts[i] == len(groups):
+                # every row is in this group: nothing to select
+                sub._numpy(data, weights, shape)
+                continue
+
+            if numGroups == 1:
+                rows = numpy.nonzero(groups == 0)[0]
+            else:
+                if order is None:
+                    order = numpy.argsort(groups, kind="mergesort")
+                    offsets = numpy.concatenate(([0], numpy.cumsum(counts)))
+                rows = order[offsets[i]:offsets[i + 1]]
+
+            if sliceable is None or sliceable:
+                subdata = self._sliceNPData(data, rows, shape)
+                sliceable = subdata is not None
+
+            if sliceable:
+                sub._numpy(subdata, weights[rows], [len(rows)])
+            else:
+                subweights = numpy.zeros(weights.shape, dtype=numpy.float64)
+                subweights[rows] = weights[rows]
+                sub._numpy(data, subweights, shape)
+
     def fillsparksql(self, df):
         converter = df._sc._jvm.org.dianahep.histogrammar.sparksql.pyspark.AggregatorConverter()
         agg = self._sparksql(df._sc._jvm, converter)
@@ -1101,6 +1633,304 @@ int main(int argc, char** argv) {{
         delta = Factory.fromJson(jsonlib.loads(result.toJsonString()))
         self += delta
 
+def _detachedView(copy):
+    # views are pickled as an independent copy of the aggregator they represent
+    return copy
+
+class DenseValues(object):
+    """Sequence of identically configured ``Count``, ``Sum``, ``Average`` or ``Deviate`` aggregators, stored as one contiguous Numpy array per field.
+
+    ``Bin`` uses this instead of a list of objects when Numpy is available and its values are one of these primitives, so that a large histogram is cheap to construct, copy, add, scale and compare. Indexing returns a lightweight view: an instance of (a subclass of) the aggregator's class whose fields read and write the arrays.
+    """
+
+    _viewClasses = {}
+
+    def __init__(self, prototype, arrays):
+        self.prototype = prototype
+        self.arrays = arrays
+        self._memory = None
+        self._cell = None
+
+    def __getstate__(self):
+        return {"prototype": self.prototype, "arrays": self.arrays}
+
+    def __setstate__(self, state):
+        self.__init__(state["prototype"], state["arrays"])
+
+    def memoryviews(self):
+        """Return a dict from each field to a ``memoryview`` of its array, which reads and writes single elements as Python floats much faster than Numpy indexing. (The arrays are always modified in place, so these stay valid.)"""
+        if self._memory is None:
+            self._memory = dict((field, memoryview(array)) for field, array in self.arrays.items())
+        return self._memory
+
+    @staticmethod
+    def _leafClass(value):
+        cls = type(value)
+        cls = cls.__dict__.get("_denseBase", cls)    # views stand in for their aggregator's class
+        if "_denseFields" not in cls.__dict__:
+            return None
+        return cls
+
+    @staticmethod
+    def _config(value):
+        # the functions are the only configuration that Count, Sum, Average and Deviate have
+        return (getattr(value, "quantity", None), getattr(value, "transform", None))
+
+    @staticmethod
+    def accepts(value):
+        """Return ``True`` iff ``value``'s type can be stored densely (and Numpy is available)."""
+        if value is None or DenseValues._leafClass(value) is None:
+            return False
+        try:
+            import numpy
+        except ImportError:
+            return False
+        return True
+
+    @staticmethod
+    def zeros(value, num):
+        """Create ``num`` empty aggregators like ``value``, or return ``None`` if they can't be stored densely."""
+        if not DenseValues.accepts(value):
+            return None
+        import numpy
+        prototype = value.zero()
+        return DenseValues(prototype, dict((field, numpy.full(num, initial, dtype=numpy.float64)) for field, initial in type(prototype)._denseFields))
+
+    @staticmethod
+    def pack(values):
+        """Convert a list of aggregators into ``DenseValues``, or return the list if they can't be stored densely (different types or functions)."""
+        if len(values) == 0 or not DenseValues.accepts(values[0]):
+            return values
+        prototype = values[0].zero()
+        cls = DenseValues._leafClass(values[0])
+        config = DenseValues._config(values[0])
+        if any(DenseValues._leafClass(v) is not cls or DenseValues._config(v) != config for v in values):
+            return values
+        import numpy
+        return DenseValues(prototype, dict((field, numpy.array([getattr(v, field) for v in values], dtype=numpy.float64)) for field, initial in cls._denseFields))
+
+    @staticmethod
+    def compatible(one, two):
+        return isinstance(one, DenseValues) and isinstance(two, DenseValues) and len(one) == len(two) and type(one.prototype) is type(two.prototype) and one.prototype == two.prototype
+
+    def _view(self, index):
+        cls = type(self.prototype)
+        viewClass = DenseValues._viewClasses.get(cls)
+        if viewClass is None:
+            def field(name):
+                def getter(self):
+                    return float(self._dense.arrays[name][self._index])
+                def setter(self, value):
+                    self._dense.arrays[name][self._index] = value
+                return property(getter, setter)
+
+            def __getattr__(self, name):
+                if name.startswith("__"):
+                    raise AttributeError(name)
+                return getattr(self._dense.prototype, name)
+
+            def __reduce_ex__(self, protocol):
+                return (_detachedView, (self.copy(),))
+
+            namespace = dict((name, field(name)) for name, initial in cls._denseFields)
+            namespace["__getattr__"] = __getattr__
+            namespace["__reduce_ex__"] = __reduce_ex__
+            namespace["_checkedForCrossReferences"] = True
+            namespace["_denseBase"] = cls
+            viewClass = DenseValues._viewClasses[cls] = type(cls.__name__, (cls,), namespace)
+
+        out = object.__new__(viewClass)
+        out._dense = self
+        out._index = index
+        return out
+
+    def __len__(self):
+        return len(self.arrays["entries"])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._view(i) for i in xrange(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("DenseValues index out of range")
+        return self._view(index)
+
+    def __setitem__(self, index, value):
+        if type(value) is not type(self.prototype) and not isinstance(value, type(self.prototype)):
+            raise ContainerException("cannot put a {0} in a sequence of {1}".format(value.name, self.prototype.name))
+        for field, initial in type(self.prototype)._denseFields:
+            self.arrays[field][index] = getattr(value, field)
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self._view(i)
+
+    def fill(self, index, datum, weight=1.0):
+        """Fill the aggregator at ``index`` exactly like its own ``fill``, but without making a view: its numbers are loaded into a scratch aggregator, filled, and written back."""
+        if self._cell is None:
+            memory = self.memoryviews()
+            self._cell = (self.prototype.copy(), [(field, memory[field]) for field, initial in type(self.prototype)._denseFields])
+        cell, fields = self._cell
+        for field, memory in fields:
+            setattr(cell, field, memory[index])
+        cell.fill(datum, weight)
+        # no possibility of exception from here on out (for rollback)
+        for field, memory in fields:
+            memory[index] = getattr(cell, field)
+
+    def zero(self):
+        return DenseValues.zeros(self.prototype, len(self))
+
+    def copy(self):
+        return DenseValues(self.prototype, dict((k, v.copy()) for k, v in self.arrays.items()))
+
+    def reset(self):
+        for field, initial in type(self.prototype)._denseFields:
+            self.arrays[field].fill(initial)
+
+    @staticmethod
+    def binaryFragment(prototype, arrays):
+        """If a ``toBinary`` is in progress, set ``arrays`` (dict from each of ``prototype``'s fields to a sequence of numbers) aside for its output and return the JSON fragment that refers to them, to be used in place of a list of per-bin fragments; otherwise, return ``None``."""
+        output = getattr(_binaryOutput, "arrays", None)
+        if output is None:
+            return None
+        references = {}
+        for field, initial in type(prototype)._denseFields:
+            references[field] = {"<f8": [_binaryOutput.length, len(arrays[field])]}
+            output.append(arrays[field])
+            _binaryOutput.length += len(arrays[field])
+        return {"zero": prototype.toJsonFragment(True), "arrays": references}
+
+    @staticmethod
+    def fromBinaryFragment(prototype, json):
+        """Inverse of ``binaryFragment`` during a ``Factory.fromBinary``: ``json`` maps each field to a reference to one of the document's arrays, and ``prototype`` is the aggregator made from the ``"zero"`` fragment."""
+        import numpy
+        arrays = getattr(_binaryInput, "arrays", None)
+        if arrays is None:
+            raise JsonFormatException(json, "DenseValues (array references can only be read by Factory.fromBinary)")
+        cls = DenseValues._leafClass(prototype)
+        if cls is None or not isinstance(json, dict):
+            raise JsonFormatException(json, "DenseValues")
+        fields = [field for field, initial in cls._denseFields]
+        if set(json.keys()) != set(fields):
+            raise JsonFormatException(json, "DenseValues.arrays")
+        out = {}
+        for field in fields:
+            reference = json[field]
+            if not isinstance(reference, dict) or list(reference.keys()) != ["<f8"] or not isinstance(reference["<f8"], list) or len(reference["<f8"]) != 2 or not all(isinstance(x, (int, long)) and x >= 0 for x in reference["<f8"]):
+                raise JsonFormatException(reference, "DenseValues.arrays")
+            offset, size = reference["<f8"]
+            if offset + size > len(arrays):
+                raise ContainerException("binary document is truncated")
+            out[field] = arrays[offset : offset + size].astype(numpy.float64)
+        if len(set(len(x) for x in out.values())) != 1 or len(out[fields[0]]) < 1:
+            raise JsonFormatException(json, "DenseValues.arrays")
+        return DenseValues(prototype.zero(), out)
+
+    def __add__(self, other):
+        if isinstance(other, (list, tuple)):
+            # concatenate, like a list
+            return list(self) + list(other)
+        if not isinstance(other, DenseValues):
+            return NotImplemented
+        if not DenseValues.compatible(self, other):
+            return [x + y for x, y in zip(self, other)]
+        import numpy
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            return DenseValues(self.prototype, type(self.prototype)._denseAdd(self.arrays, other.arrays))
+
+    def __radd__(self, other):
+        if isinstance(other, (list, tuple)):
+            return list(other) + list(self)
+        return NotImplemented
+
+    def __iadd__(self, other):
+        if not isinstance(other, DenseValues):
+            return NotImplemented
+        if not DenseValues.compatible(self, other):
+            for x, y in zip(self, other):
+                x += y
+            return self
+        both = self + other
+        for k, v in both.arrays.items():
+            self.arrays[k][:] = v
+        return self
+
+    def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    def __imul__(self, factor):
+        self.prototype * factor    # raises if the aggregator can't be scaled
+        if math.isnan(factor) or factor <= 0.0:
+            self.reset()
+        else:
+            type(self.prototype)._denseScale(self.arrays, factor)
+        return self
+
+    def __rmul__(self, factor):
+        return self.__mul__(factor)
+
+    def __eq__(self, other):
+        if DenseValues.compatible(self, other):
+            return all(DenseValues._numeq(self.arrays[k], other.arrays[k]) for k in self.arrays)
+        try:
+            return len(self) == len(other) and all(x == y for x, y in zip(self, other))
+        except TypeError:
+            return False
+
+    def __ne__(self, other): return not self == other
+
+    def __hash__(self):
+        return hash((self.prototype,) + tuple((k, self.arrays[k].tobytes()) for k in sorted(self.arrays)))
+
+    @staticmethod
+    def _numeq(x, y):
+        """Vectorized histogrammar.util.numeq; true iff all elements are equal."""
+        import numpy
+        relativeTolerance = histogrammar.util.relativeTolerance
+        absoluteTolerance = histogrammar.util.absoluteTolerance
+        with numpy.errstate(invalid="ignore"):
+            diff = numpy.abs(x - y)
+            scale = numpy.maximum(numpy.abs(x), numpy.abs(y))
+            if relativeTolerance > 0.0 and absoluteTolerance > 0.0:
+                close = diff <= numpy.maximum(relativeTolerance * scale, absoluteTolerance)
+            elif relativeTolerance > 0.0:
+                close = diff <= relativeTolerance * scale
+            elif absoluteTolerance > 0.0:
+                close = diff <= absoluteTolerance
+            else:
+                close = x == y
+        infs = numpy.isinf(x) & numpy.isinf(y)
+        close[infs] = (x[infs] > 0.0) == (y[infs] > 0.0)
+        close |= numpy.isnan(x) & numpy.isnan(y)
+        return bool(close.all())
+
+    def __repr__(self):
+        return "<DenseValues {0} x {1}>".format(len(self), self.prototype.name)
+
+    def _fillNPGroups(self, container, data, weights, shape, groups):
+        """Fill the aggregator at each index ``i`` with the rows whose ``groups`` value is ``i``; rows with other values are dropped."""
+        import numpy
+        from histogrammar.primitives.count import Count
+        num = len(self)
+        groups = numpy.where(groups < num, groups, num)
+
+        if isinstance(self.prototype, Count):
+            if self.prototype.transform is not identity:
+                weights = self.prototype.transform(weights)
+            self.arrays["entries"] += numpy.bincount(groups, weights=weights, minlength=num + 1)[:num]
+
+        else:
+            order, skipnan = self.prototype._npMoments
+            q = container._npQuantity(self.prototype.quantity, data)
+            self.prototype._checkNPQuantity(q, list(shape))
+            moments = container._momentsNP(numpy.asarray(q, dtype=numpy.float64), weights, groups, num, order, skipnan)
+            with numpy.errstate(invalid="ignore", divide="ignore"):
+                type(self.prototype)._denseMergeNPMoments(self.arrays, *[x[:num] for x in moments])
+
 # useful functions
 
 unweighted = named("unweighted", lambda datum: 1.0)
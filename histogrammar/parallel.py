@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fill containers with arbitrary Python quantities in a pool of local processes.
+
+Each worker receives the empty tree once per fill, compiles it with ``compileFill``, fills it from batches of data streamed through a shared queue, and returns its partial sum, which are combined with ``+`` in a balanced tree. (For large trees of sums, ``fillShared`` returns the partial sums through shared memory instead.) Workers are started once per pool and reused by subsequent fills.
+
+**Example:**
+
+::
+
+    import histogrammar.parallel
+    h = Bin(100, 0, 100, lambda event: expensive(event))
+    report = histogrammar.parallel.fill(h, events, processes=8)
+"""
+
+import atexit
+import itertools
+import multiprocessing
+import pickle
+import time
+import traceback
+
+try:
+    from queue import Empty, Full
+except ImportError:
+    from Queue import Empty, Full
+
+from histogrammar.defs import ContainerException, DenseValues
+from histogrammar.primitives.bin import Bin
+from histogrammar.primitives.centrallybin import CentrallyBin
+from histogrammar.primitives.collection import Label, UntypedLabel, Index, Branch
+from histogrammar.primitives.count import Count
+from histogrammar.primitives.fraction import Fraction
+from histogrammar.primitives.irregularlybin import IrregularlyBin
+from histogrammar.primitives.select import Select
+from histogrammar.primitives.stack import Stack
+from histogrammar.primitives.sum import Sum
+
+def _worker(index, control, tasks, results):
+    while True:
+        message = control.get()
+        if message is None:
+            return
+
+        message, shared = message
+        container = pickle.loads(message)
+        error = None
+        try:
+            fill = container.compileFill()
+        except Exception:
+            error = traceback.format_exc()
+
+        entries = 0
+        batches = 0
+        seconds = 0.0
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            if error is not None:
+                continue    # keep draining the queue so that the parent doesn't block
+
+            data, weights = task
+            startTime = time.time()
+            try:
+                if weights is None:
+                    for datum in data:
+                        fill(datum)
+                else:
+                    for datum, weight in zip(data, weights):
+                        fill(datum, weight)
+            except Exception:
+                error = traceback.format_exc()
+            seconds += time.time() - startTime
+            entries += len(data)
+            batches += 1
+
+        if error is None and shared is not None:
+            try:
+                _writeShared(container, index, *shared)
+            except Exception:
+                error = traceback.format_exc()
+
+        if error is not None:
+            results.put((index, None, entries, batches, seconds, error))
+        elif shared is not None:
+            results.put((index, None, entries, batches, seconds, None))
+        else:
+            results.put((index, pickle.dumps(container, pickle.HIGHEST_PROTOCOL), entries, batches, seconds, None))
+
+class _Layout(object):
+    """Positions of every additive number in a tree, in a deterministic order: first the scalars, as (container, attribute) pairs, then the Numpy arrays of densely stored ``Bin`` values, so that each array is copied as one block."""
+
+    def __init__(self, container):
+        self.scalars = []
+        self.arrays = []
+        self._add(container)
+        self.length = len(self.scalars) + sum(len(x) for x in self.arrays)
+
+    def _add(self, container):
+        if isinstance(container, Count):
+            self.scalars.append((container, "entries"))
+        elif isinstance(container, Sum):
+            self.scalars.append((container, "entries"))
+            self.scalars.append((container, "sum"))
+        elif isinstance(container, Bin) and isinstance(container.values, DenseValues) and isinstance(container.values.prototype, (Count, Sum)):
+            self.scalars.append((container, "entries"))
+            for field, initial in type(container.values.prototype)._denseFields:
+                self.arrays.append(container.values.arrays[field])
+            for child in (container.underflow, container.overflow, container.nanflow):
+                self._add(child)
+        elif isinstance(container, (Bin, CentrallyBin, IrregularlyBin, Stack, Select, Fraction, Label, UntypedLabel, Index, Branch)):
+            self.scalars.append((container, "entries"))
+            for child in container.children:
+                self._add(child)
+        else:
+            raise ContainerException("{0} can't be aggregated in shared memory because its state is not a fixed set of sums; use histogrammar.parallel.fill instead".format(container.name))
+
+    def read(self, row):
+        """Copy the numbers from the tree into ``row``, a Numpy array of ``length``."""
+        import numpy
+        row[:len(self.scalars)] = numpy.fromiter((getattr(obj, attr) for obj, attr in self.scalars), dtype=numpy.float64, count=len(self.scalars))
+        start = len(self.scalars)
+        for array in self.arrays:
+            row[start : start + len(array)] = array
+            start += len(array)
+
+    def write(self, row):
+        """Copy the numbers in ``row`` into the tree."""
+        for (obj, attr), value in zip(self.scalars, row[:len(self.scalars)].tolist()):
+            setattr(obj, attr, value)
+        start = len(self.scalars)
+        for array in self.arrays:
+            array[:] = row[start : start + len(array)]
+            start += len(array)
+
+def _writeShared(container, index, name, length):
+    import numpy
+    from multiprocessing import shared_memory
+    try:
+        segment = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13, attaching registers the segment for cleanup as though this process owned it
+        from multiprocessing import resource_tracker
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+    try:
+        rows = numpy.ndarray((index + 1, length), dtype=numpy.float64, buffer=segment.buf)
+        _Layout(container).read(rows[index])
+        del rows
+    finally:
+        segment.close()
+
+class SharedAggregate(object):
+    """Result of histogrammar.parallel.Pool.fillShared: the sum over workers of every additive number in the tree, as one flat Numpy array.
+
+    Call ``materialize`` to turn it into a normal container.
+    """
+
+    def __init__(self, container, values, reports):
+        self.container = container
+        self.values = values
+        self.reports = reports
+
+    def materialize(self):
+        """Return a new container (a ``zero()`` of the one that was filled) that holds the aggregated values."""
+        out = self.container.zero()
+        _Layout(out).write(self.values)
+        return out
+
+class Pool(object):
+    """A set of worker processes that fill containers in parallel; start it once and call ``fill`` as many times as needed.
+
+    Usually, the module-level histogrammar.parallel.fill (which keeps one pool per number of processes) is more convenient. A ``Pool`` can be used as a context manager to stop its workers at the end of a block.
+    """
+
+    def __init__(self, processes=None):
+        """Start ``processes`` workers (default: the number of CPUs)."""
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if processes < 1:
+            raise ValueError("processes ({0}) must be at least 1".format(processes))
+        self.processes = processes
+
+        self._tasks = multiprocessing.Queue(2 * processes)
+        self._results = multiprocessing.Queue()
+        self._controls = []
+        self._workers = []
+        for index in range(processes):
+            control = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=_worker, args=(index, control, self._tasks, self._results))
+            worker.daemon = True
+            worker.start()
+            self._controls.append(control)
+            self._workers.append(worker)
+
+    def fill(self, container, iterable, weights=None, batch=1000):
+        """Fill ``container`` with every datum in ``iterable`` (each with the corresponding item of ``weights``, if given), in batches of ``batch`` data.
+
+        The container is changed in place only if every worker succeeds. Returns a list of per-worker reports: dicts with the number of ``entries`` and ``batches`` that worker filled, the ``seconds`` it spent filling, and its ``rate`` in entries per second.
+        """
+        partials, reports = self._run(container, iterable, weights, batch, None)
+
+        while len(partials) > 1:
+            partials = [partials[i] + partials[i + 1] if i + 1 < len(partials) else partials[i] for i in range(0, len(partials), 2)]
+
+        # no possibility of exception from here on out (for rollback)
+        container += partials[0]
+        return reports
+
+    def fillShared(self, container, iterable, weights=None, batch=1000):
+        """Fill a copy of ``container`` like ``fill``, but return the partial sums through shared memory instead of pickling them.
+
+        Only trees whose state is a fixed set of sums can be aggregated this way: ``Count``, ``Sum``, and ``Bin``, ``CentrallyBin``, ``IrregularlyBin``, ``Stack``, ``Select``, ``Fraction``, ``Label``, ``UntypedLabel``, ``Index``, and ``Branch`` of those. Each worker writes its numbers into its own row of a ``multiprocessing.shared_memory`` segment, and the rows are summed with Numpy in place.
+
+        Returns a histogrammar.parallel.SharedAggregate; ``container`` itself is not changed. (Requires Python 3.8 or later.)
+        """
+        import numpy
+        from multiprocessing import shared_memory
+
+        length = _Layout(container).length
+        segment = shared_memory.SharedMemory(create=True, size=max(1, self.processes * length * 8))
+        try:
+            rows = numpy.ndarray((self.processes, length), dtype=numpy.float64, buffer=segment.buf)
+            rows[:] = 0.0
+            partials, reports = self._run(container, iterable, weights, batch, (segment.name, length))
+            values = rows.sum(axis=0)
+            del rows
+        finally:
+            segment.close()
+            segment.unlink()
+
+        return SharedAggregate(container, values, reports)
+
+    def _run(self, container, iterable, weights, batch, shared):
+        if self._workers is None:
+            raise RuntimeError("Pool has been closed")
+        container._checkForCrossReferences()
+
+        message = (pickle.dumps(container.zero(), pickle.HIGHEST_PROTOCOL), shared)
+        for control in self._controls:
+            control.put(message)
+
+        try:
+            data = iter(iterable)
+            weights = None if weights is None else iter(weights)
+            while True:
+                chunk = list(itertools.islice(data, batch))
+                if len(chunk) == 0:
+                    break
+                self._put((chunk, None if weights is None else list(itertools.islice(weights, len(chunk)))))
+        except BaseException:
+            # the workers are still waiting for data: end their fills and discard the results, so that the pool can be reused
+            if self._workers is not None:
+                try:
+                    self._finish()
+                except BaseException:
+                    self.close()
+            raise
+
+        partials = [None] * self.processes
+        reports = [None] * self.processes
+        errors = []
+        for index, partial, entries, batches, seconds, error in self._finish():
+            if error is not None:
+                errors.append("worker {0}:\n{1}".format(index, error))
+            elif partial is not None:
+                partials[index] = pickle.loads(partial)
+            reports[index] = {"worker": index, "entries": entries, "batches": batches, "seconds": seconds, "rate": entries / seconds if seconds > 0.0 else float("nan")}
+
+        if len(errors) > 0:
+            raise ContainerException("parallel fill failed in {0} worker(s):\n{1}".format(len(errors), "\n".join(errors)))
+
+        return partials, reports
+
+    def _finish(self):
+        for worker in self._workers:
+            self._put(None)
+        return [self._get() for worker in self._workers]
+
+    def _checkWorkers(self):
+        for index, worker in enumerate(self._workers):
+            if not worker.is_alive():
+                self.close()
+                raise RuntimeError("parallel fill worker {0} died with exit code {1}".format(index, worker.exitcode))
+
+    def _put(self, task):
+        while True:
+            try:
+                self._tasks.put(task, timeout=1.0)
+                return
+            except Full:
+                self._checkWorkers()
+
+    def _get(self):
+        while True:
+            try:
+                return self._results.get(timeout=1.0)
+            except Empty:
+                self._checkWorkers()
+
+    def close(self):
+        """Stop all of the worker processes."""
+        if self._workers is not None:
+            workers, self._workers = self._workers, None
+            for control, worker in zip(self._controls, workers):
+                if worker.is_alive():
+                    control.put(None)
+            for worker in workers:
+                worker.join(1.0)
+                if worker.is_alive():
+                    worker.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+_pools = {}
+
+def fill(container, iterable, processes=None, weights=None, batch=1000):
+    """Fill ``container`` with every datum in ``iterable`` using ``processes`` worker processes (default: the number of CPUs).
+
+    Workers are started on first use and reused by subsequent calls with the same number of processes. See histogrammar.parallel.Pool.fill for the meaning of ``weights``, ``batch``, and the returned per-worker reports.
+    """
+    return _pool(processes).fill(container, iterable, weights, batch)
+
+def fillShared(container, iterable, processes=None, weights=None, batch=1000):
+    """Fill a copy of ``container`` with every datum in ``iterable`` using ``processes`` worker processes, aggregating through shared memory.
+
+    Returns a histogrammar.parallel.SharedAggregate; see histogrammar.parallel.Pool.fillShared.
+    """
+    return _pool(processes).fillShared(container, iterable, weights, batch)
+
+def _pool(processes):
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = _pools.get(processes)
+    if pool is None or pool._workers is None:
+        pool = _pools[processes] = Pool(processes)
+    return pool
+
+@atexit.register
+def _closePools():
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
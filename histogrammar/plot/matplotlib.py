@@ -36,10 +36,10 @@ def prepare2Dsparse(sparse):
     return yminBin, ymaxBin, ynum, ylow, yhigh
 
 def set2Dsparse(sparse, yminBin, ymaxBin, grid):
-    for i, iindex in enumerate(xrange(sparse.minBin, sparse.maxBin + 1)):
-        for j, jindex in enumerate(xrange(yminBin, ymaxBin + 1)):
-            if iindex in sparse.bins and jindex in sparse.bins[iindex].bins:
-                grid[j, i] = sparse.bins[iindex].bins[jindex].entries
+    # visit only the filled cells, not the whole rectangle
+    for iindex, column in sparse.bins.items():
+        for jindex, value in column.bins.items():
+            grid[jindex - yminBin, iindex - sparse.minBin] = value.entries
     return grid
 
 class HistogramMethods(object):
@@ -62,10 +62,10 @@ def prepareTH2sparse(sparse):
     return yminBin, ymaxBin, ynum, ylow, yhigh
 
 def setTH2sparse(sparse, yminBin, ymaxBin, th2):
-    for i, iindex in enumerate(xrange(sparse.minBin, sparse.maxBin + 1)):
-        for j, jindex in enumerate(xrange(yminBin, ymaxBin + 1)):
-            if iindex in sparse.bins and jindex in sparse.bins[iindex].bins:
-                th2.SetBinContent(i + 1, j + 1, sparse.bins[iindex].bins[jindex].entries)
+    # visit only the filled cells, not the whole rectangle
+    for iindex, column in sparse.bins.items():
+        for jindex, value in column.bins.items():
+            th2.SetBinContent(iindex - sparse.minBin + 1, jindex - yminBin + 1, value.entries)
 
 # "Public" methods; what we want to attach to the Histogram as a mix-in.
 
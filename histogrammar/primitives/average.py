@@ -28,6 +28,8 @@ class Average(Factory, Container):
     Uses the numerically stable weighted mean algorithm described in `"Incremental calculation of weighted mean and variance," <http://www-uxsup.csx.cam.ac.uk/~fanf2/hermes/doc/antiforgery/stats.pdf>`_ Tony Finch, *Univeristy of Cambridge Computing Service,* 2009.
     """
 
+    __slots__ = ("entries", "quantity", "mean", "_checkedForCrossReferences", "_clingFiller")
+
     @staticmethod
     def ed(entries, mean):
         """Create an Average that is only capable of being added.
@@ -72,6 +74,24 @@ class Average(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return Average(self.quantity)
 
+    @inheritdoc(Container)
+    def copy(self):
+        out = Average.__new__(Average)
+        out.quantity = self.quantity
+        out.entries = self.entries
+        out.mean = self.mean
+        out._checkedForCrossReferences = False
+        return out
+
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        self.mean = float("nan")
+
+    def _transferFrom(self, other):
+        self.entries = other.entries
+        self.mean = other.mean
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Average):
@@ -96,18 +116,47 @@ class Average(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.mean = self.mean
-            return out.specialize()
+            self.entries *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    # dense storage in a Bin (see histogrammar.defs.DenseValues)
+    _denseFields = (("entries", 0.0), ("mean", float("nan")))
+
+    @staticmethod
+    def _denseAdd(x, y):
+        import numpy
+        ca, ma = x["entries"], x["mean"]
+        cb, mb = y["entries"], y["mean"]
+        mean = numpy.where(ca == 0.0, mb, numpy.where(cb == 0.0, ma, (ca*ma + cb*mb)/(ca + cb)))
+        return {"entries": ca + cb, "mean": mean}
+
+    @staticmethod
+    def _denseScale(x, factor):
+        x["entries"] *= factor
+
+    @staticmethod
+    def _denseMergeNPMoments(x, sumw, sumwq):
+        import numpy
+        ca = x["entries"].copy()
+        ma = numpy.where(ca == 0.0, 0.0, x["mean"])
+        x["entries"] += sumw
+        ca_plus_cb = x["entries"]
+        mean = (ca*ma + (ca_plus_cb - ca)*(sumwq / sumw)) / ca_plus_cb
+        x["mean"][:] = numpy.where(numpy.isinf(ca_plus_cb), float("nan"), numpy.where(sumw > 0.0, mean, x["mean"]))
+
     @inheritdoc(Container)
     def fill(self, datum, weight=1.0):
         self._checkForCrossReferences()
@@ -253,29 +302,54 @@ class Average(Factory, Container):
         self.mean = mean
         return data[struct.calcsize(format):]
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        self._pyGenerateFieldCode(env, tmpVars, fillCode, fillIndent, dict((field, var + "." + field) for field, initial in self._denseFields), weightVar)
+
+    def _pyGenerateFieldCode(self, env, tmpVars, fillCode, fillIndent, fields, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+        self._pyAppend(fillCode, fillIndent, """
+if {entries} == 0.0:
+    {mean} = {q}
+{entries} += {w}
+if isnan({mean}) or isnan({q}):
+    {mean} = nan
+elif isinf({mean}) or isinf({q}):
+    if isinf({mean}) and isinf({q}) and {mean} * {q} < 0.0:
+        {mean} = nan
+    elif isinf({q}):
+        {mean} = {q}
+    if isinf({entries}) or isnan({entries}):
+        {mean} = nan
+else:
+    {mean} += ({q} - {mean}) * {w} / {entries}
+""", q=q, w=weightVar, **fields)
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
 
+        import numpy
+        sumw, sumwq = self._momentsNP(numpy.asarray(q, dtype=numpy.float64), weights, order=1)
+
         # no possibility of exception from here on out (for rollback)
+        self._mergeNPMoments(float(sumw[0]), float(sumwq[0]))
+
+    _npMoments = (1, False)
+
+    def _mergeNPMoments(self, sumw, sumwq):
         ca, ma = self.entries, self.mean
         if ca == 0.0:
             ma = 0.0
 
-        import numpy
-        selection = weights > 0.0
-        q = q[selection]
-        weights = weights[selection]
-
-        self.entries += float(weights.sum())
+        self.entries += sumw
         ca_plus_cb = self.entries
 
         if math.isinf(ca_plus_cb):
             self.mean = float("nan")
-        elif ca_plus_cb > 0.0:
-            mb = numpy.average(q, weights=weights)
+        elif sumw > 0.0:
+            mb = sumwq / sumw
             self.mean = float((ca*ma + (ca_plus_cb - ca)*mb) / ca_plus_cb)
 
     def _sparksql(self, jvm, converter):
@@ -21,6 +21,25 @@ import numbers
 from histogrammar.defs import *
 from histogrammar.util import *
 
+def _aggregateNP(keys, weights):
+    """Sort the rows of ``keys`` lexicographically (NaN last) and merge identical rows, summing their ``weights``."""
+    import numpy
+    if len(keys) == 0:
+        return keys, weights
+
+    order = numpy.lexsort(keys.T[::-1])
+    keys = keys[order]
+    nans = numpy.isnan(keys)
+
+    # a row starts a new key if any component differs from the previous row (treating NaN as equal to NaN)
+    newkey = numpy.empty(len(keys), dtype=numpy.bool_)
+    newkey[0] = True
+    with numpy.errstate(invalid="ignore"):
+        numpy.any((keys[1:] != keys[:-1]) & ~(nans[1:] & nans[:-1]), axis=1, out=newkey[1:])
+
+    inverse = numpy.cumsum(newkey) - 1
+    return keys[newkey], numpy.bincount(inverse, weights=weights[order])
+
 class Bag(Factory, Container):
     """Accumulate raw numbers, vectors of numbers, or strings, with identical values merged.
 
@@ -77,9 +96,50 @@ class Bag(Factory, Container):
         super(Bag, self).__init__()
         self.specialize()
 
+    @property
+    def values(self):
+        """Dict from each unique item to its number of entries (built on demand if the Bag is array-backed)."""
+        if self._keys is not None:
+            self._values = self._valuesFromNP(self._keys, self._weights)
+            self._keys = None
+            self._weights = None
+        return self._values
+
+    @values.setter
+    def values(self, values):
+        self._values = values
+        self._keys = None
+        self._weights = None
+
+    def _valuesFromNP(self, keys, weights):
+        if self.range == "N":
+            return dict(zip([floatOrNan(x) for x in keys[:, 0].tolist()], weights.tolist()))
+        else:
+            return dict(zip([tuple(floatOrNan(xi) for xi in x) for x in keys.tolist()], weights.tolist()))
+
+    def _valuesToNP(self):
+        """Return the numeric contents as parallel, lexicographically sorted ``(keys, weights)`` arrays; ``keys`` has one column per dimension."""
+        import numpy
+        if self._keys is not None:
+            return self._keys, self._weights
+
+        items = list(self._values.items())
+        if self.range == "N":
+            keys = [[float(k)] for k, w in items]
+        else:
+            keys = [[float(ki) for ki in k] for k, w in items]
+        keys = numpy.array(keys, dtype=numpy.float64).reshape(len(items), max(self.dimension, 1))
+        weights = numpy.array([w for k, w in items], dtype=numpy.float64)
+        return _aggregateNP(keys, weights)
+
     @inheritdoc(Container)
     def zero(self): return Bag(self.quantity, self.range)
 
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        self.values.clear()
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Bag):
@@ -90,6 +150,14 @@ class Bag(Factory, Container):
 
             out.entries = self.entries + other.entries
 
+            if self.range[0] == "N" and (self._keys is not None or other._keys is not None):
+                import numpy
+                keys1, weights1 = self._valuesToNP()
+                keys2, weights2 = other._valuesToNP()
+                out._values = None
+                out._keys, out._weights = _aggregateNP(numpy.concatenate((keys1, keys2)), numpy.concatenate((weights1, weights2)))
+                return out.specialize()
+
             out.values = dict(self.values)
             for value, count in other.values.items():
                 if value in out.values:
@@ -105,20 +173,28 @@ class Bag(Factory, Container):
     @inheritdoc(Container)
     def __iadd__(self, other):
         both = self + other
-        self.entries = other.entries
-        self.values = other.values
+        self.entries = both.entries
+        self.values = both.values
         return self
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            for value, count in self.values.items():
-                out.values[value] = factor * count
-            return out.specialize()
+            self.entries *= factor
+            if self._keys is not None:
+                self._weights *= factor
+            else:
+                for value in self._values:
+                    self._values[value] *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -223,7 +299,7 @@ class Bag(Factory, Container):
 
     def _numpy(self, data, weights, shape):
         import numpy
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         assert isinstance(q, numpy.ndarray)
         if shape[0] is None:
             shape[0] = q.shape[0]
@@ -233,11 +309,38 @@ class Bag(Factory, Container):
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
 
-        for x, w in zip(q, weights):
-            if w > 0.0:
-                if isinstance(x, numpy.ndarray):
-                    x = x.tolist()
-                self._update(x, float(w))
+        selection = weights > 0.0
+        q = q[selection]
+        weights = weights[selection]
+
+        if self.range == "S":
+            # the number of distinct strings is usually small: merge them into the dict one key at a time
+            uniques, inverse = numpy.unique(q, return_inverse=True)
+            sums = numpy.bincount(inverse.reshape(-1), weights=weights, minlength=len(uniques))
+            for x, w in zip(uniques.tolist(), sums.tolist()):
+                self._update(x, w)
+            return
+
+        try:
+            if self.range == "N":
+                assert len(q.shape) == 1
+                q = numpy.array(q, dtype=numpy.float64).reshape(len(q), 1)
+            else:
+                assert len(q.shape) == 2 and q.shape[1] == self.dimension
+                q = numpy.array(q, dtype=numpy.float64)
+        except (AssertionError, TypeError, ValueError):
+            raise TypeError("function return value must be an array of {0} for range type {1}".format("numbers" if self.range == "N" else "rows of {0} numbers".format(self.dimension), self.range))
+
+        keys, sums = _aggregateNP(q, weights)
+        if self._keys is not None or len(self._values) > 0:
+            oldkeys, oldsums = self._valuesToNP()
+            keys, sums = _aggregateNP(numpy.concatenate((oldkeys, keys)), numpy.concatenate((oldsums, sums)))
+
+        # no possibility of exception from here on out (for rollback)
+        self.entries += float(weights.sum())
+        self._values = None
+        self._keys = keys
+        self._weights = sums
 
     def _sparksql(self, jvm, converter):
         return converter.Bag(self.quantity.asSparkSQL(), range)
@@ -344,7 +447,7 @@ class Bag(Factory, Container):
             raise JsonFormatException(json, "Bag")
         
     def __repr__(self):
-        return "<Bag size={0} range={1}>".format(len(self.values), self.range)
+        return "<Bag size={0} range={1}>".format(len(self._keys) if self._keys is not None else len(self._values), self.range)
 
     def __eq__(self, other):
         if len(self.values) != len(other.values):
@@ -66,7 +66,7 @@ class Bin(Factory, Container):
             raise TypeError("high ({0}) must be a number".format(high))
         if not isinstance(entries, numbers.Real) and entries not in ("nan", "inf", "-inf"):
             raise TypeError("entries ({0}) must be a number".format(entries))
-        if not isinstance(values, (list, tuple)) and not all(isinstance(v, Container) for v in values):
+        if not isinstance(values, (list, tuple, DenseValues)) and not all(isinstance(v, Container) for v in values):
             raise TypeError("values ({0}) must be a list of Containers".format(values))
         if not isinstance(underflow, Container):
             raise TypeError("underflow ({0}) must be a Container".format(underflow))
@@ -83,7 +83,7 @@ class Bin(Factory, Container):
 
         out = Bin(len(values), float(low), float(high), None, None, underflow, overflow, nanflow)
         out.entries = float(entries)
-        out.values = values
+        out.values = values if isinstance(values, DenseValues) else DenseValues.pack(values)
         return out.specialize()
 
     @staticmethod
@@ -106,7 +106,7 @@ class Bin(Factory, Container):
 
         Other parameters:
             entries (float): the number of entries, initially 0.0.
-            values (list of :doc:`Container <histogrammar.defs.Container>`): the sub-aggregators in each bin.
+            values (list of :doc:`Container <histogrammar.defs.Container>`): the sub-aggregators in each bin. If they are ``Count``, ``Sum``, ``Average`` or ``Deviate`` and Numpy is available, this is a ``histogrammar.defs.DenseValues`` instead of a list: it can be indexed, sliced, iterated over and assigned to like a list (each item is a view that reads and writes the arrays), but it has no list methods such as ``append`` or ``index``, and ``+`` with a list concatenates them into a new list. Call ``list(values)`` for a plain list.
         """
 
         if not isinstance(num, (int, long)):
@@ -135,7 +135,11 @@ class Bin(Factory, Container):
         if value is None:
             self.values = [None] * num
         else:
-            self.values = [value.zero() for i in xrange(num)]
+            # Count, Sum, Average and Deviate values are stored in arrays (see histogrammar.defs.DenseValues)
+            self.values = DenseValues.zeros(value, num)
+            if self.values is None:
+                template = value.zero()
+                self.values = [template.copy() for i in xrange(num)]
         self.underflow = underflow.copy()
         self.overflow = overflow.copy()
         self.nanflow = nanflow.copy()
@@ -198,6 +202,18 @@ class Bin(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return Bin(len(self.values), self.low, self.high, self.quantity, self.values[0].zero(), self.underflow.zero(), self.overflow.zero(), self.nanflow.zero())
 
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        if isinstance(self.values, DenseValues):
+            self.values.reset()
+        else:
+            for v in self.values:
+                v.reset()
+        self.underflow.reset()
+        self.overflow.reset()
+        self.nanflow.reset()
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Bin):
@@ -212,7 +228,10 @@ class Bin(Factory, Container):
 
             out = Bin(len(self.values), self.low, self.high, self.quantity, self.values[0], self.underflow + other.underflow, self.overflow + other.overflow, self.nanflow + other.nanflow)
             out.entries = self.entries + other.entries
-            out.values = [x + y for x, y in zip(self.values, other.values)]
+            if DenseValues.compatible(self.values, other.values):
+                out.values = self.values + other.values
+            else:
+                out.values = [x + y for x, y in zip(self.values, other.values)]
             return out.specialize()
 
         else:
@@ -230,8 +249,11 @@ class Bin(Factory, Container):
             if len(self.values) == 0:
                 raise ContainerException("cannot add Bins because number of values is zero")
             self.entries += other.entries
-            for x, y in zip(self.values, other.values):
-                x += y
+            if DenseValues.compatible(self.values, other.values):
+                self.values += other.values
+            else:
+                for x, y in zip(self.values, other.values):
+                    x += y
             self.underflow += other.underflow
             self.overflow += other.overflow
             self.nanflow += other.nanflow
@@ -241,17 +263,25 @@ class Bin(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            for i, v in enumerate(self.values):
-                out.values[i] = v * factor
-            out.overflow = self.overflow * factor
-            out.underflow = self.underflow * factor
-            out.nanflow = self.nanflow * factor
-            return out.specialize()
+            self.entries *= factor
+            if isinstance(self.values, DenseValues):
+                self.values *= factor
+            else:
+                for v in self.values:
+                    v *= factor
+            self.underflow *= factor
+            self.overflow *= factor
+            self.nanflow *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -308,6 +338,8 @@ class Bin(Factory, Container):
                 self.overflow.fill(datum, weight)
             elif self.nan(q):
                 self.nanflow.fill(datum, weight)
+            elif isinstance(self.values, DenseValues):
+                self.values.fill(self.bin(q), datum, weight)
             else:
                 self.values[self.bin(q)].fill(datum, weight)
 
@@ -456,8 +488,50 @@ class Bin(Factory, Container):
 
         return data
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+
+        fillCode.append(" " * fillIndent + "if isnan({0}):".format(q))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.nanflow, ".nanflow", weightVar)
+
+        low = self._pyConstant(env, "low", self.low)
+        fillCode.append(" " * fillIndent + "elif {0} < {1}:".format(q, low))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.underflow, ".underflow", weightVar)
+
+        fillCode.append(" " * fillIndent + "elif {0} >= {1}:".format(q, self._pyConstant(env, "high", self.high)))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.overflow, ".overflow", weightVar)
+
+        fillCode.append(" " * fillIndent + "else:")
+        index = "int(floor({0} * ({1} - {2}) / {3}))".format(self._pyConstant(env, "num", self.num), q, low, self._pyConstant(env, "width", self.high - self.low))
+        if isinstance(self.values, DenseValues):
+            # load the bin's numbers from the arrays into local variables, fill them, and write them back, rather than making a view of the bin
+            sub = self._pyTemporary(tmpVars, "index")
+            fillCode.append(" " * (fillIndent + 4) + "{0} = {1}".format(sub, index))
+            if not static:
+                views = self._pyTemporary(tmpVars, "memory")
+                fillCode.append(" " * (fillIndent + 4) + "{0} = {1}.values.memoryviews()".format(views, var))
+            memory = {}
+            fields = {}
+            for field, initial in self.values.prototype._denseFields:
+                if static:
+                    memory[field] = self._pyConstant(env, "memory", self.values.memoryviews()[field])
+                else:
+                    memory[field] = "{0}[\"{1}\"]".format(views, field)
+                fields[field] = self._pyTemporary(tmpVars, "field")
+                fillCode.append(" " * (fillIndent + 4) + "{0} = {1}[{2}]".format(fields[field], memory[field], sub))
+            self.values.prototype._pyGenerateFieldCode(env, tmpVars, fillCode, fillIndent + 4, fields, weightVar)
+            for field, initial in self.values.prototype._denseFields:
+                fillCode.append(" " * (fillIndent + 4) + "{0}[{1}] = {2}".format(memory[field], sub, fields[field]))
+        else:
+            values = self._pyConstant(env, "values", self.values) if static else var + ".values"
+            sub = self._pyTemporary(tmpVars, "sub")
+            fillCode.append(" " * (fillIndent + 4) + "{0} = {1}[{2}]".format(sub, values, index))
+            self.values[0]._pyGenerateCode(env, tmpVars, fillCode, fillIndent + 4, sub, False, weightVar)
+
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -465,51 +539,37 @@ class Bin(Factory, Container):
 
         import numpy
 
-        selection = numpy.isnan(q)
-        numpy.bitwise_not(selection, selection)
-        subweights = weights.copy()
-        subweights[selection] = 0.0
-        self.nanflow._numpy(data, subweights, shape)
-
-        # avoid nan warning in calculations by flinging the nans elsewhere
-        numpy.bitwise_not(selection, selection)
         q = numpy.array(q, dtype=numpy.float64)
-        q[selection] = self.high
-        weights = weights.copy()
-        weights[selection] = 0.0
-
-        numpy.greater_equal(q, self.low, selection)
-        subweights[:] = weights
-        subweights[selection] = 0.0
-        self.underflow._numpy(data, subweights, shape)
-
-        numpy.less(q, self.high, selection)
-        subweights[:] = weights
-        subweights[selection] = 0.0
-        self.overflow._numpy(data, subweights, shape)
-
-        if all(isinstance(value, Count) and value.transform is identity for value in self.values) and numpy.all(numpy.isfinite(q)) and numpy.all(numpy.isfinite(weights)):
-            # Numpy defines histograms as including the upper edge of the last bin only, so drop that
-            weights[q == self.high] == 0.0
-
-            h, _ = numpy.histogram(q, self.num, (self.low, self.high), weights=weights)
-
-            for hi, value in zip(h, self.values):
-                value.fill(None, float(hi))
-
+        nans = numpy.isnan(q)
+        with numpy.errstate(invalid="ignore"):
+            underflows = q < self.low
+            overflows = q >= self.high
+
+        # avoid nan warning in calculations by flinging the out-of-range values elsewhere
+        q[nans] = self.low
+        q[underflows] = self.low
+        q[overflows] = self.low
+        numpy.subtract(q, self.low, q)
+        numpy.multiply(q, self.num, q)
+        numpy.divide(q, self.high - self.low, q)
+        numpy.floor(q, q)
+
+        # compute every row's destination once: bin index, then underflow, overflow, nanflow, and a slot for dropped rows
+        groups = numpy.array(q, dtype=numpy.int64)
+        numpy.minimum(groups, self.num - 1, groups)
+        groups[underflows] = self.num
+        groups[overflows] = self.num + 1
+        groups[nans] = self.num + 2
+        groups[weights <= 0.0] = self.num + 3
+
+        if isinstance(self.values, DenseValues):
+            self.values._fillNPGroups(self, data, weights, shape, groups)
+            # the other destinations are renumbered 0, 1, 2 (and 3 for dropped rows)
+            flows = groups - self.num
+            flows[flows < 0] = 3
+            self._fillNPGroups(data, weights, shape, flows, [self.underflow, self.overflow, self.nanflow])
         else:
-            q = numpy.array(q, dtype=numpy.float64)
-            numpy.subtract(q, self.low, q)
-            numpy.multiply(q, self.num, q)
-            numpy.divide(q, self.high - self.low, q)
-            numpy.floor(q, q)
-            q = numpy.array(q, dtype=int)
-
-            for index, value in enumerate(self.values):
-                numpy.not_equal(q, index, selection)
-                subweights[:] = weights
-                subweights[selection] = 0.0
-                value._numpy(data, subweights, shape)
+            self._fillNPGroups(data, weights, shape, groups, self.values + [self.underflow, self.overflow, self.nanflow])
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
@@ -531,7 +591,21 @@ class Bin(Factory, Container):
     @property
     def children(self):
         """List of sub-aggregators, to make it possible to walk the tree."""
-        return [self.underflow, self.overflow, self.nanflow] + self.values
+        return [self.underflow, self.overflow, self.nanflow] + list(self.values)
+
+    def _checkForCrossReferences(self, memo=None):
+        if isinstance(self.values, DenseValues) and not self._checkedForCrossReferences:
+            # densely stored values are numbers in arrays owned by this Bin; only the flow bins can be shared
+            if memo is None:
+                memo = set()
+            if any(x is self for x in memo):
+                raise ContainerException("cannot fill a tree that contains the same aggregator twice: {0}".format(self))
+            memo.add(self)
+            for child in (self.underflow, self.overflow, self.nanflow):
+                child._checkForCrossReferences(memo)
+            self._checkedForCrossReferences = True
+        else:
+            super(Bin, self)._checkForCrossReferences(memo)
 
     @inheritdoc(Container)
     def toJsonFragment(self, suppressName):
@@ -542,12 +616,18 @@ class Bin(Factory, Container):
         else:
             binsName = None
 
+        values = None
+        if isinstance(self.values, DenseValues):
+            values = DenseValues.binaryFragment(self.values.prototype, self.values.arrays)
+        if values is None:
+            values = [x.toJsonFragment(True) for x in self.values]
+
         return maybeAdd({
             "low": floatToJson(self.low),
             "high": floatToJson(self.high),
             "entries": floatToJson(self.entries),
             "values:type": self.values[0].name,
-            "values": [x.toJsonFragment(True) for x in self.values],
+            "values": values,
             "underflow:type": self.underflow.name,
             "underflow": self.underflow.toJsonFragment(False),
             "overflow:type": self.overflow.name,
@@ -595,6 +675,9 @@ class Bin(Factory, Container):
                 raise JsonFormatException(json["values:name"], "Bin.values:name")
             if isinstance(json["values"], list):
                 values = [valuesFactory.fromJsonFragment(x, valuesName) for x in json["values"]]
+            elif isinstance(json["values"], dict) and hasKeys(json["values"].keys(), ["zero", "arrays"]):
+                # from Factory.fromBinary: one array per field rather than one fragment per bin
+                values = DenseValues.fromBinaryFragment(valuesFactory.fromJsonFragment(json["values"]["zero"], valuesName), json["values"]["arrays"])
             else:
                 raise JsonFormatException(json, "Bin.values")
 
@@ -632,7 +715,8 @@ class Bin(Factory, Container):
     def __ne__(self, other): return not self == other
 
     def __hash__(self):
-        return hash((self.low, self.high, self.quantity, self.entries, tuple(self.values), self.underflow, self.overflow, self.nanflow))
+        values = self.values if isinstance(self.values, DenseValues) else tuple(self.values)
+        return hash((self.low, self.high, self.quantity, self.entries, values, self.underflow, self.overflow, self.nanflow))
 
 Factory.register(Bin)
 
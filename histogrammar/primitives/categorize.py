@@ -77,7 +77,7 @@ class Categorize(Factory, Container):
             raise TypeError("value ({0}) must be None or a Container".format(value))
         self.entries = 0.0
         self.quantity = serializable(quantity)
-        self.value = value
+        self.value = value.zero() if value is not None else None
         self.bins = {}
         if value is not None:
             self.contentType = value.name
@@ -124,6 +124,11 @@ class Categorize(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return Categorize(self.quantity, self.value)
 
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        self.bins.clear()
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Categorize):
@@ -148,23 +153,28 @@ class Categorize(Factory, Container):
             self.entries += other.entries
             for k in self.keySet.union(other.keySet):
                 if k in self.bins and k in other.bins:
-                    bins[k] += other.bins[k]
+                    self.bins[k] += other.bins[k]
                 elif k not in self.bins and k in other.bins:
-                    bins[k] = self.bins[k].copy()
+                    self.bins[k] = other.bins[k].copy()
             return self
         else:
             raise ContainerException("cannot add {0} and {1}".format(self.name, other.name))
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            for k, v in self.bins.items():
-                out.bins[k] = v * factor
-            return out.specialize()
+            self.entries *= factor
+            for v in self.bins.values():
+                v *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -180,7 +190,7 @@ class Categorize(Factory, Container):
                 raise TypeError("function return value ({0}) must be a string".format(q))
 
             if q not in self.bins:
-                self.bins[q] = self.value.zero()
+                self.bins[q] = self.value.copy()
             self.bins[q].fill(datum, weight)
 
             # no possibility of exception from here on out (for rollback)
@@ -232,31 +242,45 @@ class Categorize(Factory, Container):
     def _c99StructName(self):
         return "Cz" + self.value._c99StructName()
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+        bins = self._pyConstant(env, "bins", self.bins) if static else var + ".bins"
+        value = self._pyConstant(env, "value", self.value) if static else var + ".value"
+        sub = self._pyTemporary(tmpVars, "sub")
+        self._pyAppend(fillCode, fillIndent, """
+if {q} not in {bins}:
+    {bins}[{q}] = {value}.zero()
+{sub} = {bins}[{q}]
+""", q=q, bins=bins, value=value, sub=sub)
+        self.value._pyGenerateCode(env, tmpVars, fillCode, fillIndent, sub, False, weightVar)
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
         newentries = weights.sum()
-        
-        subweights = weights.copy()
-        subweights[weights < 0.0] = 0.0
 
         import numpy
-        selection = numpy.empty(q.shape, dtype=numpy.bool)
 
-        uniques, inverse = numpy.unique(q, return_inverse=True)
+        selection = weights > 0.0
+        uniques, inverse = numpy.unique(q[selection], return_inverse=True)
+        keys = uniques.tolist()
 
-        # no possibility of exception from here on out (for rollback)
-        for i, x in enumerate(uniques):
-            if x not in self.bins:
-                self.bins[x] = self.value.zero()
-            
-            numpy.not_equal(inverse, i, selection)
-            subweights[:] = weights
-            subweights[selection] = 0.0
-            self.bins[x]._numpy(data, subweights, shape)
+        newkeys = [k for k in keys if k not in self.bins]
+        if len(newkeys) > 0:
+            self.bins.update(zip(newkeys, [self.value.copy() for k in newkeys]))
+
+        # the inverse index is each row's category; one bincount or one sort-and-slice fills them all
+        subs = [self.bins[k] for k in keys]
+        groups = numpy.empty(q.shape, dtype=numpy.int64)
+        groups[:] = len(subs)
+        groups[selection] = inverse
 
+        self._fillNPGroups(data, weights, shape, groups, subs)
+
+        # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
 
     def _sparksql(self, jvm, converter):
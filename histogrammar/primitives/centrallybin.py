@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import json
 import math
 import numbers
@@ -82,7 +83,8 @@ class CentrallyBin(Factory, Container):
         if value is None:
             self.bins = None
         else:
-            self.bins = [(x, value.zero()) for x in sorted(bins)]
+            template = value.zero()
+            self.bins = [(x, template.copy()) for x in sorted(bins)]
 
         self.quantity = serializable(quantity)
         self.value = value
@@ -99,6 +101,19 @@ class CentrallyBin(Factory, Container):
             out.bins[i] = Count.ed(v.entries)
         return out.specialize()
 
+    @property
+    def bins(self):
+        """The bin centers and sub-aggregators in each bin."""
+        return self._bins
+
+    @bins.setter
+    def bins(self, bins):
+        self._bins = bins
+        if bins is None:
+            self._midpoints = None
+        else:
+            self._midpoints = [(c1 + c2)/2.0 for (c1, v1), (c2, v2) in zip(bins[:-1], bins[1:])]
+
     @property
     def centersSet(self):
         """Set of centers of each bin."""
@@ -114,13 +129,7 @@ class CentrallyBin(Factory, Container):
 
     def index(self, x):
         """Find the closest index to ``x``."""
-        for index in xrange(len(self.bins)):
-            if index == len(self.bins) - 1:
-                return index
-            thisCenter = self.bins[index][0]
-            nextCenter = self.bins[index + 1][0]
-            if x < (thisCenter + nextCenter)/2.0:
-                return index
+        return bisect.bisect_right(self._midpoints, x)
 
     def center(self, x):
         """Return the exact center of the bin that ``x`` belongs to."""
@@ -158,7 +167,11 @@ class CentrallyBin(Factory, Container):
 
     @inheritdoc(Container)
     def zero(self):
-        return CentrallyBin([c for c, v in self.bins], self.quantity, self.value, self.nanflow.zero())
+        # zero each bin rather than regenerating from value, which is None if this was made by CentrallyBin.ed
+        out = CentrallyBin([c for c, v in self.bins], self.quantity, None, self.nanflow.zero())
+        out.bins = [(c, v.zero()) for c, v in self.bins]
+        out.value = self.value
+        return out.specialize()
 
     @inheritdoc(Container)
     def __add__(self, other):
@@ -184,14 +197,20 @@ class CentrallyBin(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.bins = [(c, v * factor) for (c, v) in self.bins]
-            out.nanflow = self.nanflow * factor
-            return out.specialize()
+            self.entries *= factor
+            for c, v in self.bins:
+                v *= factor
+            self.nanflow *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -351,8 +370,23 @@ class CentrallyBin(Factory, Container):
 
         return data
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+
+        fillCode.append(" " * fillIndent + "if isnan({0}):".format(q))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.nanflow, ".nanflow", weightVar)
+
+        fillCode.append(" " * fillIndent + "else:")
+        bins = self._pyConstant(env, "bins", self.bins) if static else var + ".bins"
+        midpoints = self._pyConstant(env, "midpoints", self._midpoints) if static else var + "._midpoints"
+        sub = self._pyTemporary(tmpVars, "sub")
+        fillCode.append(" " * (fillIndent + 4) + "{0} = {1}[bisect_right({2}, {3})][1]".format(sub, bins, midpoints, q))
+        self.bins[0][1]._pyGenerateCode(env, tmpVars, fillCode, fillIndent + 4, sub, False, weightVar)
+
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -360,49 +394,19 @@ class CentrallyBin(Factory, Container):
 
         import numpy
 
-        selection = numpy.isnan(q)
-        numpy.bitwise_not(selection, selection)
-        subweights = weights.copy()
-        subweights[selection] = 0.0
-        self.nanflow._numpy(data, subweights, shape)
-
-        # avoid nan warning in calculations by flinging the nans elsewhere
-        numpy.bitwise_not(selection, selection)
         q = numpy.array(q, dtype=numpy.float64)
-        q[selection] = 0.0
-        weights = weights.copy()
-        weights[selection] = 0.0
-
-        if all(isinstance(v, Count) and v.transform is identity for c, v in self.bins) and numpy.all(numpy.isfinite(q)) and numpy.all(numpy.isfinite(weights)):
+        nans = numpy.isnan(q)
 
-            h, _ = numpy.histogram(q, [float("-inf")] + [(c1 + c2)/2.0 for (c1, v1), (c2, v2) in zip(self.bins[:-1], self.bins[1:])] + [float("inf")], weights=weights)
+        # avoid nan warning in calculations by flinging the nans elsewhere
+        q[nans] = 0.0
 
-            for hi, (c, v) in zip(h, self.bins):
-                v.fill(None, float(hi))
+        # one binary search per datum against the midpoints between neighboring centers
+        midpoints = numpy.array(self._midpoints, dtype=numpy.float64)
+        groups = numpy.array(numpy.searchsorted(midpoints, q, side="right"), dtype=numpy.int64)
+        groups[nans] = len(self.bins)
+        groups[weights <= 0.0] = len(self.bins) + 1
 
-        else:
-            selection = numpy.empty(q.shape, dtype=numpy.bool)
-            selection2 = numpy.empty(q.shape, dtype=numpy.bool)
-
-            for index in xrange(len(self.bins)):
-                if index == 0:
-                    high = (self.bins[index][0] + self.bins[index + 1][0])/2.0
-                    numpy.greater_equal(q, high, selection)
-
-                elif index == len(self.bins) - 1:
-                    low = (self.bins[index - 1][0] + self.bins[index][0])/2.0
-                    numpy.less(q, low, selection)
-
-                else:
-                    low = (self.bins[index - 1][0] + self.bins[index][0])/2.0
-                    high = (self.bins[index][0] + self.bins[index + 1][0])/2.0
-                    numpy.less(q, low, selection)
-                    numpy.greater_equal(q, high, selection2)
-                    numpy.bitwise_or(selection, selection2, selection)
-
-                subweights[:] = weights
-                subweights[selection] = 0.0
-                self.bins[index][1]._numpy(data, subweights, shape)
+        self._fillNPGroups(data, weights, shape, groups, self.values + [self.nanflow])
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
@@ -334,14 +334,19 @@ class Label(Factory, Container, Collection):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            for k, v in self.pairs.items():
-                out.pairs[k] = v * factor
-            return out.specialize()
+            self.entries *= factor
+            for v in self.pairs.values():
+                v *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -358,6 +363,11 @@ class Label(Factory, Container, Collection):
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        for k, v in self.pairs.items():
+            self._pyChild(env, tmpVars, fillCode, fillIndent, var, static, v, ".pairs[{0}]".format(repr(k)), weightVar)
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
         if shape[0] is not None:
             self._checkNPWeights(weights, shape)
@@ -548,14 +558,19 @@ class UntypedLabel(Factory, Container, Collection):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            for k, v in self.pairs.items():
-                out.pairs[k] = v * factor
-            return out.specialize()
+            self.entries *= factor
+            for v in self.pairs.values():
+                v *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -572,6 +587,11 @@ class UntypedLabel(Factory, Container, Collection):
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        for k, v in self.pairs.items():
+            self._pyChild(env, tmpVars, fillCode, fillIndent, var, static, v, ".pairs[{0}]".format(repr(k)), weightVar)
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
         if shape[0] is not None:
             self._checkNPWeights(weights, shape)
@@ -769,12 +789,19 @@ class Index(Factory, Container, Collection):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = Index(*[x * factor for x in self.values])
-            out.entries = factor * self.entries
-            return out.specialize()
+            self.entries *= factor
+            for v in self.values:
+                v *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -791,6 +818,11 @@ class Index(Factory, Container, Collection):
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        for i, v in enumerate(self.values):
+            self._pyChild(env, tmpVars, fillCode, fillIndent, var, static, v, ".values[{0}]".format(i), weightVar)
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
         if shape[0] is not None:
             self._checkNPWeights(weights, shape)
@@ -995,12 +1027,19 @@ class Branch(Factory, Container, Collection):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = Branch(*[x * factor for x in self.values])
-            out.entries = factor * self.entries
-            return out.specialize()
+            self.entries *= factor
+            for v in self.values:
+                v *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -1017,6 +1056,11 @@ class Branch(Factory, Container, Collection):
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        for i, v in enumerate(self.values):
+            self._pyChild(env, tmpVars, fillCode, fillIndent, var, static, v, ".values[{0}]".format(i), weightVar)
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
         if shape[0] is not None:
             self._checkNPWeights(weights, shape)
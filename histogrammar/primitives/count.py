@@ -37,6 +37,9 @@ class Count(Factory, Container):
     for instance. This is unlike any other primitive's ``quantity`` function in that its domain is the *weights* (always double), not *data* (any type).
     """
 
+    # leaves are the most numerous objects in a tree, so they have no per-object __dict__
+    __slots__ = ("entries", "transform", "_checkedForCrossReferences", "_clingFiller")
+
     @staticmethod
     def ed(entries):
         """Create a Count that is only capable of being added.
@@ -74,6 +77,22 @@ class Count(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return Count(self.transform)
 
+    @inheritdoc(Container)
+    def copy(self):
+        # bypasses __init__ and always makes a plain Count, even if self is a view into a Bin's arrays
+        out = Count.__new__(Count)
+        out.transform = self.transform
+        out.entries = self.entries
+        out._checkedForCrossReferences = False
+        return out
+
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+
+    def _transferFrom(self, other):
+        self.entries = other.entries
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Count):
@@ -93,22 +112,38 @@ class Count(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if self.transform != identity or \
            not callable(self.transform.expr) or \
            (hasattr(self.transform.expr, "func_code") and self.transform.expr.func_code.co_code != identity.expr.func_code.co_code) or \
            (hasattr(self.transform.expr, "__code__") and self.transform.expr.__code__.co_code != identity.expr.__code__.co_code):
             raise ContainerException("Cannot scalar-multiply Count with a non-identity transform.")
         elif math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            return out.specialize()
+            self.entries *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    # dense storage in a Bin (see histogrammar.defs.DenseValues)
+    _denseFields = (("entries", 0.0),)
+
+    @staticmethod
+    def _denseAdd(x, y):
+        return {"entries": x["entries"] + y["entries"]}
+
+    @staticmethod
+    def _denseScale(x, factor):
+        x["entries"] *= factor
+
     @inheritdoc(Container)
     def fill(self, datum, weight=1.0):
         self._checkForCrossReferences()
@@ -163,6 +198,16 @@ class Count(Factory, Container):
     def _cudaStorageType(self):
         return "float"
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        self._pyGenerateFieldCode(env, tmpVars, fillCode, fillIndent, dict((field, var + "." + field) for field, initial in self._denseFields), weightVar)
+
+    def _pyGenerateFieldCode(self, env, tmpVars, fillCode, fillIndent, fields, weightVar):
+        if self.transform == identity:
+            fillCode.append(" " * fillIndent + "{0} += {1}".format(fields["entries"], weightVar))
+        else:
+            transform = self._pyConstant(env, "fcn", self.transform.asPython())
+            fillCode.append(" " * fillIndent + "{0} += {1}({2})".format(fields["entries"], transform, weightVar))
+
     def _numpy(self, data, weights, shape):
         import numpy
         if isinstance(weights, numpy.ndarray):
@@ -30,6 +30,8 @@ class Deviate(Factory, Container):
     Uses the numerically stable weighted mean and weighted variance algorithms described in `"Incremental calculation of weighted mean and variance," <http://www-uxsup.csx.cam.ac.uk/~fanf2/hermes/doc/antiforgery/stats.pdf>`_ Tony Finch, *Univeristy of Cambridge Computing Service,* 2009.
     """
 
+    __slots__ = ("entries", "quantity", "mean", "varianceTimesEntries", "_checkedForCrossReferences", "_clingFiller")
+
     @staticmethod
     def ed(entries, mean, variance):
         """Create a Deviate that is only capable of being added.
@@ -91,6 +93,27 @@ class Deviate(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return Deviate(self.quantity)
 
+    @inheritdoc(Container)
+    def copy(self):
+        out = Deviate.__new__(Deviate)
+        out.quantity = self.quantity
+        out.entries = self.entries
+        out.mean = self.mean
+        out.varianceTimesEntries = self.varianceTimesEntries
+        out._checkedForCrossReferences = False
+        return out
+
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        self.mean = float("nan")
+        self.varianceTimesEntries = float("nan")
+
+    def _transferFrom(self, other):
+        self.entries = other.entries
+        self.mean = other.mean
+        self.varianceTimesEntries = other.varianceTimesEntries
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Deviate):
@@ -119,19 +142,60 @@ class Deviate(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.mean = self.mean
-            out.varianceTimesEntries = factor * self.varianceTimesEntries
-            return out.specialize()
+            self.entries *= factor
+            self.varianceTimesEntries *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    # dense storage in a Bin (see histogrammar.defs.DenseValues)
+    _denseFields = (("entries", 0.0), ("mean", float("nan")), ("varianceTimesEntries", float("nan")))
+
+    @staticmethod
+    def _denseAdd(x, y):
+        import numpy
+        ca, ma, sa = x["entries"], x["mean"], x["varianceTimesEntries"]
+        cb, mb, sb = y["entries"], y["mean"], y["varianceTimesEntries"]
+        entries = ca + cb
+        mean = (ca*ma + cb*mb)/(ca + cb)
+        varianceTimesEntries = sa + sb + ca*ma*ma + cb*mb*mb - 2.0*mean*(ca*ma + cb*mb) + mean*mean*entries
+        return {"entries": entries,
+                "mean": numpy.where(ca == 0.0, mb, numpy.where(cb == 0.0, ma, mean)),
+                "varianceTimesEntries": numpy.where(ca == 0.0, sb, numpy.where(cb == 0.0, sa, varianceTimesEntries))}
+
+    @staticmethod
+    def _denseScale(x, factor):
+        x["entries"] *= factor
+        x["varianceTimesEntries"] *= factor
+
+    @staticmethod
+    def _denseMergeNPMoments(x, sumw, sumwq, m2):
+        import numpy
+        ca = x["entries"].copy()
+        ma = numpy.where(ca == 0.0, 0.0, x["mean"])
+        sa = numpy.where(ca == 0.0, 0.0, x["varianceTimesEntries"])
+        x["entries"] += sumw
+        ca_plus_cb = x["entries"]
+        cb = sumw
+        mb = sumwq / sumw
+        mean = (ca*ma + (ca_plus_cb - ca)*mb) / ca_plus_cb
+        varianceTimesEntries = sa + m2 + ca*ma*ma + cb*mb*mb - 2.0*mean*(ca*ma + cb*mb) + mean*mean*ca_plus_cb
+        infinite = numpy.isinf(ca_plus_cb)
+        filled = sumw > 0.0
+        x["mean"][:] = numpy.where(infinite, float("nan"), numpy.where(filled, mean, x["mean"]))
+        x["varianceTimesEntries"][:] = numpy.where(infinite, float("nan"), numpy.where(filled, varianceTimesEntries, x["varianceTimesEntries"]))
+
     @inheritdoc(Container)
     def fill(self, datum, weight=1.0):
         self._checkForCrossReferences()
@@ -308,34 +372,65 @@ class Deviate(Factory, Container):
         self.variance = variance
         return data[struct.calcsize(format):]
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        self._pyGenerateFieldCode(env, tmpVars, fillCode, fillIndent, dict((field, var + "." + field) for field, initial in self._denseFields), weightVar)
+
+    def _pyGenerateFieldCode(self, env, tmpVars, fillCode, fillIndent, fields, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+        delta = self._pyTemporary(tmpVars, "delta")
+        self._pyAppend(fillCode, fillIndent, """
+if {entries} == 0.0:
+    {mean} = {q}
+    {varianceTimesEntries} = 0.0
+{entries} += {w}
+if isnan({mean}) or isnan({q}):
+    {mean} = nan
+    {varianceTimesEntries} = nan
+elif isinf({mean}) or isinf({q}):
+    if isinf({mean}) and isinf({q}) and {mean} * {q} < 0.0:
+        {mean} = nan
+    elif isinf({q}):
+        {mean} = {q}
+    if isinf({entries}) or isnan({entries}):
+        {mean} = nan
+    {varianceTimesEntries} = nan
+else:
+    {delta} = {q} - {mean}
+    {mean} += {delta} * {w} / {entries}
+    {varianceTimesEntries} += {w} * {delta} * ({q} - {mean})
+""", q=q, w=weightVar, delta=delta, **fields)
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
 
+        import numpy
+        sumw, sumwq, m2 = self._momentsNP(numpy.asarray(q, dtype=numpy.float64), weights, order=2)
+
         # no possibility of exception from here on out (for rollback)
+        self._mergeNPMoments(float(sumw[0]), float(sumwq[0]), float(m2[0]))
+
+    _npMoments = (2, False)
+
+    def _mergeNPMoments(self, sumw, sumwq, m2):
         ca, ma, sa = self.entries, self.mean, self.varianceTimesEntries
         if ca == 0.0:
             ma = 0.0
             sa = 0.0
 
-        import numpy
-        selection = weights > 0.0
-        q = q[selection]
-        weights = weights[selection]
-
-        self.entries += float(weights.sum())
+        self.entries += sumw
         ca_plus_cb = self.entries
 
         if math.isinf(ca_plus_cb):
             self.mean = float("nan")
             self.varianceTimesEntries = float("nan")
 
-        elif ca_plus_cb > 0.0:
-            cb = ca_plus_cb - ca
-            mb = numpy.average(q, weights=weights)
-            sb = cb*numpy.average((q - mb)*(q - mb), weights=weights)
+        elif sumw > 0.0:
+            cb = sumw
+            mb = sumwq / sumw
+            sb = m2
             self.mean = float((ca*ma + (ca_plus_cb - ca)*mb) / ca_plus_cb)
             self.varianceTimesEntries = float(sa + sb + ca*ma*ma + cb*mb*mb - 2.0*self.mean*(ca*ma + cb*mb) + self.mean*self.mean*ca_plus_cb)
 
@@ -131,14 +131,19 @@ class Fraction(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.numerator = self.numerator * factor
-            out.denominator = self.denominator * factor
-            return out.specialize()
+            self.entries *= factor
+            self.numerator *= factor
+            self.denominator *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -242,8 +247,17 @@ class Fraction(Factory, Container):
         data = self.numerator._cudaUnpackAndFill(data, bigendian, alignment)
         return data
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+        w = self._pyTemporary(tmpVars, "w")
+        fillCode.append(" " * fillIndent + "{0} = {1} * {2}".format(w, q, weightVar))
+        self._pyChild(env, tmpVars, fillCode, fillIndent, var, static, self.denominator, ".denominator", weightVar)
+        fillCode.append(" " * fillIndent + "if {0} > 0.0:".format(w))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.numerator, ".numerator", w)
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
-        w = self.quantity(data)
+        w = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(w, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -253,8 +267,9 @@ class Fraction(Factory, Container):
         w[numpy.isnan(w)] = 0.0
         w[w < 0.0] = 0.0
 
-        self.numerator._numpy(data, w, shape)
-        self.denominator._numpy(data, weights, shape)
+        # only the rows that pass the cut are handed down to the numerator
+        self._fillNPGroups(data, w, shape, numpy.array(w <= 0.0, dtype=numpy.int64), [self.numerator])
+        self._fillNPGroups(data, weights, shape, numpy.array(weights <= 0.0, dtype=numpy.int64), [self.denominator])
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(weights.sum())
@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import json
 import math
 import numbers
@@ -83,11 +84,26 @@ class IrregularlyBin(Factory, Container):
         if value is None:
             self.bins = tuple(thresholds)
         else:
-            self.bins = tuple((float(x), value.zero()) for x in (float("-inf"),) + tuple(thresholds))
+            template = value.zero()
+            self.bins = tuple((float(x), template.copy()) for x in (float("-inf"),) + tuple(thresholds))
         self.nanflow = nanflow.copy()
         super(IrregularlyBin, self).__init__()
         self.specialize()
 
+    @property
+    def bins(self):
+        """The ``N + 1`` thresholds and sub-aggregators."""
+        return self._bins
+
+    @bins.setter
+    def bins(self, bins):
+        self._bins = bins
+        edges = [low for low, sub in bins]
+        if all(x <= y for x, y in zip(edges[:-1], edges[1:])):
+            self._edges = edges
+        else:
+            self._edges = None
+
     @property
     def thresholds(self):
         """Cut thresholds (first items of ``bins``)."""
@@ -130,14 +146,20 @@ class IrregularlyBin(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.bins = [(c, v * factor) for (c, v) in self.bins]
-            out.nanflow = self.nanflow * factor
-            return out.specialize()
+            self.entries *= factor
+            for c, v in self.bins:
+                v *= factor
+            self.nanflow *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -154,10 +176,16 @@ class IrregularlyBin(Factory, Container):
 
             if math.isnan(q):
                 self.nanflow.fill(datum, weight)
+            elif self._edges is not None:
+                index = bisect.bisect_right(self._edges, q) - 1
+                if index >= 0:
+                    self.bins[index][1].fill(datum, weight)
             else:
-                for (low, sub), (high, _) in zip(self.bins, self.bins[1:] + ((float("nan"), None),)):
+                for index in xrange(len(self.bins)):
+                    low = self.bins[index][0]
+                    high = self.bins[index + 1][0] if index + 1 < len(self.bins) else float("nan")
                     if q >= low and not q >= high:
-                        sub.fill(datum, weight)
+                        self.bins[index][1].fill(datum, weight)
                         break
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
@@ -301,8 +329,31 @@ class IrregularlyBin(Factory, Container):
 
         return data
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        if self._edges is None:
+            return super(IrregularlyBin, self)._pyGenerateCode(env, tmpVars, fillCode, fillIndent, var, static, weightVar)
+
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+
+        fillCode.append(" " * fillIndent + "if isnan({0}):".format(q))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.nanflow, ".nanflow", weightVar)
+
+        bins = self._pyConstant(env, "bins", self.bins) if static else var + ".bins"
+        edges = self._pyConstant(env, "edges", self._edges) if static else var + "._edges"
+        index = self._pyTemporary(tmpVars, "index")
+        sub = self._pyTemporary(tmpVars, "sub")
+        fillCode.append(" " * fillIndent + "else:")
+        self._pyAppend(fillCode, fillIndent + 4, """
+{index} = bisect_right({edges}, {q}) - 1
+if {index} >= 0:
+    {sub} = {bins}[{index}][1]
+""", q=q, index=index, sub=sub, bins=bins, edges=edges)
+        self.bins[0][1]._pyGenerateCode(env, tmpVars, fillCode, fillIndent + 8, sub, False, weightVar)
+
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -310,35 +361,30 @@ class IrregularlyBin(Factory, Container):
 
         import numpy
 
-        selection = numpy.isnan(q)
-        numpy.bitwise_not(selection, selection)
-        subweights = weights.copy()
-        subweights[selection] = 0.0
-        self.nanflow._numpy(data, subweights, shape)
+        q = numpy.array(q, dtype=numpy.float64)
+        nans = numpy.isnan(q)
 
         # avoid nan warning in calculations by flinging the nans elsewhere
-        numpy.bitwise_not(selection, selection)
-        q = numpy.array(q, dtype=numpy.float64)
-        q[selection] = float("-inf")
-        weights = weights.copy()
-        weights[selection] = 0.0
-
-        # FIXME: the case of all Counts could be optimized with numpy.histogram (see CentrallyBin for an example)
-
-        selection = numpy.empty(q.shape, dtype=numpy.bool)
-        selection2 = numpy.empty(q.shape, dtype=numpy.bool)
-        subweights = weights.copy()
-        for (low, sub), (high, _) in zip(self.bins, self.bins[1:] + ((float("nan"), None),)):
-            numpy.greater_equal(q, low, selection)
-            numpy.greater_equal(q, high, selection2)
-            numpy.bitwise_not(selection2, selection2)
-            numpy.bitwise_and(selection, selection2, selection)
-            numpy.bitwise_not(selection, selection)
-
-            subweights[:] = weights
-            subweights[selection] = 0.0
-
-            sub._numpy(data, subweights, shape)
+        q[nans] = float("-inf")
+
+        if self._edges is not None:
+            # one binary search per datum: the number of thresholds at or below it
+            groups = numpy.searchsorted(numpy.array(self._edges, dtype=numpy.float64), q, side="right") - 1
+            numpy.maximum(groups, 0, groups)
+        else:
+            # unsorted thresholds: the first matching interval wins, as in fill
+            groups = numpy.zeros(q.shape, dtype=numpy.int64)
+            with numpy.errstate(invalid="ignore"):
+                for index in xrange(len(self.bins) - 1, -1, -1):
+                    low = self.bins[index][0]
+                    high = self.bins[index + 1][0] if index + 1 < len(self.bins) else float("nan")
+                    groups[(q >= low) & ~(q >= high)] = index
+
+        groups = numpy.array(groups, dtype=numpy.int64)
+        groups[nans] = len(self.bins)
+        groups[weights <= 0.0] = len(self.bins) + 1
+
+        self._fillNPGroups(data, weights, shape, groups, self.values + [self.nanflow])
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
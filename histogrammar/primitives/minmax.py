@@ -25,6 +25,8 @@ from histogrammar.util import *
 class Minimize(Factory, Container):
     """Find the minimum value of a given quantity. If no data are observed, the result is NaN."""
 
+    __slots__ = ("entries", "quantity", "min", "_checkedForCrossReferences", "_clingFiller")
+
     @staticmethod
     def ed(entries, min):
         """Create a Minimize that is only capable of being added.
@@ -68,6 +70,24 @@ class Minimize(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return Minimize(self.quantity)
 
+    @inheritdoc(Container)
+    def copy(self):
+        out = Minimize.__new__(Minimize)
+        out.quantity = self.quantity
+        out.entries = self.entries
+        out.min = self.min
+        out._checkedForCrossReferences = False
+        return out
+
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        self.min = float("nan")
+
+    def _transferFrom(self, other):
+        self.entries = other.entries
+        self.min = other.min
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Minimize):
@@ -87,13 +107,17 @@ class Minimize(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.min = self.min
-            return out.specialize()
+            self.entries *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -225,8 +249,16 @@ class Minimize(Factory, Container):
         self.min = minplus(self.min, objmin)
         return data[struct.calcsize(format):]
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+        self._pyAppend(fillCode, fillIndent, """
+{var}.entries += {w}
+if isnan({var}.min) or {q} < {var}.min:
+    {var}.min = {q}
+""", var=var, q=q, w=weightVar)
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -300,6 +332,8 @@ Factory.register(Minimize)
 class Maximize(Factory, Container):
     """Find the maximum value of a given quantity. If no data are observed, the result is NaN."""
 
+    __slots__ = ("entries", "quantity", "max", "_checkedForCrossReferences", "_clingFiller")
+
     @staticmethod
     def ed(entries, max):
         """Create a Maximize that is only capable of being added.
@@ -343,6 +377,24 @@ class Maximize(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return Maximize(self.quantity)
 
+    @inheritdoc(Container)
+    def copy(self):
+        out = Maximize.__new__(Maximize)
+        out.quantity = self.quantity
+        out.entries = self.entries
+        out.max = self.max
+        out._checkedForCrossReferences = False
+        return out
+
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        self.max = float("nan")
+
+    def _transferFrom(self, other):
+        self.entries = other.entries
+        self.max = other.max
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Maximize):
@@ -362,13 +414,17 @@ class Maximize(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.max = self.max
-            return out.specialize()
+            self.entries *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -495,8 +551,16 @@ class Maximize(Factory, Container):
         self.max = maxplus(self.max, objmax)
         return data[struct.calcsize(format):]
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+        self._pyAppend(fillCode, fillIndent, """
+{var}.entries += {w}
+if isnan({var}.max) or {q} > {var}.max:
+    {var}.max = {q}
+""", var=var, q=q, w=weightVar)
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -0,0 +1,481 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import numbers
+
+from histogrammar.defs import *
+from histogrammar.util import *
+from histogrammar.primitives.bin import Bin
+from histogrammar.primitives.count import Count
+
+def _zeros(length):
+    try:
+        import numpy
+    except ImportError:
+        return [0.0] * length
+    else:
+        return numpy.zeros(length, dtype=numpy.float64)
+
+def _asStorage(values):
+    try:
+        import numpy
+    except ImportError:
+        return [float(x) for x in values]
+    else:
+        return numpy.array(values, dtype=numpy.float64)
+
+def _added(x, y):
+    if isinstance(x, list):
+        return [a + b for a, b in zip(x, y)]
+    else:
+        return x + y
+
+def _addTo(x, y):
+    if isinstance(x, list):
+        for i in xrange(len(x)):
+            x[i] += float(y[i])
+    else:
+        import numpy
+        numpy.add(x, y, out=x)
+
+def _scale(x, factor):
+    if isinstance(x, list):
+        for i in xrange(len(x)):
+            x[i] *= factor
+    else:
+        x *= factor
+
+def _clear(x):
+    if isinstance(x, list):
+        x[:] = [0.0] * len(x)
+    else:
+        x.fill(0.0)
+
+def _blockSums(x, blocks):
+    if isinstance(x, list):
+        size = len(x) // blocks
+        return [sum(x[i*size : (i + 1)*size]) for i in xrange(blocks)]
+    else:
+        return x.reshape(blocks, -1).sum(axis=1)
+
+def _alleq(x, y):
+    if isinstance(x, list) or isinstance(y, list):
+        return len(x) == len(y) and all(numeq(a, b) for a, b in zip(x, y))
+    else:
+        return len(x) == len(y) and DenseValues._numeq(x, y)
+
+class MultiBin(Factory, Container):
+    """Split several quantities into equally spaced bins, each between its own low and high threshold, and count exactly one cell per datum.
+
+    This is equivalent to nested :doc:`Bins <histogrammar.primitives.bin.Bin>` with :doc:`Count <histogrammar.primitives.count.Count>` in the innermost bins and flow bins, such as
+
+    ::
+
+        Bin.ing(100, -5, 5, fill_x,
+          Bin.ing(100, -5, 5, fill_y))
+
+    but all of the counts are stored in one flat array (indexed by the ravelled cell number, last axis fastest) and the underflow, overflow and nanflow counts of each level in another, rather than in a tree of objects. Filling computes one cell index per datum, which the Numpy fill does for all data at once:
+
+    ::
+
+        MultiBin.ing((100, -5, 5, fill_x), (100, -5, 5, fill_y))
+
+    Its JSON form is identical to the nested Bins (with ``"type": "Bin"``), so existing consumers can read it; use ``MultiBin.fromBin`` to convert nested Bins back.
+    """
+
+    @staticmethod
+    def ed(axes, entries, counts, flows):
+        """Create a MultiBin that is only capable of being added.
+
+        Parameters:
+            axes (list of (int, float, float) triples): the number of bins and the low and high edges of each axis, outermost first.
+            entries (float): the number of entries.
+            counts (list of float): the counts in every cell, with the last axis varying fastest.
+            flows (list of lists of float): for each axis, the underflow, overflow and nanflow counts of every Bin at that level (three numbers per cell of the preceding axes).
+        """
+        if not isinstance(entries, numbers.Real) and entries not in ("nan", "inf", "-inf"):
+            raise TypeError("entries ({0}) must be a number".format(entries))
+        if entries < 0.0:
+            raise ValueError("entries ({0}) cannot be negative".format(entries))
+
+        out = MultiBin(*[(num, low, high, None) for num, low, high in axes])
+        if len(counts) != len(out.counts):
+            raise ValueError("counts must have {0} elements, not {1}".format(len(out.counts), len(counts)))
+        if len(flows) != len(out.flows) or any(len(x) != len(y) for x, y in zip(flows, out.flows)):
+            raise ValueError("flows must have {0} elements for each axis".format(", ".join(str(len(y)) for y in out.flows)))
+        out.entries = float(entries)
+        out.counts = _asStorage(counts)
+        out.flows = [_asStorage(x) for x in flows]
+        return out.specialize()
+
+    @staticmethod
+    def ing(*axes):
+        """Synonym for ``__init__``."""
+        return MultiBin(*axes)
+
+    def __init__(self, *axes):
+        """Create a MultiBin that is capable of being filled and added.
+
+        Parameters:
+            axes ((int, float, float, function returning float) quadruples): the number of bins, the low and high edges, and the quantity of each axis, outermost first.
+
+        Other parameters:
+            entries (float): the number of entries, initially 0.0.
+            nums, lows, highs (tuples): the number of bins and edges of each axis.
+            quantities (list of functions): the quantity of each axis.
+            counts (Numpy array or list of float): the counts in every cell, with the last axis varying fastest.
+            flows (list of Numpy arrays or lists of float): for each axis, the underflow, overflow and nanflow counts of every Bin at that level.
+        """
+        if len(axes) < 1:
+            raise ValueError("MultiBin needs at least one axis")
+        for axis in axes:
+            if not isinstance(axis, (list, tuple)) or len(axis) != 4:
+                raise TypeError("axis ({0}) must be a (num, low, high, quantity) quadruple".format(axis))
+            num, low, high, quantity = axis
+            if not isinstance(num, (int, long)):
+                raise TypeError("num ({0}) must be an integer".format(num))
+            if not isinstance(low, numbers.Real):
+                raise TypeError("low ({0}) must be a number".format(low))
+            if not isinstance(high, numbers.Real):
+                raise TypeError("high ({0}) must be a number".format(high))
+            if num < 1:
+                raise ValueError("num ({0}) must be least one".format(num))
+            if low >= high:
+                raise ValueError("low ({0}) must be less than high ({1})".format(low, high))
+
+        self.entries = 0.0
+        self.nums = tuple(int(axis[0]) for axis in axes)
+        self.lows = tuple(float(axis[1]) for axis in axes)
+        self.highs = tuple(float(axis[2]) for axis in axes)
+        self.quantities = [serializable(axis[3]) for axis in axes]
+        self.counts = _zeros(self._cells(len(axes)))
+        self.flows = [_zeros(3 * self._cells(level)) for level in xrange(len(axes))]
+        super(MultiBin, self).__init__()
+        self.specialize()
+
+    @property
+    def name(self):
+        # written to JSON as the equivalent nested Bins
+        return "Bin"
+
+    @property
+    def factory(self):
+        return MultiBin
+
+    @property
+    def dimensions(self):
+        """Number of axes."""
+        return len(self.nums)
+
+    def _cells(self, level):
+        out = 1
+        for num in self.nums[:level]:
+            out *= num
+        return out
+
+    def _axes(self):
+        return [(num, low, high) for num, low, high in zip(self.nums, self.lows, self.highs)]
+
+    def index(self, *bins):
+        """Flat index of the cell with bin number ``bins[i]`` on each axis ``i``."""
+        if len(bins) != self.dimensions:
+            raise ValueError("expected {0} bin numbers, not {1}".format(self.dimensions, len(bins)))
+        out = 0
+        for num, b in zip(self.nums, bins):
+            if not 0 <= b < num:
+                raise IndexError("bin number {0} out of range for an axis with {1} bins".format(b, num))
+            out = out * num + b
+        return out
+
+    def count(self, *bins):
+        """Number of entries in the cell with bin number ``bins[i]`` on each axis ``i``."""
+        return float(self.counts[self.index(*bins)])
+
+    def toArray(self):
+        """Counts as a Numpy array with one dimension per axis."""
+        import numpy
+        return numpy.array(self.counts, dtype=numpy.float64).reshape(self.nums)
+
+    def _levelEntries(self, level):
+        """Entries of every Bin at ``level`` of the equivalent nested Bins (one per cell of the preceding axes)."""
+        blocks = self._cells(level)
+        out = _blockSums(self.counts, blocks)
+        for flows in self.flows[level:]:
+            out = _added(out, _blockSums(flows, blocks))
+        return out
+
+    @inheritdoc(Container)
+    def zero(self): return MultiBin(*[(num, low, high, quantity) for (num, low, high), quantity in zip(self._axes(), self.quantities)])
+
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        _clear(self.counts)
+        for flows in self.flows:
+            _clear(flows)
+
+    def _checkCompatible(self, other):
+        if not isinstance(other, MultiBin):
+            raise ContainerException("cannot add {0} and {1}".format(self.factory.__name__, other.factory.__name__))
+        if self.nums != other.nums:
+            raise ContainerException("cannot add MultiBins because number of bins differs ({0} vs {1})".format(self.nums, other.nums))
+        if self.lows != other.lows:
+            raise ContainerException("cannot add MultiBins because low differs ({0} vs {1})".format(self.lows, other.lows))
+        if self.highs != other.highs:
+            raise ContainerException("cannot add MultiBins because high differs ({0} vs {1})".format(self.highs, other.highs))
+
+    @inheritdoc(Container)
+    def __add__(self, other):
+        self._checkCompatible(other)
+        out = self.zero()
+        out.entries = self.entries + other.entries
+        out.counts = _added(self.counts, other.counts)
+        out.flows = [_added(x, y) for x, y in zip(self.flows, other.flows)]
+        return out.specialize()
+
+    @inheritdoc(Container)
+    def __iadd__(self, other):
+        self._checkCompatible(other)
+        self.entries += other.entries
+        _addTo(self.counts, other.counts)
+        for x, y in zip(self.flows, other.flows):
+            _addTo(x, y)
+        return self
+
+    @inheritdoc(Container)
+    def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
+        if math.isnan(factor) or factor <= 0.0:
+            self.reset()
+        else:
+            self.entries *= factor
+            _scale(self.counts, factor)
+            for flows in self.flows:
+                _scale(flows, factor)
+        return self
+
+    @inheritdoc(Container)
+    def __rmul__(self, factor):
+        return self.__mul__(factor)
+
+    @inheritdoc(Container)
+    def fill(self, datum, weight=1.0):
+        self._checkForCrossReferences()
+
+        if weight > 0.0:
+            index = 0
+            for level, quantity in enumerate(self.quantities):
+                q = quantity(datum)
+                if not isinstance(q, numbers.Real):
+                    raise TypeError("function return value ({0}) must be boolean or number".format(q))
+
+                low = self.lows[level]
+                high = self.highs[level]
+                if math.isnan(q):
+                    self.flows[level][3*index + 2] += weight
+                    break
+                elif q < low:
+                    self.flows[level][3*index] += weight
+                    break
+                elif q >= high:
+                    self.flows[level][3*index + 1] += weight
+                    break
+                else:
+                    num = self.nums[level]
+                    index = index*num + min(int(math.floor(num * (q - low) / (high - low))), num - 1)
+            else:
+                self.counts[index] += weight
+
+            # no possibility of exception from here on out (for rollback)
+            self.entries += weight
+
+    def _numpy(self, data, weights, shape):
+        qs = []
+        for quantity in self.quantities:
+            q = self._npQuantity(quantity, data)
+            self._checkNPQuantity(q, shape)
+            qs.append(q)
+        self._checkNPWeights(weights, shape)
+        weights = self._makeNPWeights(weights, shape)
+        newentries = weights.sum()
+
+        import numpy
+
+        # ravelled cell index of each row, built up one axis at a time; rows that land in a flow bin stop there
+        index = numpy.zeros(shape[0], dtype=numpy.int64)
+        alive = weights > 0.0
+        newflows = []
+        for level, q in enumerate(qs):
+            num = self.nums[level]
+            low = self.lows[level]
+            high = self.highs[level]
+
+            q = numpy.array(q, dtype=numpy.float64)
+            nans = numpy.isnan(q)
+            with numpy.errstate(invalid="ignore"):
+                underflows = q < low
+                overflows = q >= high
+
+            flow = numpy.full(shape[0], -1, dtype=numpy.int64)
+            flow[underflows] = 0
+            flow[overflows] = 1
+            flow[nans] = 2
+            selection = alive & (flow >= 0)
+            newflows.append(numpy.bincount(3*index[selection] + flow[selection], weights=weights[selection], minlength=len(self.flows[level])))
+            alive &= flow < 0
+
+            # avoid nan warning in calculations by flinging the out-of-range values elsewhere
+            q[numpy.logical_not(alive)] = low
+            numpy.subtract(q, low, q)
+            numpy.multiply(q, num, q)
+            numpy.divide(q, high - low, q)
+            numpy.floor(q, q)
+            bins = numpy.array(q, dtype=numpy.int64)
+            numpy.minimum(bins, num - 1, bins)
+            numpy.multiply(index, num, index)
+            numpy.add(index, bins, index)
+
+        newcounts = numpy.bincount(index[alive], weights=weights[alive], minlength=len(self.counts))
+
+        # no possibility of exception from here on out (for rollback)
+        _addTo(self.counts, newcounts)
+        for x, y in zip(self.flows, newflows):
+            _addTo(x, y)
+        self.entries += float(newentries)
+
+    @property
+    def children(self):
+        """List of sub-aggregators, to make it possible to walk the tree."""
+        return []
+
+    def toBin(self):
+        """Convert to the equivalent nested :doc:`Bins <histogrammar.primitives.bin.Bin>` (with the same quantities)."""
+        entries = [self._levelEntries(level) for level in xrange(self.dimensions)]
+
+        def build(level, cell):
+            num = self.nums[level]
+            flows = self.flows[level]
+            if level == self.dimensions - 1:
+                out = Bin(num, self.lows[level], self.highs[level], self.quantities[level])
+                for i in xrange(num):
+                    out.values[i].entries = float(self.counts[cell*num + i])
+            else:
+                out = Bin(num, self.lows[level], self.highs[level], self.quantities[level], None)
+                out.values = [build(level + 1, cell*num + i) for i in xrange(num)]
+            out.underflow.entries = float(flows[3*cell])
+            out.overflow.entries = float(flows[3*cell + 1])
+            out.nanflow.entries = float(flows[3*cell + 2])
+            out.entries = self.entries if level == 0 else float(entries[level][cell])
+            return out.specialize()
+
+        return build(0, 0)
+
+    @staticmethod
+    def fromBin(bin):
+        """Convert nested :doc:`Bins <histogrammar.primitives.bin.Bin>` of :doc:`Count <histogrammar.primitives.count.Count>` (with Count flow bins and the same binning in every branch) into a MultiBin."""
+        axes = []
+        quantities = []
+        level = [bin]
+        while True:
+            first = level[0]
+            if not all(isinstance(x, Bin) and x.num == first.num and x.low == first.low and x.high == first.high for x in level):
+                raise ContainerException("nested Bins must have the same binning at each level to be converted into a MultiBin")
+            if not all(isinstance(flow, Count) and flow.transform is identity for x in level for flow in (x.underflow, x.overflow, x.nanflow)):
+                raise ContainerException("nested Bins must have Count flow bins to be converted into a MultiBin")
+            axes.append((first.num, first.low, first.high))
+            quantities.append(first.quantity)
+            if isinstance(first.values[0], Bin):
+                level = [v for x in level for v in x.values]
+            else:
+                break
+
+        counts = []
+        for x in level:
+            if isinstance(x.values, DenseValues) and isinstance(x.values.prototype, Count) and x.values.prototype.transform is identity:
+                counts.extend(x.values.arrays["entries"])
+            elif all(isinstance(v, Count) and v.transform is identity for v in x.values):
+                counts.extend(v.entries for v in x.values)
+            else:
+                raise ContainerException("the innermost Bins must contain Counts to be converted into a MultiBin")
+
+        flows = []
+        level = [bin]
+        for i in xrange(len(axes)):
+            flows.append([flow.entries for x in level for flow in (x.underflow, x.overflow, x.nanflow)])
+            if i + 1 < len(axes):
+                level = [v for x in level for v in x.values]
+
+        out = MultiBin.ed(axes, bin.entries, counts, flows)
+        out.quantities = list(quantities)
+        return out
+
+    @inheritdoc(Container)
+    def toJsonFragment(self, suppressName):
+        entries = [self._levelEntries(level) for level in xrange(self.dimensions)]
+
+        def fragment(level, cell, suppressName):
+            num = self.nums[level]
+            flows = self.flows[level]
+            if level == self.dimensions - 1:
+                valuesType = "Count"
+                valuesName = None
+                values = DenseValues.binaryFragment(Count(), {"entries": self.counts[cell*num : (cell + 1)*num]})
+                if values is None:
+                    values = [floatToJson(float(self.counts[cell*num + i])) for i in xrange(num)]
+            else:
+                valuesType = "Bin"
+                valuesName = self.quantities[level + 1].name
+                values = [fragment(level + 1, cell*num + i, True) for i in xrange(num)]
+            return maybeAdd({
+                "low": floatToJson(self.lows[level]),
+                "high": floatToJson(self.highs[level]),
+                "entries": floatToJson(self.entries if level == 0 else float(entries[level][cell])),
+                "values:type": valuesType,
+                "values": values,
+                "underflow:type": "Count",
+                "underflow": floatToJson(float(flows[3*cell])),
+                "overflow:type": "Count",
+                "overflow": floatToJson(float(flows[3*cell + 1])),
+                "nanflow:type": "Count",
+                "nanflow": floatToJson(float(flows[3*cell + 2])),
+                }, **{"name": None if suppressName else self.quantities[level].name,
+                      "values:name": valuesName})
+
+        return fragment(0, 0, suppressName)
+
+    @staticmethod
+    @inheritdoc(Factory)
+    def fromJsonFragment(json, nameFromParent):
+        return MultiBin.fromBin(Bin.fromJsonFragment(json, nameFromParent))
+
+    def __repr__(self):
+        return "<MultiBin nums={0} lows={1} highs={2}>".format(self.nums, self.lows, self.highs)
+
+    def __eq__(self, other):
+        return isinstance(other, MultiBin) and self.nums == other.nums and all(numeq(x, y) for x, y in zip(self.lows, other.lows)) and all(numeq(x, y) for x, y in zip(self.highs, other.highs)) and self.quantities == other.quantities and numeq(self.entries, other.entries) and _alleq(self.counts, other.counts) and all(_alleq(x, y) for x, y in zip(self.flows, other.flows))
+
+    def __ne__(self, other): return not self == other
+
+    def __hash__(self):
+        return hash((self.nums, self.lows, self.highs, tuple(self.quantities), self.entries, tuple(self.counts), tuple(tuple(x) for x in self.flows)))
+
+Factory.register(MultiBin)
@@ -113,13 +113,18 @@ class Select(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.cut = self.cut * factor
-            return out.specialize()
+            self.entries *= factor
+            self.cut *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -210,8 +215,16 @@ class Select(Factory, Container):
         data = self.cut._cudaUnpackAndFill(data, bigendian, alignment)
         return data
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+        w = self._pyTemporary(tmpVars, "w")
+        fillCode.append(" " * fillIndent + "{0} = {1} * {2}".format(w, q, weightVar))
+        fillCode.append(" " * fillIndent + "if {0} > 0.0:".format(w))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.cut, ".cut", w)
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
-        w = self.quantity(data)
+        w = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(w, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -221,7 +234,8 @@ class Select(Factory, Container):
         w[numpy.isnan(w)] = 0.0
         w[w < 0.0] = 0.0
 
-        self.cut._numpy(data, w, shape)
+        # only the rows that pass the cut are handed down
+        self._fillNPGroups(data, w, shape, numpy.array(w <= 0.0, dtype=numpy.int64), [self.cut])
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(weights.sum())
@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import math
 import numbers
 
@@ -25,6 +26,85 @@ LONG_NAN = -9223372036854775808
 LONG_MINUSINF = -9223372036854775807
 LONG_PLUSINF = 9223372036854775807
 
+class SparseBins(dict):
+    """Map from bin index to sub-aggregator that keeps track of its lowest and highest index as bins are added.
+
+    It is an ordinary ``dict`` (the ``bins`` of a SparselyBin), except that ``minKey`` and ``maxKey`` are maintained incrementally and the sorted list of keys is cached until the next new key, so that ``SparselyBin.minBin``, ``maxBin`` and range queries don't scan or sort all of the keys every time.
+    """
+
+    __slots__ = ("minKey", "maxKey", "_sorted")
+
+    def __init__(self, *args, **kwds):
+        dict.__init__(self, *args, **kwds)
+        self._recompute()
+
+    def _recompute(self):
+        self._sorted = None
+        if len(self) == 0:
+            self.minKey = None
+            self.maxKey = None
+        else:
+            self.minKey = min(self)
+            self.maxKey = max(self)
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            if self.minKey is None or key < self.minKey:
+                self.minKey = key
+            if self.maxKey is None or key > self.maxKey:
+                self.maxKey = key
+            self._sorted = None
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._recompute()
+
+    def pop(self, *args):
+        out = dict.pop(self, *args)
+        self._recompute()
+        return out
+
+    def popitem(self):
+        out = dict.popitem(self)
+        self._recompute()
+        return out
+
+    def clear(self):
+        dict.clear(self)
+        self._recompute()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwds):
+        for key, value in dict(*args, **kwds).items():
+            self[key] = value
+
+    def copy(self):
+        out = SparseBins()
+        dict.update(out, self)
+        out.minKey = self.minKey
+        out.maxKey = self.maxKey
+        out._sorted = self._sorted    # never modified in place, so it can be shared
+        return out
+
+    def __reduce__(self):
+        return (SparseBins, (dict(self),))
+
+    def sortedKeys(self):
+        """All keys in increasing order (cached until a new key is added)."""
+        if self._sorted is None:
+            self._sorted = sorted(self)
+        return self._sorted
+
+    def keysBetween(self, low, high):
+        """Keys ``k`` with ``low <= k < high``, in increasing order (by binary search)."""
+        keys = self.sortedKeys()
+        return keys[bisect.bisect_left(keys, low) : bisect.bisect_left(keys, high)]
+
 class SparselyBin(Factory, Container):
     """Split a quantity into equally spaced bins, creating them whenever their ``entries`` would be non-zero. Exactly one sub-aggregator is filled per datum.
 
@@ -103,7 +183,7 @@ class SparselyBin(Factory, Container):
         self.binWidth = binWidth
         self.entries = 0.0
         self.quantity = serializable(quantity)
-        self.value = value
+        self.value = value.zero() if value is not None else None
         if value is not None:
             self.contentType = value.name
         self.bins = {}
@@ -124,6 +204,12 @@ class SparselyBin(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return SparselyBin(self.binWidth, self.quantity, self.value, self.nanflow.zero(), self.origin)
 
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        self.bins.clear()
+        self.nanflow.reset()
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, SparselyBin):
@@ -158,26 +244,43 @@ class SparselyBin(Factory, Container):
                     self.bins[i] += v
                 else:
                     self.bins[i] = v.copy()
+            self.nanflow += other.nanflow
             return self
         else:
             raise ContainerException("cannot add {0} and {1}".format(self.name, other.name))
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.bins = dict((c, v * factor) for (c, v) in self.bins.items())
-            out.value = self.value.copy() if self.value is not None else None
-            out.nanflow = self.nanflow * factor
-            return out.specialize()
+            self.entries *= factor
+            for v in self.bins.values():
+                v *= factor
+            self.nanflow *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    @property
+    def bins(self):
+        """Map from bin index to sub-aggregator; always a histogrammar.primitives.sparselybin.SparseBins (assigned dicts are converted)."""
+        return self._bins
+
+    @bins.setter
+    def bins(self, bins):
+        if bins is not None and not isinstance(bins, SparseBins):
+            bins = SparseBins(bins)
+        self._bins = bins
+
     @property
     def numFilled(self):
         """The number of non-empty bins."""
@@ -197,7 +300,7 @@ class SparselyBin(Factory, Container):
         if len(self.bins) == 0:
             return None
         else:
-            return min(self.bins.keys())
+            return self.bins.minKey
 
     @property
     def maxBin(self):
@@ -205,7 +308,7 @@ class SparselyBin(Factory, Container):
         if len(self.bins) == 0:
             return None
         else:
-            return max(self.bins.keys())
+            return self.bins.maxKey
     @property
     def low(self):
         """The low edge of the first non-empty bin or None if no values have been accumulated."""
@@ -229,7 +332,23 @@ class SparselyBin(Factory, Container):
     @property
     def indexes(self):
         """Get a sequence of filled indexes."""
-        return sorted(self.keys)
+        return list(self.bins.sortedKeys())
+
+    def indexesBetween(self, low, high):
+        """Get the filled indexes ``i`` with ``low <= i < high``, in increasing order."""
+        return self.bins.keysBetween(low, high)
+
+    def sumBetween(self, low, high):
+        """Sum of the sub-aggregators with index ``i`` such that ``low <= i < high`` (a zero sub-aggregator if there are none, or ``None`` if this SparselyBin has neither a ``value`` nor any bins to make one from)."""
+        if self.value is not None:
+            out = self.value.zero()
+        elif len(self.bins) > 0:
+            out = self.bins[self.bins.minKey].zero()
+        else:
+            return None
+        for i in self.bins.keysBetween(low, high):
+            out += self.bins[i]
+        return out
 
     def range(self, index):
         """Get the low and high edge of a bin (given by index number)."""
@@ -348,8 +467,38 @@ class SparselyBin(Factory, Container):
     def _c99StructName(self):
         return "Sb" + self.value._c99StructName() + self.nanflow._c99StructName()
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+
+        fillCode.append(" " * fillIndent + "if isnan({0}):".format(q))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.nanflow, ".nanflow", weightVar)
+
+        fillCode.append(" " * fillIndent + "else:")
+        softbin = self._pyTemporary(tmpVars, "softbin")
+        index = self._pyTemporary(tmpVars, "index")
+        sub = self._pyTemporary(tmpVars, "sub")
+        bins = self._pyConstant(env, "bins", self.bins) if static else var + ".bins"
+        value = self._pyConstant(env, "value", self.value) if static else var + ".value"
+        self._pyAppend(fillCode, fillIndent + 4, """
+{softbin} = ({q} - {origin}) / {binWidth}
+if {softbin} <= {minusinf}:
+    {index} = {minusinf}
+elif {softbin} >= {plusinf}:
+    {index} = {plusinf}
+else:
+    {index} = int(floor({softbin}))
+if {index} not in {bins}:
+    {bins}[{index}] = {value}.copy()
+{sub} = {bins}[{index}]
+""", q=q, softbin=softbin, index=index, sub=sub, bins=bins, value=value,
+     origin=self._pyConstant(env, "origin", self.origin), binWidth=self._pyConstant(env, "binWidth", self.binWidth),
+     minusinf=self._pyConstant(env, "k", LONG_MINUSINF), plusinf=self._pyConstant(env, "k", LONG_PLUSINF))
+        self.value._pyGenerateCode(env, tmpVars, fillCode, fillIndent + 4, sub, False, weightVar)
+
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -357,37 +506,42 @@ class SparselyBin(Factory, Container):
 
         import numpy
 
-        selection = numpy.isnan(q)
-        numpy.bitwise_not(selection, selection)
-        subweights = weights.copy()
-        subweights[selection] = 0.0
-        self.nanflow._numpy(data, subweights, shape)
-
-        q = q.copy()
-        neginfs = numpy.isneginf(q)
-        posinfs = numpy.isposinf(q)
+        nans = numpy.isnan(q)
 
+        # saturate at the 64-bit endpoints (including infinities) before converting to integers
+        q = numpy.array(q, dtype=numpy.float64)
+        q[nans] = self.origin
         numpy.subtract(q, self.origin, q)
         numpy.divide(q, self.binWidth, q)
         numpy.floor(q, q)
+        lows = q <= LONG_MINUSINF
+        highs = q >= LONG_PLUSINF
+        q[lows] = 0.0
+        q[highs] = 0.0
         q = numpy.array(q, dtype=numpy.int64)
-        q[neginfs] = LONG_MINUSINF
-        q[posinfs] = LONG_PLUSINF
-
-        selected = q[weights > 0.0]
-
-        selection = numpy.empty(q.shape, dtype=numpy.bool)
-        for index in numpy.unique(selected):
-            if index != LONG_NAN:
-                bin = self.bins.get(index)
-                if bin is None:
-                    bin = self.value.zero()
-                    self.bins[index] = bin
-
-                numpy.not_equal(q, index, selection)
-                subweights[:] = weights
-                subweights[selection] = 0.0
-                bin._numpy(data, subweights, shape)
+        q[lows] = LONG_MINUSINF
+        q[highs] = LONG_PLUSINF
+
+        selection = weights > 0.0
+        nanselection = nans & selection
+        numpy.bitwise_not(nans, nans)
+        numpy.bitwise_and(selection, nans, selection)
+
+        # one sort finds every occupied bin; the inverse index says which one each row goes to
+        uniques, inverse = numpy.unique(q[selection], return_inverse=True)
+        keys = uniques.tolist()
+
+        newkeys = [k for k in keys if k not in self.bins]
+        if len(newkeys) > 0:
+            self.bins.update(zip(newkeys, [self.value.copy() for k in newkeys]))
+
+        subs = [self.nanflow] + [self.bins[k] for k in keys]
+        groups = numpy.empty(q.shape, dtype=numpy.int64)
+        groups[:] = len(subs)
+        groups[nanselection] = 0
+        groups[selection] = inverse + 1
+
+        self._fillNPGroups(data, weights, shape, groups, subs)
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
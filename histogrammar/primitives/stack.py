@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import json
 import math
 import numbers
@@ -107,6 +108,20 @@ class Stack(Factory, Container):
             bins.append((float("nan"), reduce(lambda a, b: a + b, ys[i:])))
         return Stack.ed(entries, bins, Count.ed(0.0))
 
+    @property
+    def bins(self):
+        """The ``N + 1`` thresholds and sub-aggregators."""
+        return self._bins
+
+    @bins.setter
+    def bins(self, bins):
+        self._bins = bins
+        edges = [threshold for threshold, sub in bins]
+        if all(x <= y for x, y in zip(edges[:-1], edges[1:])):
+            self._edges = edges
+        else:
+            self._edges = None
+
     @property
     def thresholds(self):
         """Cut thresholds (first items of ``bins``)."""
@@ -149,14 +164,20 @@ class Stack(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.bins = [(c, v * factor) for (c, v) in self.bins]
-            out.nanflow = self.nanflow * factor
-            return out.specialize()
+            self.entries *= factor
+            for c, v in self.bins:
+                v *= factor
+            self.nanflow *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
@@ -173,6 +194,9 @@ class Stack(Factory, Container):
 
             if math.isnan(q):
                 self.nanflow.fill(datum, weight)
+            elif self._edges is not None:
+                for index in xrange(bisect.bisect_right(self._edges, q)):
+                    self.bins[index][1].fill(datum, weight)
             else:
                 for threshold, sub in self.bins:
                     if q >= threshold:
@@ -319,8 +343,30 @@ class Stack(Factory, Container):
 
         return data
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        if self._edges is None:
+            return super(Stack, self)._pyGenerateCode(env, tmpVars, fillCode, fillIndent, var, static, weightVar)
+
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+
+        fillCode.append(" " * fillIndent + "if isnan({0}):".format(q))
+        self._pyChild(env, tmpVars, fillCode, fillIndent + 4, var, static, self.nanflow, ".nanflow", weightVar)
+
+        bins = self._pyConstant(env, "bins", self.bins) if static else var + ".bins"
+        edges = self._pyConstant(env, "edges", self._edges) if static else var + "._edges"
+        index = self._pyTemporary(tmpVars, "index")
+        sub = self._pyTemporary(tmpVars, "sub")
+        fillCode.append(" " * fillIndent + "else:")
+        self._pyAppend(fillCode, fillIndent + 4, """
+for {index} in range(bisect_right({edges}, {q})):
+    {sub} = {bins}[{index}][1]
+""", q=q, index=index, sub=sub, bins=bins, edges=edges)
+        self.bins[0][1]._pyGenerateCode(env, tmpVars, fillCode, fillIndent + 8, sub, False, weightVar)
+
+        fillCode.append(" " * fillIndent + "{0}.entries += {1}".format(var, weightVar))
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
@@ -328,26 +374,42 @@ class Stack(Factory, Container):
 
         import numpy
 
-        selection = numpy.isnan(q)
-        numpy.bitwise_not(selection, selection)
-        subweights = weights.copy()
-        subweights[selection] = 0.0
-        self.nanflow._numpy(data, subweights, shape)
-
-        # avoid nan warning in calculations by flinging the nans elsewhere
-        numpy.bitwise_not(selection, selection)
         q = numpy.array(q, dtype=numpy.float64)
-        q[selection] = float("-inf")
-        weights = weights.copy()
-        weights[selection] = 0.0
+        nans = numpy.isnan(q)
+        dropped = weights <= 0.0
+
+        groups = numpy.ones(q.shape, dtype=numpy.int64)
+        groups[nans & ~dropped] = 0
+        self._fillNPGroups(data, weights, shape, groups, [self.nanflow])
 
-        selection = numpy.empty(q.shape, dtype=numpy.bool)
-        for threshold, sub in self.bins:
-            numpy.less(q, threshold, selection)
-            subweights[:] = weights
-            subweights[selection] = 0.0
+        # avoid nan warning in calculations by flinging the nans elsewhere
+        q[nans] = float("-inf")
+        dropped |= nans
+
+        if self._edges is not None:
+            # one binary search per datum finds the deepest threshold it passes; each layer of rows
+            # is filled into its own partial aggregator exactly once, and the partials are then
+            # accumulated from the top threshold down (a reverse cumulative sum of containers)
+            groups = numpy.searchsorted(numpy.array(self._edges, dtype=numpy.float64), q, side="right") - 1
+            groups = numpy.array(groups, dtype=numpy.int64)
+            groups[groups < 0] = len(self.bins)
+            groups[dropped] = len(self.bins)
+
+            partials = [sub.zero() for sub in self.values]
+            self._fillNPGroups(data, weights, shape, groups, partials)
+
+            for index in xrange(len(self.bins) - 1, -1, -1):
+                if index + 1 < len(self.bins):
+                    partials[index] += partials[index + 1]
+                sub = self.bins[index][1]
+                sub += partials[index]
 
-            sub._numpy(data, subweights, shape)
+        else:
+            # unsorted or NaN thresholds (as from Stack.build): each threshold selects its rows independently
+            for threshold, sub in self.bins:
+                with numpy.errstate(invalid="ignore"):
+                    groups = numpy.array(~(q >= threshold) | dropped, dtype=numpy.int64)
+                self._fillNPGroups(data, weights, shape, groups, [sub])
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
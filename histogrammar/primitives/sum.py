@@ -28,6 +28,8 @@ class Sum(Factory, Container):
     Sum differs from :doc:`Count <histogrammar.primitives.count.Count>` in that it computes a quantity on the spot, rather than percolating a product of weight metadata from nested primitives. Also unlike weights, the sum can add both positive and negative quantities (weights are always non-negative).
     """
 
+    __slots__ = ("entries", "quantity", "sum", "_checkedForCrossReferences", "_clingFiller")
+
     @staticmethod
     def ed(entries, sum):
         """Create a Sum that is only capable of being added.
@@ -71,6 +73,24 @@ class Sum(Factory, Container):
     @inheritdoc(Container)
     def zero(self): return Sum(self.quantity)
 
+    @inheritdoc(Container)
+    def copy(self):
+        out = Sum.__new__(Sum)
+        out.quantity = self.quantity
+        out.entries = self.entries
+        out.sum = self.sum
+        out._checkedForCrossReferences = False
+        return out
+
+    @inheritdoc(Container)
+    def reset(self):
+        self.entries = 0.0
+        self.sum = 0.0
+
+    def _transferFrom(self, other):
+        self.entries = other.entries
+        self.sum = other.sum
+
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Sum):
@@ -89,18 +109,40 @@ class Sum(Factory, Container):
 
     @inheritdoc(Container)
     def __mul__(self, factor):
+        out = self.copy()
+        out *= factor
+        return out
+
+    @inheritdoc(Container)
+    def __imul__(self, factor):
         if math.isnan(factor) or factor <= 0.0:
-            return self.zero()
+            self.reset()
         else:
-            out = self.zero()
-            out.entries = factor * self.entries
-            out.sum = factor * self.sum
-            return out.specialize()
+            self.entries *= factor
+            self.sum *= factor
+        return self
 
     @inheritdoc(Container)
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    # dense storage in a Bin (see histogrammar.defs.DenseValues)
+    _denseFields = (("entries", 0.0), ("sum", 0.0))
+
+    @staticmethod
+    def _denseAdd(x, y):
+        return {"entries": x["entries"] + y["entries"], "sum": x["sum"] + y["sum"]}
+
+    @staticmethod
+    def _denseScale(x, factor):
+        x["entries"] *= factor
+        x["sum"] *= factor
+
+    @staticmethod
+    def _denseMergeNPMoments(x, sumw, sumwq):
+        x["entries"] += sumw
+        x["sum"] += sumwq
+
     @inheritdoc(Container)
     def fill(self, datum, weight=1.0, method=None):
         self._checkForCrossReferences()
@@ -174,24 +216,33 @@ class Sum(Factory, Container):
         self.sum += sum
         return data[struct.calcsize(format):]
 
+    def _pyGenerateCode(self, env, tmpVars, fillCode, fillIndent, var, static, weightVar):
+        self._pyGenerateFieldCode(env, tmpVars, fillCode, fillIndent, dict((field, var + "." + field) for field, initial in self._denseFields), weightVar)
+
+    def _pyGenerateFieldCode(self, env, tmpVars, fillCode, fillIndent, fields, weightVar):
+        q = self._pyQuantity(env, tmpVars, fillCode, fillIndent, self.quantity)
+        self._pyAppend(fillCode, fillIndent, """
+{entries} += {w}
+{sum} += {q} * {w}
+""", q=q, w=weightVar, **fields)
+
     def _numpy(self, data, weights, shape):
-        q = self.quantity(data)
+        q = self._npQuantity(self.quantity, data)
         self._checkNPQuantity(q, shape)
         self._checkNPWeights(weights, shape)
         weights = self._makeNPWeights(weights, shape)
 
+        import numpy
+        sumw, sumwq = self._momentsNP(numpy.asarray(q, dtype=numpy.float64), weights, order=1, skipnan=True)
+
         # no possibility of exception from here on out (for rollback)
-        self.entries += float(weights.sum())
+        self._mergeNPMoments(float(sumw[0]), float(sumwq[0]))
 
-        import numpy
-        selection = numpy.isnan(q)
-        numpy.bitwise_not(selection, selection)
-        numpy.bitwise_and(selection, weights > 0.0, selection)
-        q = q[selection]
-        weights = weights[selection]
-        q *= weights
-
-        self.sum += float(q.sum())
+    _npMoments = (1, True)
+
+    def _mergeNPMoments(self, sumw, sumwq):
+        self.entries += sumw
+        self.sum += sumwq
 
     def _sparksql(self, jvm, converter):
         return converter.Sum(self.quantity.asSparkSQL())
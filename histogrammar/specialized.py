@@ -14,7 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from histogrammar.defs import unweighted
+from histogrammar.defs import DenseValues, unweighted
 from histogrammar.primitives.average import Average
 from histogrammar.primitives.bin import Bin
 from histogrammar.primitives.count import Count
@@ -332,15 +332,31 @@ class SparselyTwoDimensionallyHistogramMethods(SparselyBin,
     def factory(self):
         return SparselyBin
 
+def _allInstances(values, cls):
+    if isinstance(values, DenseValues):
+        return isinstance(values.prototype, cls)
+    return all(isinstance(v, cls) for v in values)
+
+_mayHaveImplicitMethods = {}
+
 def addImplicitMethods(container):
     """Adds methods for each of the plotting front-ends on recognized combinations of primitives.
 
     Every histogrammar.defs.Container's constructor invokes these soon after it is constructed (in its ``specialize`` method), except for early code that can't resolve dependencies. (histogrammar.primitives.count.Count objects created as default parameter values for containers like histogrammar.primitives.bin.Bin are created before the histogrammar.specialized module can be created. These don't get checked by ``addImplicitMethods``, but they don't have any implicit methods to add, either.
 
     This function emulates Scala's "pimp my library" pattern, though ``addImplicitMethods`` has to be explicitly invoked and binds early, rather than late.
+
+    Whether a container's class can have implicit methods at all is decided once per class, so that the many leaves of a large tree (Count, Sum, etc.) return immediately.
     """
 
-    if isinstance(container, Bin) and all(isinstance(v, Count) for v in container.values):
+    cls = type(container)
+    mayHave = _mayHaveImplicitMethods.get(cls)
+    if mayHave is None:
+        mayHave = _mayHaveImplicitMethods[cls] = issubclass(cls, (Bin, SparselyBin, Categorize, Stack, IrregularlyBin, Fraction))
+    if not mayHave:
+        return
+
+    if isinstance(container, Bin) and _allInstances(container.values, Count):
         container.__class__ = HistogramMethods
 
     elif isinstance(container, SparselyBin) and container.contentType == "Count" and all(isinstance(v, Count) for v in container.bins.values()):
@@ -349,40 +365,40 @@ def addImplicitMethods(container):
     elif isinstance(container, Categorize) and container.contentType == "Count" and all(isinstance(v, Count) for v in container.bins.values()):
         container.__class__ = CategorizeHistogramMethods
 
-    elif isinstance(container, Bin) and all(isinstance(v, Average) for v in container.values):
+    elif isinstance(container, Bin) and _allInstances(container.values, Average):
         container.__class__ = ProfileMethods
 
     elif isinstance(container, SparselyBin) and container.contentType == "Average" and all(isinstance(v, Average) for v in container.bins.values()):
         container.__class__ = SparselyProfileMethods
 
-    elif isinstance(container, Bin) and all(isinstance(v, Deviate) for v in container.values):
+    elif isinstance(container, Bin) and _allInstances(container.values, Deviate):
         container.__class__ = ProfileErrMethods
 
     elif isinstance(container, SparselyBin) and container.contentType == "Deviate" and all(isinstance(v, Deviate) for v in container.bins.values()):
         container.__class__ = SparselyProfileErrMethods
 
     elif isinstance(container, Stack) and (
-        all(isinstance(v, Bin) and all(isinstance(vv, Count) for vv in v.values) for c, v in container.bins) or
-        all(isinstance(v, Select) and isinstance(v.cut, Bin) and all(isinstance(vv, Count) for vv in v.cut.values) for c, v in container.bins) or
+        all(isinstance(v, Bin) and _allInstances(v.values, Count) for c, v in container.bins) or
+        all(isinstance(v, Select) and isinstance(v.cut, Bin) and _allInstances(v.cut.values, Count) for c, v in container.bins) or
         all(isinstance(v, SparselyBin) and v.contentType == "Count" and all(isinstance(vv, Count) for vv in v.bins.values()) for c, v in container.bins) or
         all(isinstance(v, Select) and isinstance(v.cut, SparselyBin) and v.cut.contentType == "Count" and all(isinstance(vv, Count) for vv in v.cut.bins.values()) for c, v in container.bins)):
         container.__class__ = StackedHistogramMethods
 
     elif isinstance(container, IrregularlyBin) and (
-        all(isinstance(v, Bin) and all(isinstance(vv, Count) for vv in v.values) for c, v in container.bins) or
-        all(isinstance(v, Select) and isinstance(v.cut, Bin) and all(isinstance(vv, Count) for vv in v.cut.values) for c, v in container.bins) or
+        all(isinstance(v, Bin) and _allInstances(v.values, Count) for c, v in container.bins) or
+        all(isinstance(v, Select) and isinstance(v.cut, Bin) and _allInstances(v.cut.values, Count) for c, v in container.bins) or
         all(isinstance(v, SparselyBin) and v.contentType == "Count" and all(isinstance(vv, Count) for vv in v.bins.values()) for c, v in container.bins) or
         all(isinstance(v, Select) and isinstance(v.cut, SparselyBin) and v.cut.contentType == "Count" and all(isinstance(vv, Count) for vv in v.cut.bins.values()) for c, v in container.bins)):
         container.__class__ = PartitionedHistogramMethods
 
     elif isinstance(container, Fraction) and (
-        (isinstance(container.denominator, Bin) and all(isinstance(v, Count) for v in container.denominator.values)) or
-        (isinstance(container.denominator, Select) and isinstance(container.denominator.cut, Bin) and all(isinstance(v, Count) for v in container.denominator.cut.values)) or
+        (isinstance(container.denominator, Bin) and _allInstances(container.denominator.values, Count)) or
+        (isinstance(container.denominator, Select) and isinstance(container.denominator.cut, Bin) and _allInstances(container.denominator.cut.values, Count)) or
         (isinstance(container.denominator, SparselyBin) and container.denominator.contentType == "Count" and all(isinstance(v, Count) for v in container.denominator.bins.values())) or
         (isinstance(container.denominator, Select) and isinstance(container.denominator.cut, SparselyBin) and container.denominator.cut.contentType == "Count" and all(isinstance(v, Count) for v in container.denominator.cut.bins.values()))):
         container.__class__ = FractionedHistogramMethods
 
-    elif isinstance(container, Bin) and all(isinstance(v, Bin) and all(isinstance(vv, Count) for vv in v.values) for v in container.values):
+    elif isinstance(container, Bin) and all(isinstance(v, Bin) and _allInstances(v.values, Count) for v in container.values):
         container.__class__ = TwoDimensionallyHistogramMethods
 
     elif isinstance(container, SparselyBin) and container.contentType == "SparselyBin" and all(isinstance(v, SparselyBin) and v.contentType == "Count" and all(isinstance(vv, Count) for vv in v.bins.values()) for v in container.bins.values()):
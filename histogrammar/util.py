@@ -14,12 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import ast
 import bisect
+import functools
 import marshal
 import math
 import random
 import types
 import sys
+import threading
 
 import histogrammar.pycparser.c_ast
 
@@ -39,35 +42,53 @@ def inheritdoc(cls):
 
 ################################################################ attach sub-methods to the fill and plot methods
 
-class FillMethod(object):
-    def __init__(self, container, fill):
-        self.container = container
-        self.fill = fill
-        self.root = container.fillroot
-        self.pycuda = container.fillpycuda
-        self.numpy = container.fillnumpy
-        self.sparksql = container.fillsparksql
-    def __call__(self, *args, **kwds):
-        return self.fill(*args, **kwds)
+class FillMethod(functools.partial):
+    """A container's ``fill``, bound to the container, with the other ways to fill it as attributes: ``fill.numpy``, ``fill.root``, ``fill.many``, etc.
 
-class PlotMethod(object):
-    def __init__(self, container, plot):
-        self.container = container
-        self.plot = plot
-        try:
-            self.root = container.plotroot
-        except (AttributeError, KeyError):
-            pass
-        try:
-            self.bokeh = container.plotbokeh
-        except (AttributeError, KeyError):
-            pass
-        try:
-            self.matplotlib = container.plotmatplotlib
-        except (AttributeError, KeyError):
-            pass
-    def __call__(self, *args, **kwds):
-        return self.plot(*args, **kwds)
+    These are created on attribute access by histogrammar.util.fillmethod, rather than stored in every container, and calling one costs no more than calling a bound method.
+    """
+    __slots__ = ()
+    container = property(lambda self: self.args[0])
+    root = property(lambda self: self.args[0].fillroot)
+    pycuda = property(lambda self: self.args[0].fillpycuda)
+    numpy = property(lambda self: self.args[0].fillnumpy)
+    compiled = property(lambda self: self.args[0].compileFill)
+    many = property(lambda self: self.args[0].fillmany)
+    sparksql = property(lambda self: self.args[0].fillsparksql)
+
+class PlotMethod(functools.partial):
+    """A container's ``plot``, bound to the container, with the plotting front-ends that apply to it as attributes: ``plot.root``, ``plot.bokeh``, ``plot.matplotlib``."""
+    __slots__ = ()
+    container = property(lambda self: self.args[0])
+    root = property(lambda self: self.args[0].plotroot)
+    bokeh = property(lambda self: self.args[0].plotbokeh)
+    matplotlib = property(lambda self: self.args[0].plotmatplotlib)
+
+class fillmethod(object):
+    """Class-level descriptor for a container's ``fill`` method, which binds it as a histogrammar.util.FillMethod."""
+    bound = FillMethod
+
+    def __init__(self, fcn):
+        self.fcn = fcn
+        self.__doc__ = fcn.__doc__
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self.fcn
+        return self.bound(self.fcn, obj)
+
+class plotmethod(fillmethod):
+    """Class-level descriptor for a container's ``plot`` method, which binds it as a histogrammar.util.PlotMethod."""
+    bound = PlotMethod
+
+def attachMethods(cls):
+    """Replace the ``fill`` and ``plot`` functions of ``cls`` and its base classes with histogrammar.util.fillmethod and histogrammar.util.plotmethod descriptors (once per class)."""
+    for base in cls.__mro__:
+        for name, descriptor in (("fill", fillmethod), ("plot", plotmethod)):
+            fcn = base.__dict__.get(name)
+            if isinstance(fcn, types.FunctionType):
+                setattr(base, name, descriptor(fcn))
+    return cls
 
 ################################################################ handling key set comparisons with optional keys
 
@@ -192,6 +213,348 @@ def rangeToJson(x):
 
 ################################################################ function tools
 
+def compileStringFcn(expr):
+    """Compile a string expression into a Python function of one datum.
+
+    Variables in the expression are resolved against the datum's fields: the keys of a dict, the fields of a Numpy record array, the columns of a Pandas DataFrame, or the attributes of an object. Variables that aren't fields fall back to ``math.*``, ``numpy``/``np``, and this module's globals. If the datum has no fields, the expression must have at most one unrecognized variable, which stands for the datum itself.
+
+    The namespace is built only once. The expression is compiled into a function that takes the fields it references as arguments, so a call costs one lookup per referenced field instead of a namespace rebuild.
+    """
+    code = compile(expr, "<string>", "eval")
+
+    namespace = dict(globals())
+    namespace.update(math.__dict__)
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    else:
+        namespace["numpy"] = numpy
+        namespace["np"] = numpy
+    try:
+        import pandas
+    except ImportError:
+        pandas = None
+
+    # names loaded as variables, including those in nested scopes (comprehensions, lambdas); attribute names are not variables
+    def variableNames(c):
+        try:
+            from dis import get_instructions
+        except ImportError:
+            out = set(c.co_names)
+        else:
+            out = set(x.argval for x in get_instructions(c) if x.opname in ("LOAD_NAME", "LOAD_GLOBAL"))
+        for x in c.co_consts:
+            if isinstance(x, types.CodeType):
+                out.update(variableNames(x))
+        return out
+
+    try:
+        import builtins
+    except ImportError:
+        import __builtin__ as builtins
+    known = set(namespace).union(dir(builtins))
+
+    variables = variableNames(code)
+    required = tuple(sorted(n for n in variables if n not in known))   # can only be fields
+    optional = tuple(sorted(n for n in variables if n in known))       # fields override the namespace
+
+    compiled = {}
+    def compileWith(arguments):
+        try:
+            return compiled[arguments]
+        except KeyError:
+            # the trailing newline keeps a comment at the end of expr from swallowing the parenthesis
+            out = compiled[arguments] = eval("lambda {0}: ({1}\n)".format(", ".join(arguments), expr), namespace)
+            return out
+
+    def fromMapping(mapping, convert=None):
+        arguments = required
+        if len(optional) > 0:
+            overrides = tuple([n for n in optional if n in mapping])
+            if len(overrides) > 0:
+                arguments = required + overrides
+        try:
+            if convert is None:
+                values = [mapping[n] for n in arguments]
+            else:
+                values = [convert(mapping[n]) for n in arguments]
+        except KeyError as err:
+            raise NameError("name {0} is not defined".format(err))
+        return compileWith(arguments)(*values)
+
+    def fastMapping(getMapping):
+        # the common case, in which no field overrides the namespace, resolved into direct key lookups
+        source = ["def fast(datum):"]
+        if getMapping is not None:
+            source.append("    datum = getMapping(datum)")
+        for n in optional:
+            source.append("    if {0} in datum: return fromMapping(datum)".format(repr(n)))
+        if len(required) > 0:
+            source.append("    try:")
+            source.append("        {0}, = {1},".format(", ".join("a" + str(i) for i in xrange(len(required))), ", ".join("datum[{0}]".format(repr(n)) for n in required)))
+            source.append("    except KeyError:")
+            source.append("        return fromMapping(datum)")
+        source.append("    return fcn({0})".format(", ".join("a" + str(i) for i in xrange(len(required)))))
+        scope = {"fromMapping": fromMapping, "getMapping": getMapping, "fcn": compileWith(required)}
+        exec("\n".join(source), scope)
+        return scope["fast"]
+
+    def fromSingleVariable(datum):
+        v = set(required)
+        if len(v) > 1:
+            raise NameError("more than one unrecognized variable names in single-argument function: {0}".format(v))
+        elif len(v) == 0:
+            fcn = compileWith(())
+            return lambda datum: fcn()
+        else:
+            return compileWith(required)
+
+    # how to evaluate each type of datum (only discover it once per type)
+    dispatch = {}
+
+    def function(datum):
+        fcn = dispatch.get(type(datum))
+        if fcn is None:
+            # if the datum is a dict, its keys are the variables
+            if isinstance(datum, dict):
+                fcn = fastMapping(None)
+
+            # if the datum is a Numpy record array, its field names are the variables
+            elif numpy is not None and isinstance(datum, numpy.core.records.recarray):
+                fcn = lambda datum: fromMapping(dict((n, datum[n]) for n in datum.dtype.names))
+
+            # if the datum is a Pandas DataFrame, its column names are the variables
+            elif pandas is not None and isinstance(datum, pandas.core.frame.DataFrame):
+                fcn = lambda datum: fromMapping(datum, lambda column: column.values)
+
+            # if the datum has attributes, they are the variables
+            elif hasattr(datum, "__dict__"):
+                fcn = fastMapping(lambda datum: datum.__dict__)
+
+            # otherwise, use the one and only variable as the object
+            else:
+                fcn = fromSingleVariable(datum)
+
+            dispatch[type(datum)] = fcn
+
+        return fcn(datum)
+
+    return function
+
+class NumpyTranslationError(Exception):
+    """Raised when a string expression can't be translated into a Numpy program (see histogrammar.util.compileNumpyFcn)."""
+    pass
+
+# math and builtin functions that have elementwise Numpy equivalents
+numpyFunctions = {"sqrt": "sqrt", "exp": "exp", "expm1": "expm1", "log": "log", "log10": "log10", "log1p": "log1p", "log2": "log2",
+                  "sin": "sin", "cos": "cos", "tan": "tan", "asin": "arcsin", "acos": "arccos", "atan": "arctan", "atan2": "arctan2",
+                  "sinh": "sinh", "cosh": "cosh", "tanh": "tanh", "asinh": "arcsinh", "acosh": "arccosh", "atanh": "arctanh",
+                  "fabs": "fabs", "abs": "absolute", "floor": "floor", "ceil": "ceil", "trunc": "trunc", "hypot": "hypot", "pow": "power",
+                  "copysign": "copysign", "fmod": "fmod", "isnan": "isnan", "isinf": "isinf", "isfinite": "isfinite",
+                  "degrees": "degrees", "radians": "radians"}
+
+numpyBinaryOperators = {"Add": "add", "Sub": "subtract", "Mult": "multiply", "Div": "true_divide", "FloorDiv": "floor_divide", "Mod": "remainder", "Pow": "power"}
+numpyUnaryOperators = {"USub": "negative", "Not": "logical_not"}
+numpyComparisons = {"Eq": "equal", "NotEq": "not_equal", "Lt": "less", "LtE": "less_equal", "Gt": "greater", "GtE": "greater_equal"}
+numpyPowers = {2: "square", 0.5: "sqrt"}
+numpyBooleanOperators = {"And": "logical_and", "Or": "logical_or"}
+numpyConstants = {"pi": math.pi, "e": math.e, "inf": float("inf"), "nan": float("nan")}
+
+def compileNumpyFcn(expr):
+    """Translate a string expression into a program of Numpy ufunc calls, to be evaluated on columnar data.
+
+    Arithmetic, comparisons, boolean operators, conditional expressions, ``math.*`` functions with elementwise equivalents, and ``numpy.*``/``np.*`` ufuncs are translated; anything else raises histogrammar.util.NumpyTranslationError. Every intermediate result is written into a reused buffer with ``out=``, so a program allocates at most as many temporary arrays as the expression's nesting depth, not one per operation. Each buffer has the type that its ufunc returns (booleans for comparisons, integers for integer arithmetic), so results have the same types as the untranslated expression's.
+
+    Returns a function of ``(datum, float32=False)``, where ``datum`` is a dict of arrays, a Numpy record array, a Pandas DataFrame, or a single array (for an expression with one variable). With ``float32``, fields are converted to single precision and the program computes in single precision.
+    """
+    import numpy
+
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError as err:
+        raise NumpyTranslationError(str(err))
+
+    # each step is (ufunc, operands, output slot); operands are ("name", n), ("const", x), or ("slot", i)
+    steps = []
+    names = set()
+    freeSlots = []
+    numSlots = [0]
+
+    def ufunc(name):
+        out = getattr(numpy, name, None)
+        if not isinstance(out, numpy.ufunc):
+            raise NumpyTranslationError("numpy.{0} is not a ufunc".format(name))
+        return out
+
+    def emit(fcn, operands, keep=()):
+        slots = [x[1] for x in operands if x[0] == "slot" and x not in keep]
+        if len(slots) > 0:
+            # write in place over the first temporary and release the others
+            out = slots[0]
+            freeSlots.extend(slots[1:])
+        elif len(freeSlots) > 0:
+            out = freeSlots.pop()
+        else:
+            out = numSlots[0]
+            numSlots[0] += 1
+        steps.append((fcn, tuple(operands), out))
+        return ("slot", out)
+
+    def boolean(node):
+        # only for booleans do "and" and "or" agree with logical_and and logical_or (Python's return one of the operands)
+        nodeType = type(node).__name__
+        if nodeType == "Compare" or (nodeType == "UnaryOp" and type(node.op).__name__ == "Not"):
+            return True
+        elif nodeType == "BoolOp":
+            return all(boolean(x) for x in node.values)
+        elif nodeType in ("Constant", "NameConstant"):
+            return isinstance(getattr(node, "value", None), bool)
+        else:
+            return False
+
+    def translate(node):
+        nodeType = type(node).__name__
+
+        if nodeType == "Expression":
+            return translate(node.body)
+
+        elif nodeType == "Name":
+            names.add(node.id)
+            return ("name", node.id)
+
+        elif nodeType in ("Num", "Constant", "NameConstant"):
+            value = getattr(node, "value", getattr(node, "n", None))
+            if isinstance(value, bool) or (isinstance(value, (int, float, complex)) and not isinstance(value, basestring)):
+                return ("const", value)
+            raise NumpyTranslationError("constant {0} is not a number".format(repr(value)))
+
+        elif nodeType == "BinOp" and type(node.op).__name__ == "Pow" and type(node.right).__name__ in ("Num", "Constant") and getattr(node.right, "value", getattr(node.right, "n", None)) in numpyPowers:
+            # numpy.power is much slower than these for common exponents
+            return emit(ufunc(numpyPowers[getattr(node.right, "value", getattr(node.right, "n", None))]), [translate(node.left)])
+
+        elif nodeType == "BinOp" and type(node.op).__name__ in numpyBinaryOperators:
+            return emit(ufunc(numpyBinaryOperators[type(node.op).__name__]), [translate(node.left), translate(node.right)])
+
+        elif nodeType == "UnaryOp" and type(node.op).__name__ == "UAdd":
+            return translate(node.operand)
+
+        elif nodeType == "UnaryOp" and type(node.op).__name__ in numpyUnaryOperators:
+            return emit(ufunc(numpyUnaryOperators[type(node.op).__name__]), [translate(node.operand)])
+
+        elif nodeType == "Compare" and all(type(x).__name__ in numpyComparisons for x in node.ops):
+            left = translate(node.left)
+            out = None
+            for op, comparator in zip(node.ops, node.comparators):
+                right = translate(comparator)
+                # the right side of one comparison is the left side of the next, so it must survive
+                result = emit(ufunc(numpyComparisons[type(op).__name__]), [left, right], keep=(right,))
+                out = result if out is None else emit(ufunc("logical_and"), [out, result])
+                left = right
+            if left[0] == "slot":
+                freeSlots.append(left[1])
+            return out
+
+        elif nodeType == "BoolOp" and type(node.op).__name__ in numpyBooleanOperators:
+            if not boolean(node):
+                raise NumpyTranslationError("\"{0}\" is only translated for comparisons and booleans".format(type(node.op).__name__.lower()))
+            fcn = ufunc(numpyBooleanOperators[type(node.op).__name__])
+            out = translate(node.values[0])
+            for value in node.values[1:]:
+                out = emit(fcn, [out, translate(value)])
+            return out
+
+        elif nodeType == "IfExp":
+            # both branches are evaluated, as is usual for array expressions
+            return emit(where, [translate(node.test), translate(node.body), translate(node.orelse)])
+
+        elif nodeType == "Call" and len(node.keywords) == 0 and not any(type(x).__name__ == "Starred" for x in node.args) and getattr(node, "starargs", None) is None and getattr(node, "kwargs", None) is None:
+            func = node.func
+            if type(func).__name__ == "Name" and func.id in numpyFunctions:
+                fcn = ufunc(numpyFunctions[func.id])
+            elif type(func).__name__ == "Attribute" and type(func.value).__name__ == "Name" and func.value.id in ("numpy", "np"):
+                fcn = ufunc(func.attr)
+            elif type(func).__name__ == "Attribute" and type(func.value).__name__ == "Name" and func.value.id == "math" and func.attr in numpyFunctions:
+                fcn = ufunc(numpyFunctions[func.attr])
+            else:
+                raise NumpyTranslationError("no elementwise equivalent of {0}".format(ast.dump(func)))
+            if len(node.args) != fcn.nin:
+                raise NumpyTranslationError("{0} takes {1} arguments".format(fcn.__name__, fcn.nin))
+            return emit(fcn, [translate(x) for x in node.args])
+
+        else:
+            raise NumpyTranslationError("can't translate {0}".format(ast.dump(node)))
+
+    def where(test, body, orelse, out):
+        out[...] = numpy.where(test, body, orelse)
+        return out
+
+    result = translate(tree)
+    steps = tuple(steps)
+    variables = tuple(sorted(names))
+
+    def function(datum, float32=False):
+        dtype = numpy.float32 if float32 else numpy.float64
+
+        env = {}
+        if isinstance(datum, dict):
+            fields = datum
+        elif isinstance(datum, numpy.core.records.recarray):
+            fields = dict((n, datum[n]) for n in datum.dtype.names if n in names)
+        elif hasattr(datum, "columns") and hasattr(datum, "values"):
+            fields = dict((n, datum[n].values) for n in datum.columns if n in names)
+        else:
+            fields = {}
+            unknown = [n for n in variables if n not in numpyConstants]
+            if len(unknown) > 1:
+                raise NameError("more than one unrecognized variable names in single-argument function: {0}".format(set(unknown)))
+            elif len(unknown) == 1:
+                fields[unknown[0]] = datum
+
+        for n in variables:
+            if n in fields:
+                x = fields[n]
+                if float32 and isinstance(x, numpy.ndarray) and x.dtype != numpy.float32:
+                    x = numpy.asarray(x, dtype=numpy.float32)
+                env[n] = x
+            elif n in numpyConstants:
+                env[n] = dtype(numpyConstants[n]) if float32 else numpyConstants[n]
+            else:
+                raise NameError("name {0} is not defined".format(repr(n)))
+
+        def empty(x):
+            # a zero-length stand-in for x with the same type, to find the dtype that each step returns (booleans for comparisons, integers for integer arithmetic) without computing it
+            return x.reshape(-1)[:0] if isinstance(x, numpy.ndarray) and x.ndim > 0 else x
+
+        buffers = [None] * numSlots[0]
+        def value(operand):
+            kind, x = operand
+            if kind == "name":
+                return env[x]
+            elif kind == "const":
+                return dtype(x) if float32 and isinstance(x, float) else x
+            else:
+                return buffers[x]
+
+        with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for fcn, operands, out in steps:
+                args = [value(x) for x in operands]
+                shape = numpy.broadcast(*args).shape
+                if fcn is where:
+                    resultType = numpy.where(numpy.empty(0, dtype=bool), empty(args[1]), empty(args[2])).dtype
+                else:
+                    resultType = fcn(*[empty(x) for x in args]).dtype
+                if buffers[out] is None or buffers[out].shape != shape or buffers[out].dtype != resultType:
+                    buffers[out] = numpy.empty(shape, dtype=resultType)
+                fcn(*args, out=buffers[out])
+
+        return value(result)
+
+    return function
+
+# translated Numpy programs by expression (None if the expression can't be translated)
+numpyPrograms = {}
+
 class UserFcn(object):
     """Base trait for user functions.
 
@@ -245,84 +608,53 @@ class UserFcn(object):
 
     def __call__(self, *args, **kwds):
         if not hasattr(self, "fcn"):
-            if isinstance(self.expr, types.FunctionType):
-                self.fcn = self.expr
-
-            elif isinstance(self.expr, basestring):
-                c = compile(self.expr, "<string>", "eval")
-
-                # close over this state
-                varname = [None]
-
-                try:
-                    import numpy
-                except ImportError:
-                    numpy = None
-                try:
-                    import pandas
-                except ImportError:
-                    pandas = None
-
-                def function(datum):
-                    context = dict(globals())
-
-                    # fill the namespace with math.* functions
-                    context.update(math.__dict__)
-
-                    # if you have Numpy, include numpy.* functions
-                    if numpy is not None:
-                        context["numpy"] = numpy
-                        context["np"] = numpy
-
-                    # if the datum is a dict, override the namespace with its dict keys
-                    if isinstance(datum, dict):                # if it's a dict
-                        context.update(datum)                  # use its items as variables
-
-                    # if the datum is a Numpy record array, override the namespace with its field names
-                    elif numpy is not None and isinstance(datum, numpy.core.records.recarray):
-                        context.update(dict((n, datum[n]) for n in datum.dtype.names))
-
-                    # if the datum is a Pandas DataFrame, override the namespace with its column names
-                    elif pandas is not None and isinstance(datum, pandas.core.frame.DataFrame):
-                        context.update(dict((n, datum[n].values) for n in datum.columns))
+            self._makeFcn()
+        return self.fcn(*args, **kwds)
 
-                    else:
-                        try:
-                            context.update(datum.__dict__)     # try to use its attributes as variables
-                        except AttributeError:
-                            v, = varname                       # otherwise, use the one and only variable
-                            if v is None:                      # as the object (only discover it once)
-                                v = set(c.co_names) - set(context.keys())
-                                if len(v) > 1:
-                                    raise NameError("more than one unrecognized variable names in single-argument function: {0}".format(set(c.co_names) - set(context.keys())))
-                                elif len(v) == 0:
-                                    v = None
-                                else:
-                                    v = list(v)[0]
+    def asPython(self):
+        """Return a plain Python callable that computes this function (used by generated code, such as ``compileFill``)."""
+        if not hasattr(self, "fcn"):
+            self._makeFcn()
+        return self.fcn
 
-                                varname[0] = v
+    def _makeFcn(self):
+        if isinstance(self.expr, types.FunctionType):
+            self.fcn = self.expr
 
-                            if v is not None:
-                                context.update({v: datum})
+        elif isinstance(self.expr, basestring):
+            self.fcn = compileStringFcn(self.expr)
 
-                    return eval(c, context)
+        elif self.expr is None:
+            raise TypeError("immutable container (created from JSON or .ed) cannot be filled")
 
-                self.fcn = function
+        else:
+            try:
+                from pyspark.sql.column import Column
+            except ImportError:
+                pass
+            else:
+                if isinstance(self.expr, Column):
+                    raise TypeError("cannot use SparkSQL Column with the normal fill method; use fill.sparksql")
+            raise TypeError("unrecognized type for function: {0}".format(type(self.expr)))
 
-            elif self.expr is None:
-                raise TypeError("immutable container (created from JSON or .ed) cannot be filled")
+    def vectorized(self, data, float32=False):
+        """Evaluate this function on columnar ``data`` (used by ``fill.numpy``).
 
-            else:
+        String expressions are translated once into Numpy ufunc programs by histogrammar.util.compileNumpyFcn (optionally computing in single precision); expressions that can't be translated, and Python functions, are simply called on ``data``.
+        """
+        if isinstance(self.expr, basestring):
+            if self.expr not in numpyPrograms:
+                try:
+                    numpyPrograms[self.expr] = compileNumpyFcn(self.expr)
+                except (NumpyTranslationError, ImportError):
+                    numpyPrograms[self.expr] = None
+            program = numpyPrograms[self.expr]
+            if program is not None:
                 try:
-                    from pyspark.sql.column import Column
-                except ImportError:
+                    return program(data, float32)
+                except (NameError, TypeError, ValueError):
                     pass
-                else:
-                    if isinstance(self.expr, Column):
-                        raise TypeError("cannot use SparkSQL Column with the normal fill method; use fill.sparksql")
-                raise TypeError("unrecognized type for function: {0}".format(type(self.expr)))
-
-        return self.fcn(*args, **kwds)
+        return self(data)
 
     def __reduce__(self):
         if isinstance(self.expr, basestring) or self.expr is None:
@@ -376,25 +708,87 @@ class CachedFcn(UserFcn):
         np = None
 
     def __call__(self, *args, **kwds):
-        if hasattr(self, "lastArgs") and \
-           len(args) == len(self.lastArgs) and \
-           (all(x is y for x, y in zip(args, self.lastArgs)) or \
-            (self.np is not None and all(self.np.array_equal(x, y) for x, y in zip(args, self.lastArgs))) or \
-            (self.np is None and all(x == y for x, y in zip(args, self.lastArgs)))) and \
-           set(kwds.keys()) == set(self.lastKwds.keys()) and \
-           (all(kwds[k] is self.lastKwds[k] for k in kwds) or \
-            (self.np is not None and all(self.np.array_equal(kwds[k], self.lastKwds[k]) for k in kwds)) or \
-            (self.np is None and all(kwds[k] == self.lastKwds[k] for k in kwds))):
-            return self.lastReturn
-        else:
-            self.lastArgs = args
-            self.lastKwds = kwds
-            self.lastReturn = super(CachedFcn, self).__call__(*args, **kwds)
-            return self.lastReturn
+        # the memo is read and replaced as one tuple, so that concurrent calls (fill.numpy with threads) can't pair one call's arguments with another's result
+        last = getattr(self, "_last", None)
+        if last is not None:
+            lastArgs, lastKwds, lastReturn = last
+            if len(args) == len(lastArgs) and \
+               (all(x is y for x, y in zip(args, lastArgs)) or \
+                (self.np is not None and all(self.np.array_equal(x, y) for x, y in zip(args, lastArgs))) or \
+                (self.np is None and all(x == y for x, y in zip(args, lastArgs)))) and \
+               set(kwds.keys()) == set(lastKwds.keys()) and \
+               (all(kwds[k] is lastKwds[k] for k in kwds) or \
+                (self.np is not None and all(self.np.array_equal(kwds[k], lastKwds[k]) for k in kwds)) or \
+                (self.np is None and all(kwds[k] == lastKwds[k] for k in kwds))):
+                return lastReturn
+        out = super(CachedFcn, self).__call__(*args, **kwds)
+        self._last = (args, kwds, out)
+        return out
+
+    def asPython(self):
+        return self
 
     def __repr__(self):
         return "CachedFcn({0}, {1})".format(self.expr, self.name)
 
+class QuantityCache(object):
+    """Shares the evaluation of quantities among all containers filled in one ``fill.numpy`` pass.
+
+    Within a pass, each distinct quantity is evaluated once per data selection: string quantities are identified by their expression, function quantities by the function object, and selections by the (sliced) data structure they are evaluated on. The cache is cleared at the end of each pass, but ``hits`` and ``misses`` accumulate, so a QuantityCache passed to ``fill.numpy`` reports how much work was shared.
+
+    **Example:**
+
+    ::
+
+        cache = QuantityCache()
+        Label(a=Bin(100, 0, 10, "pt"), b=Bin(100, 0, 10, "pt")).fill.numpy(data, cache=cache)
+        cache.hits, cache.misses   # (1, 1)
+    """
+
+    _active = threading.local()
+
+    def __init__(self, float32=False):
+        self.hits = 0
+        self.misses = 0
+        self.float32 = float32
+        self._results = {}
+
+    @staticmethod
+    def active():
+        """The QuantityCache of the ``fill.numpy`` pass running in this thread, or ``None``."""
+        return getattr(QuantityCache._active, "cache", None)
+
+    def __enter__(self):
+        self._previous = QuantityCache.active()
+        QuantityCache._active.cache = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        QuantityCache._active.cache = self._previous
+        del self._previous
+        self._results.clear()
+
+    def __call__(self, fcn, data):
+        if isinstance(fcn.expr, basestring):
+            key = (fcn.expr, id(data))
+        elif isinstance(fcn.expr, types.FunctionType) and not isinstance(fcn, CachedFcn):
+            key = (id(fcn.expr), id(data))
+        else:
+            key = (id(fcn), id(data))
+
+        if key in self._results:
+            self.hits += 1
+            return self._results[key][1]
+        else:
+            self.misses += 1
+            out = fcn.vectorized(data, self.float32)
+            # keep a reference to the data so that its id is not reused during this pass
+            self._results[key] = (data, out)
+            return out
+
+    def __repr__(self):
+        return "<QuantityCache hits={0} misses={1}>".format(self.hits, self.misses)
+
 def deserializeString(cls, expr, name):
     """Used by Pickle to reconstruct a string-based histogrammar.util.UserFcn from Pickle data."""
     out = cls.__new__(cls)
@@ -113,6 +113,14 @@ class TestBasic(unittest.TestCase):
         self.assertEqual(2 * x, x + x)
         self.assertEqual(2.0 * x, x + x)
 
+        for factor in 0, 1.0, 2.0, 0.37:
+            y = x.copy()
+            z = y
+            y *= factor
+            self.assertTrue(y is z)
+            self.assertEqual(y, x * factor)
+            self.assertEqual(y.toJson(), (x * factor).toJson())
+
     def checkJson(self, x):
         self.assertEqual(x.toJson(), Factory.fromJson(x.toJson()).toJson())
 
@@ -129,6 +137,14 @@ class TestBasic(unittest.TestCase):
         self.testSumWithFilter()
         self.testSumWithWeightingFactor()
         self.testSumStringFunctions()
+        self.testStringFunctionNamespaces()
+        self.testCompileFill()
+        self.testFillMany()
+        self.testFillAndPlotMethods()
+        self.testCopy()
+        self.testSnapshotAndReset()
+        self.testParallelFill()
+        self.testSharedMemoryFill()
         self.testSumWithFilterStringFunctions()
         self.testSumWithWeightingFactorStringFunctions()
         self.testAverage()
@@ -142,19 +158,23 @@ class TestBasic(unittest.TestCase):
         self.testBag()
         self.testBin()
         self.testBinWithSum()
+        self.testMultiBin()
         self.testHistogram()
         self.testPlotHistogram()
         self.testPlotProfileErr()
         self.testPlotStack()
         self.testSparselyBin()
+        self.testSparselyBinIndexes()
         self.testCentrallyBin()
         self.testFraction()
         self.testFractionSum()
         self.testFractionHistogram()
         self.testStack()
         self.testStackWithSum()
+        self.testStackEdges()
         self.testIrregularlyBin()
         self.testIrregularlyBinSum()
+        self.testIrregularlyBinEdges()
         self.testCategorize()
         self.testLabel()
         self.testLabelDifferentCuts()
@@ -308,6 +328,191 @@ class TestBasic(unittest.TestCase):
             self.checkPickle(leftSumming)
             self.checkName(leftSumming)
        
+    def testStringFunctionNamespaces(self):
+        self.assertAlmostEqual(UserFcn("sqrt(x**2 + y**2)")({"x": 3.0, "y": 4.0}), 5.0)
+        self.assertAlmostEqual(UserFcn("sqrt(double**2)")(self.struct[0]), 3.4)
+        self.assertAlmostEqual(UserFcn("sqrt(x)")(16.0), 4.0)
+        self.assertAlmostEqual(UserFcn("x.real + 1")(2.0), 3.0)
+
+        # fields override math functions and constants, also in nested scopes
+        self.assertEqual(UserFcn("e + 1")({"e": 1}), 2)
+        self.assertAlmostEqual(UserFcn("e + 1")({}), math.e + 1)
+        self.assertEqual(UserFcn("[e * i for i in range(3)]")({"e": 2}), [0, 2, 4])
+
+        self.assertRaises(NameError, lambda: UserFcn("x + y")({"x": 1.0}))
+        self.assertRaises(NameError, lambda: UserFcn("x + y")(1.0))
+
+    def testCompileFill(self):
+        def make():
+            return Label(
+                a=Bin(5, -3.0, 3.0, "double", Deviate("int")),
+                b=Bin(5, -3.0, 3.0, "double", Select("bool", Average("int"))),
+                c=Bin(5, -3.0, 3.0, "double", Fraction("bool", SparselyBin(1.0, "int", Maximize("double")))),
+                d=Bin(5, -3.0, 3.0, "double", Categorize("string", Count("0.5*weight"))),
+                e=Bin(5, -3.0, 3.0, "double", Stack([0.0, 2.0], "int", Minimize("double"))),
+                f=Bin(5, -3.0, 3.0, "double", IrregularlyBin([0.0, 2.0], "int", Sum("double"))),
+                g=Bin(5, -3.0, 3.0, "double", CentrallyBin([0.0, 2.0], "int", Count())),
+                h=Bin(5, -3.0, 3.0, "double", Branch(Count(), Bag("string", "S"))))
+
+        hpy = make()
+        hcompiled = make()
+        fill = hcompiled.fill.compiled()
+        for i, x in enumerate(self.struct):
+            hpy.fill(x, i - 2.5)
+            fill(x, i - 2.5)
+        self.assertEqual(hcompiled, hpy)
+
+    def testFillMany(self):
+        hpy = Bin(5, -3.0, 3.0, "double", Sum("int"))
+        hmany = hpy.copy()
+        for i, x in enumerate(self.struct):
+            hpy.fill(x, i - 2.5)
+        hmany.fill.many(iter(self.struct), (i - 2.5 for i in xrange(len(self.struct))))
+        self.assertEqual(hmany, hpy)
+
+    def testFillAndPlotMethods(self):
+        h = Bin(5, -3.0, 3.0, "double")
+        self.assertEqual(h.fill.container, h)
+        self.assertEqual(h.fill.many, h.fillmany)
+        self.assertEqual(h.fill.numpy, h.fillnumpy)
+        self.assertTrue(hasattr(h.plot, "matplotlib"))
+        self.assertFalse(hasattr(Count().plot, "matplotlib"))
+        self.assertTrue("fill" not in h.__dict__ and "plot" not in h.__dict__)
+        self.assertFalse(hasattr(Count(), "__dict__"))
+
+        # fill.root keeps its compiled filler on the container
+        for h in Count(), Sum("double"), Average("double"), Deviate("double"), Minimize("double"), Maximize("double"):
+            self.assertFalse(hasattr(h, "_clingFiller"))
+            h._clingFiller = "filler"
+            self.assertEqual(h._clingFiller, "filler")
+
+        for x in self.struct:
+            h.fill(x)
+        self.assertEqual(pickle.loads(pickle.dumps(h, 0)), h)
+        self.assertEqual(pickle.loads(pickle.dumps(Deviate("double"), 0)), Deviate("double"))
+
+    def testCopy(self):
+        one = Bin(5, -3.0, 3.0, "double", SparselyBin(1.0, "int", Average("double")))
+        for x in self.struct:
+            one.fill(x)
+        two = one.copy()
+        self.assertEqual(two, one)
+        self.assertEqual(type(two), type(one))
+        self.assertEqual(two.values[2].bins, one.values[2].bins)
+        self.assertEqual((two.values[2].minBin, two.values[2].maxBin), (one.values[2].minBin, one.values[2].maxBin))
+
+        for x in self.struct:
+            two.fill(x)
+        self.assertEqual(two, one + one)
+        self.assertNotEqual(two, one)
+
+        h = Bin(5, -3.0, 3.0, "double")
+        for x in self.struct:
+            h.fill(x)
+        view = h.values[1]
+        self.assertEqual(type(view.copy()), Count)
+        self.assertEqual(view.copy(), view)
+        c = view.copy()
+        c.entries += 1.0
+        self.assertNotEqual(h.values[1].entries, c.entries)
+
+        self.assertEqual(Categorize("string", Deviate("double")).copy(), Categorize("string", Deviate("double")))
+        self.assertEqual(Maximize("double").copy(), Maximize("double"))
+
+        # a non-empty template doesn't seed new bins
+        c = Count()
+        c.fill(None, 5.0)
+        s = SparselyBin(1.0, lambda x: x, c)
+        s.fill(0.5)
+        self.assertEqual(s.bins[0].entries, 1.0)
+        s = Categorize(lambda x: x, c)
+        s.fill("one")
+        self.assertEqual(s.bins["one"].entries, 1.0)
+        self.assertEqual(c.entries, 5.0)
+
+    def testSnapshotAndReset(self):
+        def make():
+            return UntypedLabel(
+                a=Bin(5, -3.0, 3.0, lambda x: x.double, Average(lambda x: x.int)),
+                b=SparselyBin(1.0, lambda x: x.int, Deviate(lambda x: x.double)),
+                c=Categorize(lambda x: x.string[0], Bin(3, -3.0, 3.0, lambda x: x.double)),
+                d=CentrallyBin([-1.0, 0.0, 1.0], lambda x: x.double, Minimize(lambda x: x.int)),
+                e=Bag(lambda x: x.string, "S"),
+                f=MultiBin((5, -3.0, 7.0, lambda x: x.double), (2, -1.0, 5.0, lambda x: x.int)))
+        first = self.struct[:6]
+        second = self.struct[6:]
+        expectFirst = make()
+        for x in first: expectFirst.fill(x)
+        expectSecond = make()
+        for x in second: expectSecond.fill(x)
+
+        live = make()
+        view = live.get("a").values[2]
+        for x in first: live.fill(x)
+        self.assertEqual(view.entries, expectFirst.get("a").values[2].entries)
+
+        snapshot = live.snapshotAndReset()
+        self.assertEqual(snapshot, expectFirst)
+        self.assertEqual(live, make())
+        self.assertEqual(view.entries, 0.0)
+        self.assertEqual(live.get("b").minBin, None)
+
+        for x in second: live.fill(x)
+        again = live.snapshotAndReset(snapshot)
+        self.assertTrue(again is snapshot)
+        self.assertEqual(snapshot, expectSecond)
+        self.assertEqual(snapshot.get("b").indexes, expectSecond.get("b").indexes)
+        self.assertEqual(live, make())
+
+        for x in first: live.fill(x)
+        self.assertEqual(live, expectFirst)
+        self.assertEqual(view.entries, expectFirst.get("a").values[2].entries)
+        self.assertEqual(snapshot, expectSecond)
+
+        live.reset()
+        self.assertEqual(live, make())
+        self.assertRaises(ContainerException, lambda: Count().snapshotAndReset(Sum(lambda x: x.double)))
+
+    def testParallelFill(self):
+        import histogrammar.parallel
+        data = [{"x": x.double, "y": x.int} for x in self.struct] * 50
+        hpy = Bin(5, -3.0, 3.0, "x", Deviate(lambda d: d["y"]))
+        hparallel = hpy.copy()
+        for x in data:
+            hpy.fill(x)
+
+        def broken():
+            for x in data[:100]:
+                yield x
+            raise ValueError("broken iterable")
+
+        with histogrammar.parallel.Pool(3) as pool:
+            self.assertRaises(ValueError, lambda: pool.fill(hparallel, broken(), batch=7))
+            self.assertEqual(hparallel, hpy.zero())
+            reports = pool.fill(hparallel, data, batch=7)
+        self.assertEqual(hparallel, hpy)
+        self.assertEqual(sum(x["entries"] for x in reports), len(data))
+
+        self.assertRaises(ContainerException, lambda: histogrammar.parallel.fill(Sum("nonexistent"), data, processes=2))
+
+    def testSharedMemoryFill(self):
+        try:
+            import numpy
+            from multiprocessing import shared_memory
+        except ImportError:
+            return
+        import histogrammar.parallel
+        data = [{"x": x.double, "y": x.int} for x in self.struct] * 50
+        hpy = UntypedLabel(a=Bin(5, -3.0, 3.0, "x", Bin(4, -2.0, 6.0, lambda d: d["y"])), b=Select("x > 0", Sum("y")), c=Bin(5, -3.0, 3.0, "x", Sum("y")))
+        for x in data:
+            hpy.fill(x)
+
+        aggregate = histogrammar.parallel.fillShared(hpy.zero(), data, processes=3, batch=7)
+        self.assertEqual(aggregate.materialize(), hpy)
+        self.assertEqual(sum(x["entries"] for x in aggregate.reports), len(data))
+
+        self.assertRaises(ContainerException, lambda: histogrammar.parallel.fillShared(Bin(5, -3.0, 3.0, "x", Average("y")), data, processes=3))
+
     def testSumWithFilterStringFunctions(self):
         for i in xrange(11):
             left, right = self.struct[:i], self.struct[i:]
@@ -673,6 +878,26 @@ class TestBasic(unittest.TestCase):
         self.checkPickle(two)
         self.checkName(two)
 
+    def testMultiBin(self):
+        one = MultiBin((5, -3.0, 7.0, lambda x: x.double), (2, -1.0, 5.0, lambda x: x.int))
+        nested = Bin(5, -3.0, 7.0, lambda x: x.double, Bin(2, -1.0, 5.0, lambda x: x.int))
+        for _ in self.struct:
+            one.fill(_)
+            nested.fill(_)
+        self.assertEqual([one.count(i, j) for i in xrange(5) for j in xrange(2)], [v.entries for vs in nested.values for v in vs.values])
+        self.assertEqual(one.toJson(), nested.toJson())
+        self.assertEqual(one.toBin(), nested)
+        self.assertEqual(MultiBin.fromBin(nested), one)
+        self.assertEqual(Factory.fromJson(one.toJson()), Factory.fromJson(nested.toJson()))
+
+        self.checkScaling(one)
+        self.checkJson(one)
+        self.checkPickle(one)
+        self.checkName(one)
+
+        self.assertRaises(ContainerException, lambda: MultiBin.fromBin(Bin(5, -3.0, 7.0, lambda x: x, Sum(lambda x: x))))
+        self.assertRaises(ContainerException, lambda: one + MultiBin((5, -3.0, 7.0, lambda x: x.double), (3, -1.0, 5.0, lambda x: x.int)))
+
     def testBinWithSum(self):
         one = Bin(5, -3.0, 7.0, named("xaxis", lambda x: x), Sum(named("yaxis", lambda x: 10.0)), Sum(lambda x: 10.0), Sum(lambda x: 10.0), Sum(lambda x: 10.0))
         for _ in self.simple: one.fill(_)
@@ -807,6 +1032,30 @@ class TestBasic(unittest.TestCase):
         self.checkPickle(two)
         self.checkName(two)
 
+    def testSparselyBinIndexes(self):
+        one = SparselyBin(1.0, named("something", lambda x: x))
+        for _ in self.simple: one.fill(_)
+        self.assertEqual((one.minBin, one.maxBin), (-5, 7))
+        self.assertEqual(one.indexes, [-5, -3, -2, 0, 1, 2, 3, 7])
+        self.assertEqual(one.indexesBetween(-2, 3), [-2, 0, 1, 2])
+        self.assertEqual(one.sumBetween(-2, 3).entries, 6.0)
+        self.assertEqual(one.sumBetween(4, 7).entries, 0.0)
+
+        one.fill(100.5)
+        self.assertEqual(one.maxBin, 100)
+        self.assertEqual(one.indexesBetween(5, 1000), [7, 100])
+
+        two = one + SparselyBin.ed(1.0, 1.0, "Count", {-10: Count.ed(1.0)}, Count(), 0.0)
+        self.assertEqual((two.minBin, two.maxBin), (-10, 100))
+        self.assertEqual((one.minBin, one.maxBin), (-5, 100))
+        self.assertEqual(((one * 2).minBin, (one * 2).maxBin), (-5, 100))
+        self.assertEqual(pickle.loads(pickle.dumps(two, 0)).maxBin, 100)
+
+        del two.bins[100]
+        self.assertEqual(two.maxBin, 7)
+        self.assertEqual(two.indexes[-1], 7)
+        self.assertEqual(SparselyBin(1.0, lambda x: x).minBin, None)
+
     ################################################################ CentrallyBin
 
     def testCentrallyBin(self):
@@ -904,6 +1153,14 @@ class TestBasic(unittest.TestCase):
         self.checkPickle(stacking)
         self.checkName(stacking)
 
+    def testStackEdges(self):
+        stacking = Stack([0.0, 2.2, 7.3], named("something", lambda x: x), Count())
+        for _ in self.simple: stacking.fill(_)
+        stacking.fill(float("nan"))
+
+        self.assertEqual([(k, v.entries) for k, v in stacking.bins], [(float("-inf"), 10.0), (0.0, 6.0), (2.2, 3.0), (7.3, 1.0)])
+        self.assertEqual(stacking.nanflow.entries, 1.0)
+
     ################################################################ IrregularlyBin
 
     def testIrregularlyBin(self):
@@ -931,6 +1188,19 @@ class TestBasic(unittest.TestCase):
         self.checkPickle(partitioning)
         self.checkName(partitioning)
 
+    def testIrregularlyBinEdges(self):
+        partitioning = IrregularlyBin([0.0, 2.0, 2.0, 7.3], named("something", lambda x: x), Count())
+        for _ in self.simple: partitioning.fill(_)
+        partitioning.fill(float("nan"))
+
+        self.assertEqual([(k, v.entries) for k, v in partitioning.bins], [(float("-inf"), 4.0), (0.0, 3.0), (2.0, 0.0), (2.0, 2.0), (7.3, 1.0)])
+        self.assertEqual(partitioning.nanflow.entries, 1.0)
+
+        unsorted = IrregularlyBin([4.0, 0.0], named("something", lambda x: x), Count())
+        for _ in self.simple: unsorted.fill(_)
+
+        self.assertEqual([(k, v.entries) for k, v in unsorted.bins], [(float("-inf"), 9.0), (4.0, 0.0), (0.0, 1.0)])
+
     ################################################################ Categorize
 
     def testCategorize(self):
@@ -16,6 +16,7 @@
 
 import json
 import math
+import pickle
 import random
 import sys
 import time
@@ -88,8 +89,10 @@ class TestNumpy(unittest.TestCase):
         self.testMaximize()
         self.testBin()
         self.testBinTrans()
+        self.testBinSum()
         self.testBinAverage()
         self.testBinDeviate()
+        self.testBinBin()
         self.testSparselyBin()
         self.testSparselyBinTrans()
         self.testSparselyBinAverage()
@@ -100,11 +103,22 @@ class TestNumpy(unittest.TestCase):
         self.testCentrallyBinDeviate()
         self.testCategorize()
         self.testCategorizeTrans()
+        self.testCategorizeAverage()
         self.testFractionBin()
+        self.testStack()
         self.testStackBin()
+        self.testStackSparselyBin()
         self.testIrregularlyBinBin()
         self.testSelectBin()
+        self.testSelectSelection()
         self.testLabelBin()
+        self.testQuantityCache()
+        self.testStringQuantities()
+        self.testFillManyBatches()
+        self.testThreadedFill()
+        self.testDenseBin()
+        self.testMultiBin()
+        self.testBinary()
         self.testUntypedLabelBin()
         self.testIndexBin()
         self.testBranchBin()
@@ -251,6 +265,15 @@ class TestNumpy(unittest.TestCase):
                 self.compare("BinTrans ({0} bins) noholes".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["noholes"], Count(lambda x: 0.5*x)), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Count(lambda x: 0.5*x)), self.noholes)
                 self.compare("BinTrans ({0} bins) holes".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["withholes"], Count(lambda x: 0.5*x)), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Count(lambda x: 0.5*x)), self.withholes)
 
+    def testBinSum(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            sys.stderr.write("\n")
+            for bins in [10, 100]:
+                self.compare("BinSum ({0} bins) no data".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["empty"], Sum(lambda x: x["empty"])), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Sum(lambda x: x)), self.empty)
+                self.compare("BinSum ({0} bins) noholes".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["noholes"], Sum(lambda x: x["noholes"])), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Sum(lambda x: x)), self.noholes)
+                self.compare("BinSum ({0} bins) holes".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["withholes"], Sum(lambda x: x["withholes"])), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Sum(lambda x: x)), self.withholes)
+
     def testBinAverage(self):
         with Numpy() as numpy:
             if numpy is None: return
@@ -269,6 +292,15 @@ class TestNumpy(unittest.TestCase):
                 self.compare("BinDeviate ({0} bins) noholes".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["noholes"], Deviate(lambda x: x["noholes"])), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Deviate(lambda x: x)), self.noholes)
                 self.compare("BinDeviate ({0} bins) holes".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["withholes"], Deviate(lambda x: x["withholes"])), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Deviate(lambda x: x)), self.withholes)
 
+    def testBinBin(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            sys.stderr.write("\n")
+            for bins in [10, 100]:
+                self.compare("BinBin ({0} bins) no data".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["empty"], Bin(bins, -3.0, 3.0, lambda x: x["empty"])), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Bin(bins, -3.0, 3.0, lambda x: x)), self.empty)
+                self.compare("BinBin ({0} bins) noholes".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["noholes"], Bin(bins, -3.0, 3.0, lambda x: x["noholes"])), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Bin(bins, -3.0, 3.0, lambda x: x)), self.noholes)
+                self.compare("BinBin ({0} bins) holes".format(bins), Bin(bins, -3.0, 3.0, lambda x: x["withholes"], Bin(bins, -3.0, 3.0, lambda x: x["withholes"])), self.data, Bin(bins, -3.0, 3.0, lambda x: x, Bin(bins, -3.0, 3.0, lambda x: x)), self.withholes)
+
     def testSparselyBin(self):
         with Numpy() as numpy:
             if numpy is None: return
@@ -353,6 +385,14 @@ class TestNumpy(unittest.TestCase):
             self.compare("CategorizeTrans noholes", Categorize(lambda x: numpy.array(numpy.floor(x["noholes"]), dtype="<U5"), Count(lambda x: 0.5*x)), self.data, Categorize(lambda x: x, Count(lambda x: 0.5*x)), numpy.array(numpy.floor(self.noholes), dtype="<U5"))
             self.compare("CategorizeTrans holes", Categorize(lambda x: numpy.array(numpy.floor(x["withholes"]), dtype="<U5"), Count(lambda x: 0.5*x)), self.data, Categorize(lambda x: x, Count(lambda x: 0.5*x)), numpy.array(numpy.floor(self.withholes), dtype="<U5"))
 
+    def testCategorizeAverage(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            sys.stderr.write("\n")
+            self.compare("CategorizeAverage no data", Categorize(lambda x: numpy.array(numpy.floor(x["empty"]), dtype="<U5"), Average(lambda x: numpy.floor(x["empty"]))), self.data, Categorize(lambda x: x, Average(lambda x: float(x))), numpy.array(numpy.floor(self.empty), dtype="<U5"))
+            self.compare("CategorizeAverage noholes", Categorize(lambda x: numpy.array(numpy.floor(x["noholes"]), dtype="<U5"), Average(lambda x: numpy.floor(x["noholes"]))), self.data, Categorize(lambda x: x, Average(lambda x: float(x))), numpy.array(numpy.floor(self.noholes), dtype="<U5"))
+            self.compare("CategorizeAverage holes", Categorize(lambda x: numpy.array(numpy.floor(x["withholes"]), dtype="<U5"), Average(lambda x: numpy.floor(x["withholes"]))), self.data, Categorize(lambda x: x, Average(lambda x: float(x))), numpy.array(numpy.floor(self.withholes), dtype="<U5"))
+
     def testFractionBin(self):
         with Numpy() as numpy:
             if numpy is None: return
@@ -370,6 +410,28 @@ class TestNumpy(unittest.TestCase):
             self.compare("StackBin noholes", Stack(cuts, lambda x: x["noholes"], Bin(100, -3.0, 3.0, lambda x: x["noholes"])), self.data, Stack(cuts, lambda x: x, Bin(100, -3.0, 3.0, lambda x: x)), self.noholes)
             self.compare("StackBin holes", Stack(cuts, lambda x: x["withholes"], Bin(100, -3.0, 3.0, lambda x: x["withholes"])), self.data, Stack(cuts, lambda x: x, Bin(100, -3.0, 3.0, lambda x: x)), self.withholes)
 
+    def testStackSparselyBin(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            cuts = [-3.0, -1.5, -1.0, -0.5, 0.0, 0.5, 1.0, 1.5, 3.0]
+            hnp = Stack(cuts, lambda x: x["noholes"], SparselyBin(0.5, lambda x: x["withholes"]))
+            hpy = hnp.copy()
+            hnp.fill.numpy(self.data)
+            for i in xrange(len(self.noholes)):
+                hpy.fill({"noholes": float(self.noholes[i]), "withholes": float(self.withholes[i])})
+            self.assertEqual([v.nanflow.entries for c, v in hnp.bins], [v.nanflow.entries for c, v in hpy.bins])
+            self.assertTrue(hnp.bins[0][1].nanflow.entries > 0.0)
+            self.assertEqual(hnp, hpy)
+
+    def testStack(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            sys.stderr.write("\n")
+            cuts = [-3.0, -1.5, -1.0, -0.5, 0.0, 0.5, 1.0, 1.5, 3.0]
+            self.compare("Stack no data", Stack(cuts, lambda x: x["empty"]), self.data, Stack(cuts, lambda x: x), self.empty)
+            self.compare("Stack noholes", Stack(cuts, lambda x: x["noholes"]), self.data, Stack(cuts, lambda x: x), self.noholes)
+            self.compare("Stack holes", Stack(cuts, lambda x: x["withholes"]), self.data, Stack(cuts, lambda x: x), self.withholes)
+
     def testIrregularlyBinBin(self):
         with Numpy() as numpy:
             if numpy is None: return
@@ -387,6 +449,18 @@ class TestNumpy(unittest.TestCase):
             self.compare("SelectBin noholes", Select(lambda x: x["noholes"], Bin(100, -3.0, 3.0, lambda x: x["noholes"])), self.data, Select(lambda x: x, Bin(100, -3.0, 3.0, lambda x: x)), self.noholes)
             self.compare("SelectBin holes", Select(lambda x: x["withholes"], Bin(100, -3.0, 3.0, lambda x: x["withholes"])), self.data, Select(lambda x: x, Bin(100, -3.0, 3.0, lambda x: x)), self.withholes)
 
+    def testSelectSelection(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            lengths = []
+            def quantity(x):
+                lengths.append(len(x["noholes"]))
+                return x["noholes"]
+            h = Select(lambda x: x["noholes"] > 1.0, Bin(100, -3.0, 3.0, quantity))
+            h.fill.numpy(self.data)
+            self.assertEqual(lengths, [int(numpy.count_nonzero(self.data["noholes"] > 1.0))])
+            self.assertEqual(h.cut.entries, float(lengths[0]))
+
     def testLabelBin(self):
         with Numpy() as numpy:
             if numpy is None: return
@@ -395,6 +469,258 @@ class TestNumpy(unittest.TestCase):
             self.compare("LabelBin noholes", Label(x=Bin(100, -3.0, 3.0, lambda x: x["noholes"])), self.data, Label(x=Bin(100, -3.0, 3.0, lambda x: x)), self.noholes)
             self.compare("LabelBin holes", Label(x=Bin(100, -3.0, 3.0, lambda x: x["withholes"])), self.data, Label(x=Bin(100, -3.0, 3.0, lambda x: x)), self.withholes)
 
+    def testQuantityCache(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            calls = []
+            def quantity(x):
+                calls.append(None)
+                return x["noholes"]
+            cache = QuantityCache()
+            h = UntypedLabel(a=Bin(100, -3.0, 3.0, quantity), b=Bin(10, -3.0, 3.0, quantity), c=Sum(quantity), d=Bin(10, -3.0, 3.0, "withholes"), e=Sum("withholes"))
+            h.fill.numpy(self.data, cache=cache)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual((cache.hits, cache.misses), (3, 2))
+
+            hpy = UntypedLabel(a=Bin(100, -3.0, 3.0, named("quantity", lambda x: x)), b=Bin(10, -3.0, 3.0, named("quantity", lambda x: x)), c=Sum(named("quantity", lambda x: x)), d=Bin(10, -3.0, 3.0, named("withholes", lambda x: x)), e=Sum(named("withholes", lambda x: x)))
+            for x, y in zip(self.noholes, self.withholes):
+                for k in "abc": hpy(k).fill(float(x))
+                for k in "de": hpy(k).fill(float(y))
+            for k in "abcd":
+                self.assertEqual(Factory.fromJson(h(k).toJson()), Factory.fromJson(hpy(k).toJson()))
+
+    def testStringQuantities(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            for expr in ["sqrt(noholes**2 + 1)", "noholes if noholes > 0 else -2*noholes", "-1 < noholes <= 1", "math.atan2(noholes, 1.0) + pi", "abs(withholes) > 1 or noholes < 0"]:
+                program = compileNumpyFcn(expr)
+                hnp = Bin(100, -3.0, 5.0, expr)
+                hnp.fill.numpy(self.data)
+                hpy = Bin(100, -3.0, 5.0, expr)
+                for x, y in zip(self.noholes, self.withholes):
+                    hpy.fill({"noholes": float(x), "withholes": float(y)})
+                self.assertEqual(Factory.fromJson(hnp.toJson()), Factory.fromJson(hpy.toJson()))
+
+            self.assertRaises(NumpyTranslationError, lambda: compileNumpyFcn("sorted(noholes)[0]"))
+
+            # "and" and "or" of numbers return one of the operands, which logical_and and logical_or don't
+            self.assertRaises(NumpyTranslationError, lambda: compileNumpyFcn("noholes and withholes"))
+            self.assertRaises(NumpyTranslationError, lambda: compileNumpyFcn("noholes > 0 or withholes"))
+            program = compileNumpyFcn("not noholes > 0 and (withholes > 0 or True)")
+            self.assertEqual(list(program(self.data)), [not x > 0 and (y > 0 or True) for x, y in zip(self.noholes, self.withholes)])
+            h = Sum("numpy.sort(noholes)[::-1]")
+            h.fill.numpy(self.data)
+            self.assertAlmostEqual(h.sum, self.noholes.sum())
+
+            self.assertEqual(compileNumpyFcn("2*x + 1")(self.noholes, True).dtype, numpy.float32)
+            h32 = Sum("noholes")
+            h32.fill.numpy(self.data, float32=True)
+            self.assertAlmostEqual(h32.sum, self.noholes.sum(), places=2)
+
+            # translated comparisons and integer arithmetic have the same types as the untranslated expressions
+            data = {"noholes": self.noholes, "ints": numpy.arange(len(self.noholes))}
+            for expr, fcn in ("noholes > 0", lambda d: d["noholes"] > 0), ("ints % 3", lambda d: d["ints"] % 3):
+                translated = Categorize(expr)
+                translated.fill.numpy(data)
+                untranslated = Categorize(fcn)
+                untranslated.fill.numpy(data)
+                self.assertEqual(translated.bins, untranslated.bins)
+                self.assertEqual(set(type(k) for k in translated.bins), set(type(k) for k in untranslated.bins))
+            self.assertEqual(compileNumpyFcn("noholes > 0")(self.noholes).dtype, numpy.bool_)
+            self.assertEqual(compileNumpyFcn("ints % 3")(data).dtype, data["ints"].dtype)
+
+            # a cache that is passed in keeps its own precision
+            cache = QuantityCache(True)
+            h.fill.numpy(self.data, cache=cache)
+            self.assertTrue(cache.float32)
+
+    def testFillManyBatches(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            data = [{"x": float(x), "y": float(y)} for x, y in zip(self.noholes, self.withholes)]
+            weights = [float(x) for x in self.positive]
+
+            hpy = UntypedLabel(a=Bin(100, -3.0, 3.0, "x", Deviate("y")), b=Select("x > 0", Sum("x")))
+            hmany = hpy.copy()
+            for datum, weight in zip(data, weights):
+                hpy.fill(datum, weight)
+            hmany.fill.many(data, weights, batch=1000)
+            self.assertEqual(Factory.fromJson(hmany.toJson()), Factory.fromJson(hpy.toJson()))
+
+            # data with zero or negative weights are skipped, as in fill
+            signed = [w - 0.5 if i % 7 != 0 else 0.0 for i, w in enumerate(weights)]
+            hpy = UntypedLabel(a=Bin(100, -3.0, 3.0, "x", Deviate("y")), b=Select("x > 0", Sum("x")), c=SparselyBin(0.5, "y"), d=Fraction("x > 0", Average("y")), e=Minimize("y"), f=Count())
+            hmany = hpy.copy()
+            for datum, weight in zip(data, signed):
+                hpy.fill(datum, weight)
+            hmany.fill.many(data, signed, batch=1000)
+            self.assertAlmostEqual(hmany("f").entries, hpy("f").entries)
+            self.assertEqual(Factory.fromJson(hmany.toJson()), Factory.fromJson(hpy.toJson()))
+
+            # quantities that don't work on arrays fall back to filling one datum at a time
+            hpy = Bin(100, -3.0, 3.0, lambda d: math.sqrt(abs(d["x"])))
+            hmany = hpy.copy()
+            for datum in data:
+                hpy.fill(datum)
+            hmany.fill.many(data, batch=1000)
+            self.assertEqual(hmany, hpy)
+
+            hsparse = SparselyBin(1.0, lambda x: x)
+            hsparse.fill.many([1.5, float("nan"), 2.5, float("nan")], batch=2)
+            self.assertEqual(hsparse.entries, 4.0)
+            self.assertEqual(hsparse.nanflow.entries, 2.0)
+
+    def testThreadedFill(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            hserial = UntypedLabel(a=Bin(100, -3.0, 3.0, "noholes", Deviate("withholes")), b=SparselyBin(0.1, "withholes"), c=Select("noholes > 0", Sum("positive")))
+            hthreaded = hserial.copy()
+            hchunked = hserial.copy()
+            hserial.fill.numpy(self.data)
+            hthreaded.fill.numpy(self.data, threads=3)
+            hchunked.fill.numpy(self.data, threads=2, chunksize=777)
+            self.assertEqual(Factory.fromJson(hthreaded.toJson()), Factory.fromJson(hserial.toJson()))
+            self.assertEqual(Factory.fromJson(hchunked.toJson()), Factory.fromJson(hserial.toJson()))
+            self.assertTrue(hserial.get("b").nanflow.entries > 0.0)
+            self.assertEqual(hthreaded.get("b").nanflow.entries, hserial.get("b").nanflow.entries)
+            self.assertEqual(hchunked.get("b").nanflow.entries, hserial.get("b").nanflow.entries)
+
+            nan = float("nan")
+            sparse = SparselyBin(1.0, lambda x: x)
+            sparse.fill.numpy(numpy.array([0.5, nan, 1.5, nan]), threads=2, chunksize=1)
+            self.assertEqual(sparse.nanflow.entries, 2.0)
+            self.assertRaises(ValueError, lambda: sparse.fill.numpy(numpy.array([0.5]), threads=0))
+
+            # a cached quantity is shared by the threads
+            hcached = Bin(100, -3.0, 3.0, named("noholes", cached(lambda d: d["noholes"])), Sum(named("positive", cached(lambda d: d["positive"]))))
+            hcached.fill.numpy(self.data, threads=4, chunksize=100)
+            hplain = Bin(100, -3.0, 3.0, "noholes", Sum("positive"))
+            hplain.fill.numpy(self.data)
+            self.assertEqual(Factory.fromJson(hcached.toJson()), Factory.fromJson(hplain.toJson()))
+
+    def testDenseBin(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            for value in Count(), Sum("positive"), Average("positive"), Deviate("positive"):
+                dense = Bin(100, -3.0, 3.0, "noholes", value)
+                self.assertTrue(isinstance(dense.values, DenseValues))
+                dense.fill.numpy(self.data)
+
+                filled = Bin(100, -3.0, 3.0, "noholes", value)
+                compiled = Bin(100, -3.0, 3.0, "noholes", value)
+                fill = compiled.compileFill()
+                for i in xrange(1000):
+                    filled.fill({"noholes": float(self.noholes[i]), "positive": float(self.positive[i])})
+                    fill({"noholes": float(self.noholes[i]), "positive": float(self.positive[i])})
+                self.assertEqual(compiled, filled)
+
+                # snapshots are copied out, so the compiled function keeps filling the live container
+                snapshot = compiled.snapshotAndReset()
+                fill({"noholes": 0.0, "positive": 1.0})
+                self.assertEqual(snapshot, filled)
+                self.assertEqual(compiled.values[50].entries, 1.0)
+
+                filled.fill.numpy(dict((k, v[1000:]) for k, v in self.data.items()))
+                self.assertEqual(filled, dense)
+
+                # views read and write the underlying arrays
+                view = dense.values[50]
+                self.assertTrue(isinstance(view, type(value)))
+                self.assertEqual(view.entries, dense.values.arrays["entries"][50])
+                self.assertEqual(view.copy(), view)
+                self.assertEqual(dense.values[-1].entries, dense.values.arrays["entries"][99])
+                self.assertEqual(len(dense.values[10:20]), 10)
+                self.assertEqual(dense.values + [], list(dense.values))
+                self.assertEqual([Count()] + dense.values, [Count()] + list(dense.values))
+
+                self.assertEqual((dense + dense).values[50], view + view)
+                self.assertEqual((dense * 0.5).values[50], view * 0.5)
+                self.assertEqual(dense + dense.zero(), dense)
+                self.assertNotEqual(dense + dense, dense)
+
+                total = dense.copy()
+                total += dense
+                self.assertEqual(total, dense + dense)
+                self.assertEqual(dense.values[50], view)    # unchanged by in-place addition to the copy
+
+                self.assertEqual(pickle.loads(pickle.dumps(dense)), dense)
+                self.assertEqual(pickle.loads(pickle.dumps(view)), view)
+                self.assertEqual(Factory.fromJson(dense.toJson()), Factory.fromJson((dense + dense.zero()).toJson()))
+                self.assertTrue(isinstance(Factory.fromJson(dense.toJson()).values, DenseValues))
+
+            nested = Bin(10, -3.0, 3.0, "noholes", Bin(10, -3.0, 3.0, "withholes", Deviate("positive")))
+            filled = nested.copy()
+            fill = nested.compileFill()
+            for i in xrange(1000):
+                datum = {"noholes": float(self.noholes[i]), "withholes": float(self.withholes[i]), "positive": float(self.positive[i])}
+                filled.fill(datum)
+                fill(datum)
+            self.assertEqual(nested, filled)
+
+            # values with different functions can't share arrays
+            mixed = Bin.ed(-3.0, 3.0, 0.0, [Sum("noholes"), Sum("positive")], Count(), Count(), Count())
+            self.assertTrue(isinstance(mixed.values, list))
+
+    def testMultiBin(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            for axes in [(100, -3.0, 3.0, "noholes")], [(10, -3.0, 3.0, "noholes"), (7, -2.0, 2.0, "withholes")], [(5, -3.0, 3.0, "noholes"), (4, -2.0, 2.0, "withholes"), (3, 1.0, 2.0, "positive")]:
+                multi = MultiBin(*axes)
+                nested = Count()
+                for num, low, high, quantity in reversed(axes):
+                    nested = Bin(num, low, high, quantity, nested)
+                multi2 = Select("positive - 1.5", multi.copy())
+                nested2 = Select("positive - 1.5", nested.copy())
+
+                multi.fill.numpy(self.data)
+                nested.fill.numpy(self.data)
+                self.assertEqual(Factory.fromJson(multi.toJson()), Factory.fromJson(nested.toJson()))
+
+                multi2.fill.numpy(self.data)
+                nested2.fill.numpy(self.data)
+                self.assertEqual(Factory.fromJson(multi2.toJson()), Factory.fromJson(nested2.toJson()))
+
+                multi3 = multi.zero()
+                for i in xrange(1000):
+                    multi3.fill({"noholes": float(self.noholes[i]), "withholes": float(self.withholes[i]), "positive": float(self.positive[i])})
+                counts, flows = multi3.counts, list(multi3.flows)
+                multi3.fill.numpy(dict((k, v[1000:]) for k, v in self.data.items()))
+                self.assertEqual(multi3, multi)
+
+                # filling and adding update the arrays in place
+                multi3 += multi
+                self.assertEqual(multi3, multi + multi)
+                self.assertTrue(multi3.counts is counts and all(x is y for x, y in zip(multi3.flows, flows)))
+
+    def testBinary(self):
+        with Numpy() as numpy:
+            if numpy is None: return
+            for h in [Bin(100, -3.0, 3.0, "noholes", Deviate("positive")),
+                      Bin(10, -3.0, 3.0, "noholes", Bin(10, -3.0, 3.0, "withholes", Average("positive"))),
+                      MultiBin((10, -3.0, 3.0, "noholes"), (7, -2.0, 2.0, "withholes")),
+                      Label(x=Bin(100, -3.0, 3.0, "noholes"), y=Bin(100, -3.0, 3.0, "withholes")),
+                      SparselyBin(0.5, "noholes", Bin(5, 0.0, 3.0, "positive", Sum("noholes"))),
+                      Select("positive - 1.5", Categorize(lambda d: numpy.where(d["noholes"] > 0, "one", "two"), Minimize("withholes"))),
+                      Bin(100, -3.0, 3.0, "noholes", Sum("positive")).zero(),
+                      # names that look like array references are only labels and categories
+                      Label(**{"<f8": Bin(10, -3.0, 3.0, "noholes")}),
+                      Categorize(lambda d: numpy.where(d["noholes"] > 0, "<f8", "two"), Bin(10, -3.0, 3.0, "withholes"))]:
+                h.fill.numpy(self.data)
+                data = h.toBinary()
+                self.assertTrue(isinstance(data, bytes))
+                self.assertEqual(Factory.fromBinary(data).toJson(), h.toJson())
+                self.assertEqual(Factory.fromBinary(data), Factory.fromJson(h.toJson()))
+
+            h = Bin(100, -3.0, 3.0, "noholes", Sum("positive"))
+            h.fill.numpy(self.data)
+            one = Factory.fromBinary(h.toBinary())
+            self.assertTrue(isinstance(one.values, DenseValues))
+            self.assertEqual((one + one).toJson(), (h + h).toJson())
+
+            self.assertRaises(ContainerException, lambda: Factory.fromBinary(h.toJsonString().encode("utf-8")))
+            self.assertRaises(ContainerException, lambda: Factory.fromBinary(h.toBinary()[:-8]))
+            self.assertRaises(JsonFormatException, lambda: Factory.fromJson({"version": "1.0", "type": "Bin", "data": {"low": -3.0, "high": 3.0, "entries": 0.0, "values:type": "Count", "values": {"zero": 0.0, "arrays": {"entries": {"<f8": [0, 100]}}}, "underflow:type": "Count", "underflow": 0.0, "overflow:type": "Count", "overflow": 0.0, "nanflow:type": "Count", "nanflow": 0.0}}))
+
     def testUntypedLabelBin(self):
         with Numpy() as numpy:
             if numpy is None: return
@@ -426,3 +752,5 @@ class TestNumpy(unittest.TestCase):
             self.compare("Bag no data", Bag(lambda x: x["empty"], "N"), self.data, Bag(lambda x: x, "N"), self.empty)
             self.compare("Bag noholes", Bag(lambda x: x["noholes"], "N"), self.data, Bag(lambda x: x, "N"), self.noholes)
             self.compare("Bag holes", Bag(lambda x: x["withholes"], "N"), self.data, Bag(lambda x: x, "N"), self.withholes)
+            self.compare("Bag vectors holes", Bag(lambda x: numpy.column_stack((x["withholes"], 2.0 * x["withholes"])), "N2"), self.data, Bag(lambda x: (x, 2.0 * x), "N2"), self.withholes)
+            self.compare("Bag strings noholes", Bag(lambda x: numpy.floor(x["noholes"]).astype(int).astype(str), "S"), self.data, Bag(lambda x: str(int(math.floor(x))), "S"), self.noholes)